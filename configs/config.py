@@ -1,7 +1,7 @@
 import os
 import logging
-from datetime import datetime
 from dotenv import load_dotenv
+from tools.log_pipeline import configure_logging
 
 load_dotenv()
 
@@ -9,10 +9,6 @@ load_dotenv()
 API_KEY = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_SECRET_KEY")
 
-# Validação básica de segurança
-if not API_KEY or not API_SECRET:
-    logging.warning("Credenciais de API não encontradas no arquivo .env. O bot rodará em modo restrito/simulado.")
-
 # --- Configuração de Diretórios ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGS_DIR = os.path.join(BASE_DIR, "..", "logs")
@@ -22,24 +18,89 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 os.makedirs(DB_DIR, exist_ok=True)
 
 # --- Configuração de Logging ---
-log_name = f"bot_execution_{datetime.now().strftime('%m-%Y')}.log"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = 20 * 1024 * 1024        # Rotaciona ao passar de 20MB...
+LOG_ROTATE_SECONDS = 24 * 3600          # ...ou a cada 24h (o que vier primeiro)
+LOG_BACKUP_COUNT = 30                   # Arquivos .gz mantidos
+
+# Modo multiprocesso: cada filho grava no próprio arquivo (bot_execution.<papel>.jsonl). Vários
+# processos no mesmo arquivo rotacionariam cada um por conta própria e os outros seguiriam
+# escrevendo no arquivo já removido
+PROCESS_ROLE = os.getenv("BOT_PROCESS_ROLE", "")
+LOG_SUFFIX = f".{PROCESS_ROLE}" if PROCESS_ROLE else ""
+
+log_name = f"bot_execution{LOG_SUFFIX}.jsonl"
 log_path = os.path.join(LOGS_DIR, log_name)
 
-# Formato simplificado para leitura rápida
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(log_path, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+# Escrita em arquivo (JSON-lines) e console (colorido) rodam numa thread própria via fila
+configure_logging(
+    log_path,
+    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    max_bytes=LOG_MAX_BYTES,
+    interval=LOG_ROTATE_SECONDS,
+    backup_count=LOG_BACKUP_COUNT
 )
 LOGGER = logging.getLogger("DeltaNeutralBot")
 
+# --- Tracing e Profiler ---
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") != "0"   # Spans por fase em logs/traces.jsonl (traces.<papel>.jsonl nos filhos)
+TRACE_MAX_BYTES = 50 * 1024 * 1024
+TRACE_BACKUP_COUNT = 10
+PROFILER_INTERVAL = 0.01                # 10ms entre amostras
+PROFILER_TOGGLE_FILE = os.path.join(LOGS_DIR, "profiler.on")  # Existe = profiler ligado (alternativa ao SIGUSR1)
+
+# Validação básica de segurança
+if not API_KEY or not API_SECRET:
+    LOGGER.warning("Credenciais de API não encontradas no arquivo .env. O bot rodará em modo restrito/simulado.")
+
 # --- Parâmetros de Mercado ---
 EXCHANGE_ID = 'binance'
+EXCHANGE_BASE_URL = os.getenv("EXCHANGE_BASE_URL")  # Ex: http://127.0.0.1:8650 (exchange local: python -m tools.fake_exchange)
 MIN_24H_VOLUME_USD = 50_000_000
+MARKETS_RELOAD_INTERVAL = 6 * 3600      # Recarrega metadados de mercado (e o índice Perpétuo -> Spot)
+
+# --- Paper Trading (Execução Simulada) ---
+PAPER_TRADING = os.getenv("PAPER_TRADING", "0") != "0"   # Ordens, transferências e saldos locais (leituras continuam na exchange)
+PAPER_BALANCES = {                      # Conta simulada inicial (USDT)
+    'spot': {'USDT': float(os.getenv("PAPER_BALANCE_SPOT", "500"))},
+    'future': {'USDT': float(os.getenv("PAPER_BALANCE_FUTURE", "500"))},
+}
+PAPER_STATE_FILE = os.path.join(BASE_DIR, "paper_account.json")   # Conta simulada persistida entre reinícios
+PAPER_INCOME_KEEP = 2000                # Registros de funding simulados mantidos no arquivo
+
+# --- Estado do Bot (Diário Binário com Snapshot) ---
+STATE_COMPACT_BYTES = 64 * 1024         # Diário maior que isso é compactado num snapshot novo
+FEE_CACHE_MAX = 256                     # Taxas por par guardadas no estado (as mais antigas saem primeiro)
+STATE_JSON_EXPORT = os.getenv("STATE_JSON_EXPORT", "0") != "0"   # Cópia legível (bot_state.export.json) a cada gravação
+
+# --- Governança de Requisições (Peso por Minuto da Binance) ---
+WEIGHT_LIMIT_SPOT = 6000                # Limite por IP/minuto (api + sapi)
+WEIGHT_LIMIT_FUTURES = 2400             # Limite por IP/minuto (fapi)
+WEIGHT_SAFETY_MARGIN = 0.8              # Scans usam até 80%; o resto fica para Guardião e ordens
+
+# --- Pool de Conexões HTTP (Sessões Compartilhadas entre Clientes CCXT) ---
+HTTP_POOL_HOSTS = 10                    # Hosts com pool próprio por sessão (api, fapi, APIs externas)
+HTTP_POOL_MAXSIZE = {                   # Conexões keep-alive por host em cada faixa
+    'shared': 8,                        # Spot + Swap (ordens paralelas, scans, rebalanceamento)
+    'guardian': 2,                      # Faixa exclusiva do Guardião
+}
+HTTP_TIMEOUTS = {                       # (conexão, leitura) em segundos por classe de endpoint
+    'shared': {
+        'order': (3.05, 10),            # Ordens e transferências
+        'bulk': (3.05, 30),             # Consultas pesadas (todos os tickers, exchangeInfo, income)
+        'default': (3.05, 10),
+    },
+    'guardian': {
+        'order': (3.05, 10),
+        'read': (2, 5),                 # Leituras do Guardião falham rápido e tentam de novo no próximo ciclo
+    },
+}
+DNS_CACHE_TTL = 300                     # Segundos (0 desativa o cache de DNS)
+GUARDIAN_KEEPWARM_INTERVAL = 60         # Sem posição, o Guardião pinga a exchange para manter a conexão quente
+
+# --- Métricas (Endpoint /metrics no formato Prometheus) ---
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))   # 0 desativa o endpoint
 
 # --- Filtros de Estratégia ---
 MIN_FUNDING_RATE = 0.0001               # 0.01% por período (Funding positivo)
@@ -49,6 +110,125 @@ FEE_TAKER_SWAP_DEFAULT = 0.0005         # 0.05%
 SLIPPAGE_SIMULATED = 0.0005             # 0.05% (Conservador para garantir realismo)
 TARGET_FUNDING = (0.15 / 365) * 3.0     # Meta mínima aceitável
 EXIT_SCORE_LIMIT = 20                   # Limite para sair (aprox. 1h40min se for linear)
+FUNDING_CONSISTENCY_WINDOW = 9          # Períodos de histórico usados na média de funding
+
+# --- Ranking Incremental de Candidatos ---
+RANK_FUNDING_DELTA = 0.00005            # Reanalisa se o funding andar mais de 0.005 p.p.
+RANK_VOLUME_DELTA = 0.25                # ...ou o volume 24h variar mais de 25%
+RANK_BASIS_DELTA = 0.001                # ...ou o basis andar mais de 0.1 p.p.
+NEGATIVE_CACHE_TTL = 2 * 3600           # Pares reprovados ficam 2h fora da análise
+RANK_FULL_RESCAN_INTERVAL = 6 * 3600    # Reconciliação completa (reanalisa todos)
+
+# --- Ledger de Funding (Pagamentos Reais via Histórico de Income) ---
+FUNDING_LEDGER_SYNC_INTERVAL = 3600     # Reconciliação periódica além da sincronização pós-liquidação
+FUNDING_LEDGER_PAGE = 1000              # Registros por requisição (máximo do /fapi/v1/income)
+
+# --- Estatísticas Móveis por Símbolo (Funding, Basis, Preço, Spread) ---
+ROLLING_CAPACITY = 288                  # Amostras por símbolo (memória fixa: ~1 dia a cada 5 min)
+ROLLING_EWMA_SPAN = 12                  # Span da média exponencial (alpha = 2 / (span + 1))
+ROLLING_MIN_SPACING = 60                # Amostras do mesmo símbolo a menos de 60s são descartadas
+ROLLING_MIN_SAMPLES = 6                 # Mínimo de amostras para os sinais substituírem a comparação simples
+
+# --- Score de Tédio (Saída por Baixa Performance) ---
+BOREDOM_PENALTY_BASE = 1                # Funding abaixo da meta
+BOREDOM_PENALTY_CRITICAL = 2            # Extra se o funding for < 50% da meta
+BOREDOM_PENALTY_TREND = 3               # Extra se o funding estiver em queda
+BOREDOM_RECOVERY = 2                    # Pontos recuperados por ciclo bom
+BOREDOM_EVAL_INTERVAL = 300             # Score avaliado no máximo a cada 5 min (monitoramento pode ser mais denso)
+
+# --- Agendador do Loop Principal (Orientado à Liquidação de Funding) ---
+FUNDING_INTERVAL_HOURS = 8              # Grade padrão da Binance (00h/08h/16h UTC)
+SCAN_LEAD_SECONDS = 15 * 60             # Scan 15 min antes da liquidação
+SCAN_INTERVAL_MAX = 3600                # Sem posição, nunca passa 1h sem escanear
+MONITOR_INTERVAL_IDLE = 15 * 60         # Posição saudável
+MONITOR_INTERVAL_ALERT = 60             # Funding/basis deteriorando ou score de tédio > 0
+MONITOR_BASIS_ALERT = 0.0005            # Basis abaixo de 0.05% conta como deterioração
+MONITOR_SETTLEMENT_DELAY = 30           # Monitora 30s após a liquidação (contabiliza o funding)
+HOUSEKEEPING_INTERVAL = 30              # Rotação do DB e toggle do profiler
+
+# --- Modo Multiprocesso (main.py --multiprocess) ---
+MP_QUEUE_SIZE = 100                     # Mensagens pendentes por caixa de entrada
+MP_HEARTBEAT_INTERVAL = 5               # Cada processo avisa o supervisor que está vivo
+MP_HEARTBEAT_TIMEOUT = 60               # Sem heartbeat por 60s = processo travado (reiniciado)
+MP_RESTART_BACKOFF_MIN = 1              # Espera antes de reiniciar (dobra a cada queda seguida)...
+MP_RESTART_BACKOFF_MAX = 60             # ...até este teto
+MP_RESTART_RESET = 300                  # Processo estável por 5 min zera o backoff
+MP_SHUTDOWN_TIMEOUT = 30                # Espera pelo encerramento limpo antes de forçar
+MP_POSITION_BROADCAST = 60              # Execução republica posição/capital (e rebalanceia) sem posição
+MP_SNAPSHOT_TIMEOUT = 60                # Estratégia desiste do retrato de mercado e tenta de novo
+MP_SNAPSHOT_MAX_AGE = 30                # Dados de mercado reaproveitam um retrato mais novo que isso
+MP_ORDER_TIMEOUT = 300                  # Estratégia volta a escanear se a execução não responder
+MP_METRICS_PORTS = {                    # Endpoint /metrics de cada processo (0 desativa)
+    'execution': METRICS_PORT,
+    'market_data': METRICS_PORT + 1 if METRICS_PORT else 0,
+    'strategy': METRICS_PORT + 2 if METRICS_PORT else 0,
+}
+
+# --- Tabela de Mercado em Memória Compartilhada (Modo Multiprocesso) ---
+MARKET_TABLE_NAME = os.getenv("MARKET_TABLE_NAME", "cashcarry_market")  # Segmento em /dev/shm (um por instância do bot)
+MARKET_TABLE_CAPACITY = 4096            # Símbolos (Spot + Swap); IDs nunca são reaproveitados
+MARKET_TABLE_INTERVAL = 10              # Cada feed do processo de dados de mercado reescreve a tabela
+MARKET_TABLE_MAX_AGE = 30               # Leitores ignoram linhas mais velhas que isso (caem no REST)
+MARKET_TABLE_READ_RETRIES = 100         # Tentativas do seqlock antes de desistir de uma linha
+
+# --- Scanner Multi-Exchange (Funding entre Venues) ---
+# Lista "nome" ou "nome=id_ccxt" separada por vírgulas (ex: "binance,bybit,okx"). A primeira é a casa
+# (onde o bot opera); as demais só entram na comparação. Uma venue só = scanner desligado.
+SCAN_VENUES = os.getenv("SCAN_VENUES", EXCHANGE_ID)
+# Cada venue pode apontar para outro host com VENUE_<NOME>_BASE_URL (ex: exchanges locais de teste)
+VENUE_MARKETS_TTL = 3600                # Metadados (mercados e intervalos de funding) em cache por venue
+VENUE_LOG_TOP = 10                      # Linhas da tabela cruzada exibidas a cada scan
+
+# --- Saldos e Balanceamento entre Carteiras ---
+BALANCE_MAX_AGE = 15 * 60               # Validade do saldo em cache no monitoramento (aportes externos aparecem nessa janela)
+BALANCE_SCAN_MAX_AGE = 60               # Antes de uma possível entrada o saldo precisa ser recente
+REBALANCE_BAND_USD = 5.0                # Desvio mínimo do 50/50 para transferir...
+REBALANCE_BAND_PCT = 0.02               # ...ou 2% do total (o maior); a transferência volta ao centro
+REBALANCE_MIN_INTERVAL = 10 * 60        # Intervalo mínimo entre transferências de rebalanceamento
+REBALANCE_SPOT_DEFICIT_USD = 1.0        # Spot abaixo do centro por mais que isso é coberto sempre (senão a entrada falha)
+DEPOSIT_MIN_USD = 5.0                   # USDT livre no Spot acima do reservado conta como aporte
+
+# --- Varredura de Pernas Órfãs e Dust (Saldos x Posição do Bot) ---
+SWEEP_INTERVAL = 15 * 60                # Uma varredura completa (saldos Spot + posições Swap) a cada 15 min
+SWEEP_CONFIRM_DELAY = 30                # Achado novo é conferido de novo nesse prazo antes de agir
+SWEEP_CONFIRM_PASSES = 2                # Passadas seguidas com o mesmo achado antes de zerar (ordens em voo somem sozinhas)
+SWEEP_FLATTEN = os.getenv("SWEEP_FLATTEN", "0") != "0"   # 1 = zera sobras dos símbolos do bot; padrão só alerta
+SWEEP_JOURNAL_OPERATIONS = ('rollback', 'emergency')   # Pernas do diário de execução que o bot pode ter deixado para trás
+SWEEP_MIN_USD = 1.0                     # Diferenças abaixo disso são ignoradas
+SWEEP_ORPHAN_USD = 20.0                 # Sobra acima disso é perna órfã (exposição); abaixo, dust
+SWEEP_MIN_NOTIONAL_DEFAULT = 5.0        # Valor mínimo de ordem Spot quando o mercado não informa
+SWEEP_DUST_CONVERT = True               # Dust abaixo do mínimo de ordem é convertido em lote (Binance: dust -> BNB)
+SWEEP_IGNORE_ASSETS = ('USDT', 'BNB')   # Moeda de cotação e ativo de taxas não são sobra
+
+# --- Bandas de Preço das Ordens IOC (Calibradas pelas Execuções) ---
+PRICE_BAND_BOOK_DEPTH = 50              # Níveis do livro lidos para planejar cada perna
+PRICE_BAND_DEFAULT_BUFFER = 0.001       # Buffer inicial além do pior nível tocado (0.10%)
+PRICE_BAND_FLOOR = 0.0002               # Buffer mínimo (0.02%)
+PRICE_BAND_MAX = 0.005                  # Distância máxima do topo do livro (0.5%, o teto de slippage original; usada também com livro raso)
+PRICE_BAND_SIGMAS = 2.0                 # Buffer = média + 2 desvios do deslocamento adverso observado
+PRICE_BAND_ALPHA = 0.2                  # Peso de cada nova execução na calibração
+PRICE_BAND_WIDEN = 1.5                  # Execução parcial: observa buffer x 1.5 (alarga a banda)
+PRICE_BAND_MIN_FILLS = 5                # Execuções do símbolo antes de usar a calibração própria
+PRICE_BAND_SEED_FILLS = 200             # Ordens IOC do diário de execução reaplicadas na calibração ao iniciar
+
+# --- Resiliência (Classificação de Erros, Retries e Disjuntores) ---
+RETRY_ATTEMPTS = 2                      # Tentativas de leituras (GET) com erro de rede; ordens nunca são repetidas
+RETRY_BACKOFF = 0.25                    # Espera base entre tentativas (dobra a cada uma, com jitter)
+BREAKER_FAILURES = 3                    # Falhas transitórias seguidas que abrem o disjuntor de um endpoint
+BREAKER_POOL_FAILURES = 2               # Exchange fora do ar seguida que abre o produto inteiro (rate limit abre na 1ª)
+BREAKER_BACKOFF_MIN = 2                 # Primeiro período aberto (s); dobra a cada reabertura...
+BREAKER_BACKOFF_MAX = 60                # ...até este teto
+BREAKER_JITTER = 0.2                    # ±20% no período (clientes e processos não voltam todos juntos)
+
+# --- Leituras Pré-Ordem (Prazo, Hedge e Cache) ---
+PRETRADE_DEADLINE = 1.5                 # Prazo total de cada leitura antes do disparo das ordens (s)
+PRETRADE_HEDGE_PERCENTILE = 95          # Sem resposta até o p95 da latência recente, dispara uma cópia...
+PRETRADE_HEDGE_DELAY_DEFAULT = 0.25     # ...(atraso usado até haver amostras suficientes)
+PRETRADE_HEDGE_DELAY_MIN = 0.05         # Piso do atraso do hedge (não duplica toda leitura rápida)
+PRETRADE_MIN_SAMPLES = 20               # Amostras de latência antes de usar o percentil
+PRETRADE_LATENCY_WINDOW = 200           # Amostras mantidas por tipo de leitura
+PRETRADE_CACHE_MAX_AGE = 5.0            # Prazo estourado: usa a última leitura se mais nova que isso
+PRETRADE_WORKERS = 8                    # Threads das leituras (as abandonadas terminam no timeout HTTP)
 
 # --- Gestão de Conversões ---
 BRL_USD_RATE = 5.80                     # Fallback caso a API de câmbio falhe
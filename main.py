@@ -1,12 +1,15 @@
 import os
-import re
 import time
 from datetime import datetime
-from collections import Counter
-import requests
+import argparse
 from configs.config import *
-from tools.database import DataManager
+from tools.database import DataManager, monthly_db_path
 from tools.strategy import CashAndCarryBot
+from tools.http_pool import http_session
+from tools.metrics import start_metrics_server, LOOP_CYCLES, LOOP_DURATION
+from tools.tracing import span, PROFILER
+from tools.scheduler import EventScheduler, plan_scan_time, plan_monitor_time, plan_degraded_time
+from tools.supervisor import run_multiprocess
 
 def get_live_usd_brl(bot_instance):
     """
@@ -15,7 +18,8 @@ def get_live_usd_brl(bot_instance):
     """
     try:
         # Endpoint da AwesomeAPI (Atualiza a cada 30s)
-        response = requests.get("https://economia.awesomeapi.com.br/last/USD-BRL", timeout=5)
+        # Sessão compartilhada: conexão keep-alive reaproveitada entre consultas
+        response = http_session().get("https://economia.awesomeapi.com.br/last/USD-BRL")
         data = response.json()
         rate = float(data['USDBRL']['bid'])
         LOGGER.info(f"Cotação USD/BRL obtida: R$ {rate:.4f}")
@@ -30,6 +34,11 @@ def get_live_usd_brl(bot_instance):
 
 def main():
     LOGGER.info("Iniciando Cash & Carry Bot...")
+
+    start_metrics_server()
+
+    # Profiler sob demanda: kill -USR1 <pid> ou criar o arquivo logs/profiler.on
+    PROFILER.install_signal()
     
     # Inicialização do Bot
     bot = CashAndCarryBot() 
@@ -37,206 +46,187 @@ def main():
     time.sleep(1)
 
     bot.start_guardian()
-    
-    # Variáveis de controle de tempo
-    last_scan_time = 0
-    scan_interval = 3600 # 1 hora
+    bot.start_sweeper()
 
-    # Configuração do Banco de Dados
-    db_dir = "databases"
-    os.makedirs(db_dir, exist_ok=True)
-    
-    # Define o mês atual para controle
+    # Configuração do Banco de Dados (um arquivo por mês)
     current_month = datetime.now().strftime('%m-%Y') 
-    db_name = f"database_{current_month}.db"
-    db_path = os.path.join(db_dir, db_name)
+    db_path = monthly_db_path(current_month)
 
     db_manager = DataManager(db_name=db_path)
-    LOGGER.info(f"Conectado ao banco de dados: {db_name}")
+    bot.db_manager = db_manager
+    LOGGER.info(f"Conectado ao banco de dados: {os.path.basename(db_path)}")
+    bot.seed_price_bands()
+
+    scheduler = EventScheduler()
+
+    def run_cycle(branch, func):
+        """Executa um ciclo com métricas e span de tracing."""
+        LOOP_CYCLES.labels(branch=branch).inc()
+        with LOOP_DURATION.labels(branch=branch).time(), span('cycle', branch=branch):
+            func()
+
+    def schedule_scan(when=None):
+        when = when if when is not None else plan_scan_time(time.time())
+        scheduler.cancel('monitor')
+        scheduler.schedule('scan', when, lambda: run_cycle('scan', scan_job))
+        LOGGER.info(f"Próximo scan: {datetime.fromtimestamp(when).strftime('%H:%M:%S')}")
+
+    def schedule_monitor(when=None):
+        when = when if when is not None else plan_monitor_time(bot, time.time())
+        scheduler.cancel('scan')
+        scheduler.schedule('monitor', when, lambda: run_cycle('monitor', monitor_job))
+        LOGGER.debug(f"Próximo monitoramento: {datetime.fromtimestamp(when).strftime('%H:%M:%S')}")
+
+    def ensure_next_cycle():
+        """Uma exceção no meio do ciclo não pode deixar o loop sem próximo scan/monitoramento."""
+        if scheduler.next_run('scan') or scheduler.next_run('monitor'):
+            return
+        LOGGER.warning("Ciclo terminou sem reagendar. Agendando o próximo por segurança.")
+        if bot.position is None:
+            schedule_scan()
+        else:
+            schedule_monitor(time.time() + MONITOR_INTERVAL_ALERT)
+
+    def scan_job():
+        try:
+            scan_cycle()
+        finally:
+            ensure_next_cycle()
+
+    def monitor_job():
+        try:
+            monitor_cycle()
+        finally:
+            ensure_next_cycle()
+
+    def scan_cycle():
+        if bot.position is not None:
+            schedule_monitor(time.time())
+            return
+
+        degraded_until = plan_degraded_time(time.time())
+        if degraded_until:
+            LOGGER.warning("Exchange degradada (disjuntor aberto). Scan adiado.")
+            schedule_scan(degraded_until)
+            return
+
+        try:
+            # Antes de uma possível entrada o saldo não pode ser velho
+            bot.auto_balance_wallets(max_age=BALANCE_SCAN_MAX_AGE)
+        except Exception as e:
+            LOGGER.error(f"Falha no auto-balanceamento: {e}")
+
+        if (bot.capital / 2) < MIN_ORDER_VALUE_USD:
+            LOGGER.info("CAPITAL INSUFICIENTE! (< $22) Aguardando próximo scan...")
+            schedule_scan()
+            return
+
+        top_pairs, tickers_swap, tickers_spot = bot.get_top_volume_pairs()
+
+        if not top_pairs:
+            LOGGER.info("Nenhum par aprovado. Aguardando próximo ciclo...")
+            schedule_scan()
+            return
+
+        viable_opportunities, unviable_opportunities, reasons = bot.evaluate_candidates(
+            top_pairs, tickers_swap, tickers_spot
+        )
+
+        if viable_opportunities:
+            best_opportunity = bot.best_opportunity(viable_opportunities)
+
+            LOGGER.info(f"{COLOR_CYAN}MELHOR OPORTUNIDADE:{COLOR_RESET}")
+            LOGGER.info(f"{COLOR_CYAN}Par: {best_opportunity['pair']}{COLOR_RESET}")
+            LOGGER.info(f"{COLOR_CYAN}Funding: {best_opportunity['funding_rate']:.4%}{COLOR_RESET}")
+
+            # Executa entrada
+            success = bot.execute_real_entry(
+                best_opportunity['pair'], 
+                best_opportunity['spot_symbol'], 
+                bot.capital
+            )
+
+            db_manager.log_scan_attempt(bot.scan_record(
+                top_pairs, unviable_opportunities, reasons,
+                best=best_opportunity, outcome="ENTRY_EXECUTED" if success else "ENTRY_FAILED"
+            ))
+
+            if success:
+                # Primeiro monitoramento logo após a entrada (lê a próxima liquidação)
+                schedule_monitor(time.time())
+                return
+            
+        else:
+            db_manager.log_scan_attempt(bot.scan_record(top_pairs, unviable_opportunities, reasons))
+
+        schedule_scan()
+
+    def monitor_cycle():
+        if bot.position is None:
+            schedule_scan(time.time())
+            return
+
+        degraded_until = plan_degraded_time(time.time())
+        if degraded_until:
+            # O Guardião segue vigiando a liquidação no ritmo dos disjuntores
+            LOGGER.warning("Exchange degradada (disjuntor aberto). Monitoramento adiado.")
+            schedule_monitor(degraded_until)
+            return
+
+        bot.monitor_and_manage(db_manager)
+
+        if bot.position is None:
+            schedule_scan()
+        else:
+            schedule_monitor()
+
+    def housekeeping_job():
+        nonlocal db_manager, current_month
+
+        # Verificação de Rotação de Mês
+        new_month = datetime.now().strftime('%m-%Y')
+        if new_month != current_month:
+            LOGGER.info(f"Virada de mês detectada ({current_month} -> {new_month}). Rotacionando DB...")
+            previous_db = db_manager
+            
+            current_month = new_month
+            
+            # Troca o banco do bot antes de fechar o antigo (ordens podem estar sendo registradas)
+            db_manager = DataManager(db_name=monthly_db_path(current_month))
+            bot.db_manager = db_manager
+            previous_db.close()
+
+        PROFILER.poll_toggle()
+        scheduler.schedule_in('housekeeping', HOUSEKEEPING_INTERVAL, housekeeping_job)
+
+    def on_bot_event(event):
+        """Eventos vindos do bot/Guardião (qualquer thread)."""
+        if event == 'POSITION_CLOSED':
+            schedule_scan()
+        elif event == 'RISK_ALERT':
+            # Antecipa o monitoramento, sem disparar mais de um por MONITOR_INTERVAL_ALERT
+            next_monitor = scheduler.next_run('monitor')
+            if next_monitor and next_monitor - time.time() > MONITOR_INTERVAL_ALERT:
+                scheduler.trigger('monitor', reason="alerta de risco do Guardião")
+
+    bot.on_event = on_bot_event
+
+    scheduler.schedule_in('housekeeping', HOUSEKEEPING_INTERVAL, housekeeping_job)
+    if bot.position is None:
+        schedule_scan(time.time())
+    else:
+        schedule_monitor(time.time())
 
     try:
-        while True:
-            current_time = time.time()
-
-            # Verificação de Rotação de Mês
-            new_month = datetime.now().strftime('%m-%Y')
-            if new_month != current_month:
-                LOGGER.info(f"Virada de mês detectada ({current_month} -> {new_month}). Rotacionando DB...")
-                db_manager.close()
-                
-                current_month = new_month
-                db_name = f"database_{current_month}.db"
-                db_path = os.path.join(db_dir, db_name)
-                
-                db_manager = DataManager(db_name=db_path)
-
-            # Lógica de Mercado
-            if bot.position is None:
-                # Se não tem posição, escaneia
-                if current_time - last_scan_time > scan_interval:
-                    try:
-                        bot.auto_balance_wallets()
-                    except Exception as e:
-                        LOGGER.error(f"Falha no auto-balanceamento: {e}")
-
-                    if (bot.capital / 2) < MIN_ORDER_VALUE_USD:
-                        LOGGER.info("CAPITAL INSUFICIENTE! (< $22) Aguradando uma hora para nova tentativa...")
-                        last_scan_time = current_time
-                        continue
-
-                    top_pairs, tickers_swap, tickers_spot = bot.get_top_volume_pairs()
-                    
-                    if top_pairs:
-                        try:
-                            LOGGER.info("Baixando dados de mercado (Spot + Swaps) e Funding...")
-                                
-                        except Exception as e:
-                            LOGGER.error(f"Erro crítico ao baixar dados em lote: {e}")
-                            time.sleep(10)
-                            continue
-                    # ------------------------------------------------------------------
-
-                    # Variáveis para estatísticas do log de scanner
-                    reasons = []
-                    final_reason = "ENTRY_EXECUTED"
-
-                    if not top_pairs:
-                        LOGGER.info("Nenhum par aprovado. Aguardando próximo ciclo...")
-                        last_scan_time = current_time
-                        continue
-
-                    viable_opportunities = []
-                    unviable_opportunities = []
-                    
-                    for pair, fr_rate, volume in top_pairs.items():
-                        try:
-                            # Definições Iniciais
-                            symbol_spot_candidate = pair.split(':')[0] 
-                            base_swap_raw = pair.split('/')[0]
-                            
-                            # Limpeza inteligente de prefixos numéricos
-                            base_swap_clean = re.sub(r"^\d+", "", base_swap_raw)
-
-                            found_spot = None
-                            
-                            # Busca Direta
-                            if symbol_spot_candidate in tickers_spot:
-                                found_spot = symbol_spot_candidate
-                                price_spot = tickers_spot[found_spot]['last']
-                                price_swap = tickers_swap[pair]['last']
-                            else:
-                                reasons.append(f"MISSING_SPOT_DATA ({base_swap_clean})")
-                                continue
-
-                            # Passa os dados já processados
-                            is_viable, fr, reason = bot.check_entry_opportunity(
-                                pair, found_spot,
-                                price_spot=price_spot, 
-                                price_swap=price_swap, 
-                                funding_rate=fr_rate
-                            )
-
-                            if is_viable:
-                                LOGGER.info(f"{COLOR_GREEN}Candidato Classificado: {pair} | Funding: {fr:.4%}{COLOR_RESET}")
-                                viable_opportunities.append({
-                                    'pair': pair,
-                                    'spot_symbol': found_spot,
-                                    'funding_rate': fr,
-                                    'price_spot': price_spot,
-                                    'price_swap': price_swap,
-                                    'volume': volume
-                                })
-                            else:
-                                LOGGER.info(f"{COLOR_RED}Candidato Rejeitado: {pair} | Funding: {fr:.4%} | Motivo: {reason}{COLOR_RESET}")
-                                unviable_opportunities.append({
-                                    'pair': pair,
-                                    'spot_symbol': found_spot,
-                                    'funding_rate': fr,
-                                    'price_spot': price_spot,
-                                    'price_swap': price_swap,
-                                    'volume': volume
-                                })
-
-                            reasons.append(reason)
-
-                        except Exception as e:
-                            LOGGER.error(f"Erro ao processar par {pair}: {e}")
-                            reasons.append("PROCESSING_ERROR")
-                            continue
-
-                        time.sleep(0.5)
-
-                    if viable_opportunities:
-                        best_opportunity = sorted(
-                            viable_opportunities, 
-                            key=lambda x: (x['funding_rate'], x['volume']), 
-                            reverse=True
-                        )[0]
-
-                        LOGGER.info(f"{COLOR_CYAN}MELHOR OPORTUNIDADE:{COLOR_RESET}")
-                        LOGGER.info(f"{COLOR_CYAN}Par: {best_opportunity['pair']}{COLOR_RESET}")
-                        LOGGER.info(f"{COLOR_CYAN}Funding: {best_opportunity['funding_rate']:.4%}{COLOR_RESET}")
-
-                        # Executa entrada
-                        success = bot.execute_real_entry(
-                            best_opportunity['pair'], 
-                            best_opportunity['spot_symbol'], 
-                            bot.capital
-                        )
-
-                        db_manager.log_scan_attempt({
-                            'total_analyzed': len(top_pairs),
-                            'passed_volume': len(top_pairs),
-                            'best_funding': best_opportunity['funding_rate'],
-                            'best_pair': best_opportunity['pair'],
-                            'reason': final_reason
-                        })
-
-                        if success:
-                            break
-                        
-                    else:
-                        if reasons:
-                            final_reason = Counter(reasons).most_common(1)[0][0]
-
-                        best_pair = sorted(
-                            unviable_opportunities, 
-                            key=lambda x: x['funding_rate'], 
-                            reverse=True
-                        )[0]
-                        
-                        db_manager.log_scan_attempt({
-                            'total_analyzed': len(top_pairs),
-                            'passed_volume': len(top_pairs),
-                            'best_funding': best_pair['funding_rate'],
-                            'best_pair': best_pair['pair'],
-                            'reason': final_reason
-                        })
-
-                    last_scan_time = current_time
-            else:
-                # Se tem posição, monitora
-                bot.monitor_and_manage(db_manager)
-
-            while True:
-                # Calcula a diferença exata entre o momento atual e o alvo
-                remaining = int((current_time + scan_interval) - time.time())
-                
-                if remaining <= 0:
-                    break
-                    
-                mins, secs = divmod(remaining, 60)
-                print(f"Próximo ciclo em: {mins:02d}:{secs:02d}", end='\r', flush=True)
-                time.sleep(1)
-
-            # Limpa a linha do timer antes de iniciar a lógica do bot
-            print(" " * 40, end='\r')
+        scheduler.run()
 
     except KeyboardInterrupt:
         LOGGER.info("Parando bot manualmente...")
     except Exception as e:
         LOGGER.critical(f"Erro fatal no loop principal: {e}")
     finally:
+        scheduler.stop()
+        PROFILER.stop()
         try:
             db_manager.close()
             LOGGER.info("Conexão com banco de dados encerrada.")
@@ -244,4 +234,12 @@ def main():
             pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cash & Carry Bot")
+    parser.add_argument('--multiprocess', action='store_true',
+                        help="Separa dados de mercado, estratégia e execução/risco em processos supervisionados")
+    args = parser.parse_args()
+
+    if args.multiprocess:
+        run_multiprocess()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,164 @@
+import time
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+# Peso de requisição por rota (documentação da Binance, limite por IP/minuto)
+# Rotas com peso condicional (símbolo/limit) são tratadas em endpoint_weight()
+ENDPOINT_WEIGHTS = {
+    # Spot
+    'GET /api/v3/ping': 1,
+    'GET /api/v3/time': 1,
+    'GET /api/v3/exchangeInfo': 20,
+    'GET /api/v3/ticker/24hr': 80,          # Sem símbolo (todos os pares)
+    'GET /api/v3/depth': 5,                 # limit <= 100
+    'GET /api/v3/klines': 2,
+    'GET /api/v3/account': 20,
+    'POST /api/v3/order': 1,
+    'GET /sapi/v1/asset/tradeFee': 1,
+    'POST /sapi/v1/asset/transfer': 1,
+    'GET /sapi/v1/margin/allPairs': 1,
+    'GET /sapi/v1/margin/isolated/allPairs': 10,
+    # Futuros USDT-M
+    'GET /fapi/v1/ping': 1,
+    'GET /fapi/v1/time': 1,
+    'GET /fapi/v1/exchangeInfo': 1,
+    'GET /fapi/v1/ticker/24hr': 40,         # Sem símbolo (todos os pares)
+    'GET /fapi/v1/depth': 2,                # limit <= 50
+    'GET /fapi/v1/klines': 2,
+    'GET /fapi/v1/premiumIndex': 10,        # Sem símbolo (todos os pares)
+    'GET /fapi/v1/fundingRate': 1,
+    'GET /fapi/v1/fundingInfo': 1,
+    'POST /fapi/v1/order': 1,
+    'GET /fapi/v2/account': 5,
+    'GET /fapi/v3/account': 5,
+    'GET /fapi/v2/balance': 5,
+    'GET /fapi/v2/positionRisk': 5,
+    'GET /fapi/v3/positionRisk': 5,
+    'GET /fapi/v1/income': 30,
+    'GET /fapi/v1/commissionRate': 20,
+    'GET /fapi/v1/accountConfig': 5,
+    'GET /fapi/v1/leverageBracket': 1,
+}
+
+
+def endpoint_key(method, url):
+    """Normaliza uma requisição para 'MÉTODO /caminho' (sem host nem query)."""
+    return f"{method.upper()} {urlsplit(url).path}"
+
+
+def endpoint_weight(method, url, body=None):
+    """
+    Peso da requisição segundo a tabela da Binance.
+    Considera as variações por símbolo e profundidade do livro.
+    """
+    key = endpoint_key(method, url)
+    query = urlsplit(url).query or (body if isinstance(body, str) else '')
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    has_symbol = 'symbol' in params
+
+    if key == 'GET /api/v3/ticker/24hr' and has_symbol:
+        return 2
+    if key == 'GET /fapi/v1/ticker/24hr' and has_symbol:
+        return 1
+    if key == 'GET /fapi/v1/premiumIndex' and has_symbol:
+        return 1
+
+    if key.endswith('/depth'):
+        limit = int(params.get('limit', 100))
+        if key.startswith('GET /fapi'):
+            return 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+
+    return ENDPOINT_WEIGHTS.get(key, 1)
+
+
+def endpoint_pool(url):
+    """Limites de peso são separados por produto: 'spot' (api/sapi) e 'futures' (fapi)."""
+    path = urlsplit(url).path
+    return 'futures' if path.startswith('/fapi') else 'spot'
+
+
+def wrap_fetch(client, hook):
+    """
+    Intercepta o transporte HTTP do cliente CCXT (client.fetch).
+    hook(client, method, url, body, call) deve executar call() e devolver seu resultado.
+    Vários hooks podem ser empilhados no mesmo cliente.
+    """
+    inner = client.fetch
+
+    def fetch(url, method='GET', headers=None, body=None):
+        return hook(client, method, url, body, lambda: inner(url, method, headers, body))
+
+    client.fetch = fetch
+    return client
+
+
+class ApiCallRecorder:
+    """
+    Contabiliza as chamadas de API: quantidade, peso, erros e latência por endpoint,
+    além do último peso usado informado pela exchange (X-MBX-USED-WEIGHT-1M).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+            self.used_weight = {}
+
+    def attach(self, client, label=None):
+        """Passa a registrar as chamadas do cliente (label diferencia spot/swap/guardião)."""
+        label = label or client.options.get('defaultType', client.id)
+
+        def hook(client, method, url, body, call):
+            key = f"{label} {endpoint_key(method, url)}"
+            weight = endpoint_weight(method, url, body)
+            start = time.perf_counter()
+            failed = False
+            try:
+                return call()
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                self._record(key, weight, elapsed, failed, endpoint_pool(url), client.last_response_headers)
+
+        return wrap_fetch(client, hook)
+
+    def _record(self, key, weight, elapsed, failed, pool, headers):
+        header_weight = None
+        for name, value in (headers or {}).items():
+            if name.lower() == 'x-mbx-used-weight-1m':
+                header_weight = int(value)
+
+        with self.lock:
+            entry = self.calls.setdefault(key, {'count': 0, 'weight': 0, 'errors': 0, 'latencies': []})
+            entry['count'] += 1
+            entry['weight'] += weight
+            entry['errors'] += int(failed)
+            entry['latencies'].append(elapsed)
+            if header_weight is not None:
+                self.used_weight[pool] = header_weight
+
+    def snapshot(self):
+        """Resumo por endpoint: contagem, peso total, erros e latência média (ms)."""
+        with self.lock:
+            return {
+                key: {
+                    'count': e['count'],
+                    'weight': e['weight'],
+                    'errors': e['errors'],
+                    'avg_ms': 1000 * sum(e['latencies']) / len(e['latencies']) if e['latencies'] else 0.0,
+                }
+                for key, e in sorted(self.calls.items())
+            }
+
+    def totals(self):
+        with self.lock:
+            return {
+                'requests': sum(e['count'] for e in self.calls.values()),
+                'weight': sum(e['weight'] for e in self.calls.values()),
+                'errors': sum(e['errors'] for e in self.calls.values()),
+            }
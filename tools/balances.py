@@ -0,0 +1,109 @@
+import time
+import threading
+from configs.config import *
+from tools.api_accounting import endpoint_key, wrap_fetch
+from tools.metrics import BALANCE_FETCHES, WALLET_TRANSFERS
+
+# Ordens que alteram o saldo de cada carteira (invalidam só a carteira afetada)
+BALANCE_EVENTS = {
+    'POST /api/v3/order': 'spot',
+    'DELETE /api/v3/order': 'spot',
+    'POST /fapi/v1/order': 'future',
+    'DELETE /fapi/v1/order': 'future',
+}
+
+
+class BalanceService:
+    """
+    Visão em cache dos saldos Spot e Futuros.
+
+    - Ordens enviadas pelos clientes marcam a carteira afetada como suja (hook no transporte);
+      a próxima leitura busca só essa carteira.
+    - Transferências feitas por transfer() atualizam o cache localmente, sem nova consulta.
+    - Fora isso, o cache vale até max_age (aportes externos aparecem na renovação periódica).
+    """
+    def __init__(self, exchange_spot, exchange_swap):
+        self.clients = {'spot': exchange_spot, 'future': exchange_swap}
+        self.lock = threading.Lock()
+        self.balances = {'spot': None, 'future': None}
+        self.fetched_at = {'spot': 0.0, 'future': 0.0}
+        self.dirty = {'spot': True, 'future': True}
+        self.last_transfer = 0.0
+
+        for client in self.clients.values():
+            wrap_fetch(client, self._on_request)
+
+    def _on_request(self, client, method, url, body, call):
+        try:
+            return call()
+        finally:
+            # Mesmo com erro (timeout) a ordem pode ter sido executada: invalida por segurança
+            wallet = BALANCE_EVENTS.get(endpoint_key(method, url))
+            if wallet:
+                self.invalidate(wallet)
+
+    def invalidate(self, wallet=None):
+        with self.lock:
+            for name in ([wallet] if wallet else self.dirty):
+                self.dirty[name] = True
+
+    def _ensure(self, wallet, max_age):
+        with self.lock:
+            fresh = not self.dirty[wallet] and time.time() - self.fetched_at[wallet] < max_age
+        if fresh:
+            return
+
+        balance = self.clients[wallet].fetch_balance()
+        BALANCE_FETCHES.labels(wallet=wallet).inc()
+        with self.lock:
+            self.balances[wallet] = balance
+            self.fetched_at[wallet] = time.time()
+            self.dirty[wallet] = False
+
+    def free(self, wallet, currency='USDT', max_age=BALANCE_MAX_AGE):
+        """Saldo livre da moeda na carteira ('spot' ou 'future'), renovando se necessário."""
+        self._ensure(wallet, max_age)
+        with self.lock:
+            return float(self.balances[wallet].get(currency, {}).get('free') or 0.0)
+
+    def wallet(self, wallet, max_age=BALANCE_MAX_AGE):
+        """Carteira inteira em uma leitura: {moeda: {'free', 'total'}} das moedas com saldo."""
+        self._ensure(wallet, max_age)
+        with self.lock:
+            return wallet_rows(self.balances[wallet])
+
+    def free_usdt(self, max_age=BALANCE_MAX_AGE):
+        """(spot, futuros) em USDT livre."""
+        return self.free('spot', max_age=max_age), self.free('future', max_age=max_age)
+
+    def transfer_allowed(self, now=None):
+        return (now or time.time()) - self.last_transfer >= REBALANCE_MIN_INTERVAL
+
+    def transfer(self, amount, source, target):
+        """Transfere USDT entre carteiras e aplica o movimento no cache."""
+        self.clients['spot'].transfer('USDT', amount, source, target)
+        WALLET_TRANSFERS.labels(direction=f"{source}->{target}").inc()
+        with self.lock:
+            self.last_transfer = time.time()
+            for wallet, delta in ((source, -amount), (target, amount)):
+                usdt = (self.balances.get(wallet) or {}).get('USDT')
+                if usdt is None:
+                    self.dirty[wallet] = True
+                    continue
+                usdt['free'] = (usdt.get('free') or 0.0) + delta
+                if usdt.get('total') is not None:
+                    usdt['total'] += delta
+
+
+def wallet_rows(balance):
+    """Resposta do fetch_balance -> {moeda: {'free', 'total'}} das moedas com saldo."""
+    rows = {currency: balance.get(currency) or {} for currency in balance.get('total') or {}}
+    return {
+        currency: {'free': float(row.get('free') or 0.0), 'total': float(row.get('total') or 0.0)}
+        for currency, row in rows.items() if row.get('total')
+    }
+
+
+def rebalance_band(total):
+    """Desvio (USD) tolerado antes de transferir: o maior entre o piso fixo e a fração do total."""
+    return max(REBALANCE_BAND_USD, total * REBALANCE_BAND_PCT)
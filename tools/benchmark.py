@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+from configs.config import *
+from tools.api_accounting import ApiCallRecorder
+from tools.database import DataManager
+from tools.fake_exchange import run_fake_exchange
+
+BENCHMARK_DIR = os.path.join(BASE_DIR, "..", "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Tolerâncias para acusar regressão contra o baseline
+WALL_TIME_TOLERANCE = 0.25      # +25% no p50 de qualquer fase (medido na unidade de referência da máquina)
+CALIBRATION_PINGS = 30          # Requisições mínimas que definem a unidade de referência
+MEMORY_TOLERANCE = 0.25         # +25% no pico de memória
+# Contagem e peso de requisições são determinísticos: qualquer aumento é regressão
+
+
+def percentiles(samples):
+    """p50/p90/p99/máx em milissegundos."""
+    if not samples:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return 1000 * ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {'p50': pick(0.50), 'p90': pick(0.90), 'p99': pick(0.99), 'max': 1000 * ordered[-1]}
+
+
+class CycleBenchmark:
+    """
+    Executa os ciclos do bot (scan, entrada, monitoramento, fechamento) contra uma
+    exchange local e mede tempo, requisições/peso por endpoint e pico de memória.
+    """
+    def __init__(self, bot, db_manager, recorder):
+        self.bot = bot
+        self.db_manager = db_manager
+        self.recorder = recorder
+        self.phases = {}
+
+    def _run_phase(self, name, func):
+        self.recorder.reset()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+
+        phase = self.phases.setdefault(name, {'latencies': [], 'endpoints': {}, 'peak_bytes': 0})
+        phase['latencies'].append(elapsed)
+        phase['peak_bytes'] = max(phase['peak_bytes'], peak)
+
+        # Acumula a contabilidade de API da fase
+        for endpoint, stats in self.recorder.snapshot().items():
+            acc = phase['endpoints'].setdefault(endpoint, {'count': 0, 'weight': 0, 'errors': 0})
+            acc['count'] += stats['count']
+            acc['weight'] += stats['weight']
+            acc['errors'] += stats['errors']
+        return result
+
+    def scan(self):
+        return self._run_phase('scan', self.bot.get_top_volume_pairs)
+
+    def entry(self, top_pairs, tickers_swap, tickers_spot):
+        def _entry():
+            viable, _, _ = self.bot.evaluate_candidates(top_pairs, tickers_swap, tickers_spot)
+            if not viable:
+                return False
+            best = max(viable, key=lambda x: (x['funding_rate'], x['volume']))
+            # Fechamentos anteriores realizam o PnL na conta, não no capital: entra só com o que a conta cobre
+            allocation = min(self.bot.capital, self.bot.last_real_balance)
+            return self.bot.execute_real_entry(best['pair'], best['spot_symbol'], allocation)
+        return self._run_phase('entry', _entry)
+
+    def monitor(self):
+        return self._run_phase('monitor', lambda: self.bot.monitor_and_manage(self.db_manager))
+
+    def close(self):
+        position = self.bot.position
+        if not position:
+            return False
+        return self._run_phase('close', lambda: self.bot.execute_real_close(
+            position.symbol, position.spot_symbol, position.size, reason="BENCHMARK"
+        ))
+
+    def calibrate(self, samples=CALIBRATION_PINGS):
+        """
+        Unidade de tempo da máquina: mediana de uma requisição mínima à exchange local (rede local,
+        CCXT, governador). As latências das fases são comparadas nessa unidade, não em ms absolutos,
+        para o baseline valer em outro host ou no CI.
+        """
+        from tools.exchanges import ping
+        client = self.bot.exchange_swap
+        ping(client)    # Conexão aberta fora da medição
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            ping(client)
+            timings.append(time.perf_counter() - start)
+        return 1000 * sorted(timings)[len(timings) // 2]
+
+    def run(self, iterations, monitor_cycles):
+        calibration_ms = self.calibrate()
+        tracemalloc.start()
+        wall_start = time.perf_counter()
+        try:
+            for i in range(iterations):
+                # Como no scan_cycle do main.py: o fechamento anterior deixou o capital todo no Spot
+                self.bot.auto_balance_wallets(max_age=BALANCE_SCAN_MAX_AGE)
+                top_pairs, tickers_swap, tickers_spot = self.scan()
+                if not top_pairs:
+                    LOGGER.warning("Benchmark: scan sem pares aprovados.")
+                    continue
+                if not self.entry(top_pairs, tickers_swap, tickers_spot):
+                    LOGGER.warning("Benchmark: nenhuma entrada executada nesta iteração.")
+                    continue
+                for _ in range(monitor_cycles):
+                    self.monitor()
+                self.close()
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            _, overall_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        return self.report(wall_time, overall_peak, calibration_ms)
+
+    def report(self, wall_time, overall_peak, calibration_ms):
+        phases = {}
+        for name, phase in self.phases.items():
+            runs = len(phase['latencies'])
+            phases[name] = {
+                'runs': runs,
+                'latency_ms': percentiles(phase['latencies']),
+                'requests_per_run': sum(e['count'] for e in phase['endpoints'].values()) / runs,
+                'weight_per_run': sum(e['weight'] for e in phase['endpoints'].values()) / runs,
+                'peak_memory_kb': phase['peak_bytes'] / 1024,
+                'endpoints': {
+                    key: {'count': e['count'] / runs, 'weight': e['weight'] / runs, 'errors': e['errors'] / runs}
+                    for key, e in sorted(phase['endpoints'].items())
+                },
+            }
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'wall_time_s': wall_time,
+            'calibration_ms': calibration_ms,
+            'peak_memory_kb': overall_peak / 1024,
+            'phases': phases,
+        }
+
+
+def compare_to_baseline(report, baseline):
+    """
+    Compara o relatório com o baseline. Retorna a lista de regressões encontradas.
+    Latência em múltiplos da unidade de referência de cada máquina (calibration_ms).
+    """
+    regressions = []
+    base_unit = baseline.get('calibration_ms')
+    unit = report.get('calibration_ms')
+    if not base_unit or not unit:
+        print("Baseline sem calibração: latências não comparadas (grave um novo com --save-baseline).")
+    for name, base in baseline.get('phases', {}).items():
+        current = report['phases'].get(name)
+        if current is None:
+            regressions.append(f"{name}: fase não executada")
+            continue
+
+        if base_unit and unit:
+            base_p50 = base['latency_ms']['p50'] / base_unit
+            current_p50 = current['latency_ms']['p50'] / unit
+            if base_p50 > 0 and current_p50 > base_p50 * (1 + WALL_TIME_TOLERANCE):
+                regressions.append(f"{name}: p50 {current_p50:.1f}x a referência > baseline {base_p50:.1f}x")
+
+        if current['requests_per_run'] > base['requests_per_run']:
+            regressions.append(f"{name}: {current['requests_per_run']:.1f} requisições/ciclo > baseline {base['requests_per_run']:.1f}")
+
+        if current['weight_per_run'] > base['weight_per_run']:
+            regressions.append(f"{name}: peso {current['weight_per_run']:.1f}/ciclo > baseline {base['weight_per_run']:.1f}")
+
+        base_mem = base['peak_memory_kb']
+        if base_mem > 0 and current['peak_memory_kb'] > base_mem * (1 + MEMORY_TOLERANCE):
+            regressions.append(f"{name}: memória {current['peak_memory_kb']:.0f}KB > baseline {base_mem:.0f}KB")
+
+    return regressions
+
+
+def print_report(report):
+    unit = report['calibration_ms']
+    print(f"Tempo total: {report['wall_time_s']:.2f}s | Pico de memória: {report['peak_memory_kb']:.0f}KB "
+          f"| Referência: {unit:.2f}ms por requisição mínima")
+    for name, phase in report['phases'].items():
+        lat = phase['latency_ms']
+        print(
+            f"\n[{name}] {phase['runs']} execuções | p50 {lat['p50']:.1f}ms p90 {lat['p90']:.1f}ms "
+            f"p99 {lat['p99']:.1f}ms máx {lat['max']:.1f}ms ({lat['p50'] / unit:.1f}x a referência) | {phase['requests_per_run']:.1f} req "
+            f"| peso {phase['weight_per_run']:.1f} | memória {phase['peak_memory_kb']:.0f}KB"
+        )
+        for endpoint, e in phase['endpoints'].items():
+            print(f"    {endpoint:<45} {e['count']:>6.1f} req  peso {e['weight']:>7.1f}  erros {e['errors']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos ciclos de scan/entrada/monitoramento/fechamento.")
+    parser.add_argument('--scenario', help="JSON de cenário para a exchange local (dados gravados ou sintéticos)")
+    parser.add_argument('--base-url', help="Usa uma exchange local já em execução em vez de subir uma")
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--monitor-cycles', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Grava o resultado como novo baseline")
+    parser.add_argument('--output', help="Grava o relatório completo em JSON")
+    args = parser.parse_args()
+
+    import tools.exchanges
+    from tools.strategy import CashAndCarryBot
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        scenario = None
+        if args.scenario:
+            with open(args.scenario, 'r') as f:
+                scenario = json.load(f)
+        server, _, _ = run_fake_exchange(scenario, port=0)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Todos os clientes do bot passam a apontar para a exchange local
+    tools.exchanges.EXCHANGE_BASE_URL = base_url
+
+    workdir = tempfile.mkdtemp(prefix="bot_bench_")
+    bot = CashAndCarryBot(state_file=os.path.join(workdir, "bot_state.json"))
+    db_manager = DataManager(db_name=os.path.join(workdir, "bench.db"))
+
+    recorder = ApiCallRecorder()
+    recorder.attach(bot.exchange_spot, 'spot')
+    recorder.attach(bot.exchange_swap, 'swap')
+
+    try:
+        report = CycleBenchmark(bot, db_manager, recorder).run(args.iterations, args.monitor_cycles)
+    finally:
+        db_manager.close()
+        if server:
+            server.shutdown()
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        # Sem baseline (ex: primeira execução num host novo): o resultado vira o baseline
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nBaseline salvo em {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            regressions = compare_to_baseline(report, json.load(f))
+        if regressions:
+            print("\nREGRESSÕES DETECTADAS:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nSem regressões em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
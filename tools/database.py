@@ -1,7 +1,18 @@
+import os
 import sqlite3
 import json
+import threading
 from datetime import datetime
-from configs.config import LOGGER
+from configs.config import LOGGER, PAPER_TRADING
+from tools.metrics import DB_WRITE_LATENCY
+from tools.tracing import traced
+
+def monthly_db_path(month, db_dir="databases"):
+    """Banco do mês (mm-aaaa). Paper trading grava em bancos separados (o diário simulado não se mistura ao real)."""
+    os.makedirs(db_dir, exist_ok=True)
+    prefix = "database_paper" if PAPER_TRADING else "database"
+    return os.path.join(db_dir, f"{prefix}_{month}.db")
+
 
 class DataManager:
     def __init__(self, db_name):
@@ -11,6 +22,9 @@ class DataManager:
         """
         self.db_name = db_name
         self.conn = None
+        # Conexão compartilhada entre threads (loop principal, Guardião, varredura, pernas paralelas):
+        # toda escrita/leitura passa pelo lock
+        self.lock = threading.Lock()
         self._connect()
         self._create_tables()
 
@@ -22,7 +36,8 @@ class DataManager:
 
     def close(self):
         if self.conn:
-            self.conn.close()
+            with self.lock:
+                self.conn.close()
 
     def _create_tables(self):
         try:
@@ -57,52 +72,257 @@ class DataManager:
                     action TEXT
                 )
             ''')
+
+            # Tabela de Funding Liquidado (Ledger do /fapi/v1/income, sem duplicatas por tran_id)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS funding_income (
+                    tran_id TEXT PRIMARY KEY,
+                    timestamp INTEGER,
+                    symbol TEXT,
+                    amount REAL,
+                    asset TEXT
+                )
+            ''')
+
+            # Diário de Execução (uma linha por ordem enviada, inclusive emergência, rollback e dust)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS executions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    operation TEXT,
+                    market TEXT,
+                    symbol TEXT,
+                    side TEXT,
+                    order_type TEXT,
+                    order_id TEXT,
+                    status TEXT,
+                    amount REAL,
+                    filled REAL,
+                    fill_ratio REAL,
+                    best_price REAL,
+                    intended_price REAL,
+                    limit_price REAL,
+                    avg_price REAL,
+                    predicted_slippage REAL,
+                    achieved_slippage REAL,
+                    fee_usd REAL,
+                    fee_cost REAL,
+                    fee_currency TEXT,
+                    latency_ms REAL,
+                    rollback_cost REAL,
+                    error TEXT
+                )
+            ''')
+
+            # Agregados incrementais por (operação, mercado, lado): atualizados a cada ordem,
+            # sem reler o diário
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS execution_stats (
+                    operation TEXT,
+                    market TEXT,
+                    side TEXT,
+                    orders INTEGER DEFAULT 0,
+                    failures INTEGER DEFAULT 0,
+                    sum_fill_ratio REAL DEFAULT 0,
+                    priced INTEGER DEFAULT 0,
+                    sum_predicted_slippage REAL DEFAULT 0,
+                    sum_achieved_slippage REAL DEFAULT 0,
+                    sum_sq_slippage_error REAL DEFAULT 0,
+                    sum_fee_usd REAL DEFAULT 0,
+                    sum_latency_ms REAL DEFAULT 0,
+                    max_latency_ms REAL DEFAULT 0,
+                    sum_rollback_cost REAL DEFAULT 0,
+                    PRIMARY KEY (operation, market, side)
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE VIEW IF NOT EXISTS execution_quality AS
+                SELECT
+                    operation, market, side, orders, failures,
+                    sum_fill_ratio / orders AS avg_fill_ratio,
+                    sum_predicted_slippage / NULLIF(priced, 0) AS avg_predicted_slippage,
+                    sum_achieved_slippage / NULLIF(priced, 0) AS avg_achieved_slippage,
+                    (sum_achieved_slippage - sum_predicted_slippage) / NULLIF(priced, 0) AS avg_slippage_error,
+                    sum_sq_slippage_error / NULLIF(priced, 0) AS mse_slippage_error,
+                    sum_fee_usd AS total_fee_usd,
+                    sum_latency_ms / orders AS avg_latency_ms,
+                    max_latency_ms,
+                    sum_rollback_cost AS total_rollback_cost
+                FROM execution_stats
+                WHERE orders > 0
+            ''')
+
             self.conn.commit()
         except Exception as e:
             LOGGER.error(f"Erro ao criar tabelas: {e}")
 
+    @traced('sqlite.scan_logs')
     def log_scan_attempt(self, data):
         """
         Registra o resultado de um scanner de mercado.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO scan_logs (total_analyzed, passed_volume, best_funding, best_pair, reason)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                data.get('total_analyzed', 0),
-                data.get('passed_volume', 0),
-                data.get('best_funding', 0.0),
-                str(data.get('best_pair', 'N/A')),
-                data.get('reason', 'UNKNOWN')
-            ))
-            self.conn.commit()
+            with DB_WRITE_LATENCY.labels(table='scan_logs').time(), self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    INSERT INTO scan_logs (total_analyzed, passed_volume, best_funding, best_pair, reason)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (
+                    data.get('total_analyzed', 0),
+                    data.get('passed_volume', 0),
+                    data.get('best_funding', 0.0),
+                    str(data.get('best_pair', 'N/A')),
+                    data.get('reason', 'UNKNOWN')
+                ))
+                self.conn.commit()
         except Exception as e:
             LOGGER.error(f"Erro ao logar scan: {e}")
 
+    @traced('sqlite.position_logs')
     def log_state(self, data):
         """
         Registra o estado financeiro atual da posição.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO position_logs (
-                    symbol, price_swap, funding_rate, next_funding_time, 
-                    position_size, simulated_fees, accumulated_profit, max_drawdown, action
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.get('symbol'),
-                data.get('price_swap'),
-                data.get('funding_rate'),
-                data.get('next_funding_time'),
-                data.get('position_size'),
-                data.get('simulated_fees'),
-                data.get('accumulated_profit'),
-                data.get('max_drawdown'),
-                data.get('action')
-            ))
-            self.conn.commit()
+            with DB_WRITE_LATENCY.labels(table='position_logs').time(), self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    INSERT INTO position_logs (
+                        symbol, price_swap, funding_rate, next_funding_time, 
+                        position_size, simulated_fees, accumulated_profit, max_drawdown, action
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data.get('symbol'),
+                    data.get('price_swap'),
+                    data.get('funding_rate'),
+                    data.get('next_funding_time'),
+                    data.get('position_size'),
+                    data.get('simulated_fees'),
+                    data.get('accumulated_profit'),
+                    data.get('max_drawdown'),
+                    data.get('action')
+                ))
+                self.conn.commit()
+        except Exception as e:
+            LOGGER.error(f"Erro ao logar estado: {e}")
+
+    @traced('sqlite.funding_income')
+    def log_funding_income(self, records):
+        """
+        Registra pagamentos de funding liquidados (registros repetidos são ignorados).
+        """
+        if not records:
+            return
+        try:
+            with DB_WRITE_LATENCY.labels(table='funding_income').time(), self.lock:
+                cursor = self.conn.cursor()
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO funding_income (tran_id, timestamp, symbol, amount, asset)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (r['tran_id'], r['timestamp'], r['symbol'], r['amount'], r['asset'])
+                    for r in records
+                ])
+                self.conn.commit()
+        except Exception as e:
+            LOGGER.error(f"Erro ao logar funding: {e}")
+
+    def recent_ioc_fills(self, limit):
+        """
+        Últimas ordens IOC planejadas pelo livro (mais antigas primeiro), para recalibrar as bandas de preço.
+        """
+        try:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    SELECT symbol, side, amount, filled, limit_price, intended_price, avg_price FROM executions
+                    WHERE order_type = 'limit_ioc' AND intended_price > 0 AND amount > 0
+                    ORDER BY id DESC LIMIT ?
+                ''', (limit,))
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return rows[::-1]
+        except Exception as e:
+            LOGGER.error(f"Erro ao consultar o diário de execução: {e}")
+            return []
+
+    def traded_symbols(self, operations):
+        """
+        Símbolos com ordens das operações informadas no diário de execução do mês.
+        """
+        try:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute(
+                    f"SELECT DISTINCT symbol FROM executions WHERE operation IN ({', '.join('?' * len(operations))})",
+                    tuple(operations)
+                )
+                return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            LOGGER.error(f"Erro ao consultar o diário de execução: {e}")
+            return set()
+
+    @traced('sqlite.executions')
+    def log_execution(self, data):
+        """
+        Registra uma ordem no diário de execução e atualiza os agregados incrementais.
+        """
+        try:
+            with DB_WRITE_LATENCY.labels(table='executions').time(), self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    INSERT INTO executions (
+                        operation, market, symbol, side, order_type, order_id, status, amount, filled, fill_ratio,
+                        best_price, intended_price, limit_price, avg_price, predicted_slippage, achieved_slippage,
+                        fee_usd, fee_cost, fee_currency, latency_ms, rollback_cost, error
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data.get('operation'), data.get('market'), data.get('symbol'), data.get('side'),
+                    data.get('order_type'), data.get('order_id'), data.get('status'),
+                    data.get('amount'), data.get('filled'), data.get('fill_ratio'),
+                    data.get('best_price'), data.get('intended_price'), data.get('limit_price'), data.get('avg_price'),
+                    data.get('predicted_slippage'), data.get('achieved_slippage'),
+                    data.get('fee_usd'), data.get('fee_cost'), data.get('fee_currency'),
+                    data.get('latency_ms'), data.get('rollback_cost'), data.get('error')
+                ))
+
+                predicted = data.get('predicted_slippage')
+                achieved = data.get('achieved_slippage')
+                priced = predicted is not None and achieved is not None
+                error = (achieved - predicted) if priced else 0.0
+                latency = data.get('latency_ms') or 0.0
+
+                cursor.execute('''
+                    INSERT INTO execution_stats (operation, market, side) VALUES (?, ?, ?)
+                    ON CONFLICT (operation, market, side) DO NOTHING
+                ''', (data.get('operation'), data.get('market'), data.get('side')))
+                cursor.execute('''
+                    UPDATE execution_stats SET
+                        orders = orders + 1,
+                        failures = failures + ?,
+                        sum_fill_ratio = sum_fill_ratio + ?,
+                        priced = priced + ?,
+                        sum_predicted_slippage = sum_predicted_slippage + ?,
+                        sum_achieved_slippage = sum_achieved_slippage + ?,
+                        sum_sq_slippage_error = sum_sq_slippage_error + ?,
+                        sum_fee_usd = sum_fee_usd + ?,
+                        sum_latency_ms = sum_latency_ms + ?,
+                        max_latency_ms = MAX(max_latency_ms, ?),
+                        sum_rollback_cost = sum_rollback_cost + ?
+                    WHERE operation = ? AND market = ? AND side = ?
+                ''', (
+                    1 if data.get('error') else 0,
+                    data.get('fill_ratio') or 0.0,
+                    1 if priced else 0,
+                    predicted if priced else 0.0,
+                    achieved if priced else 0.0,
+                    error * error,
+                    data.get('fee_usd') or 0.0,
+                    latency, latency,
+                    data.get('rollback_cost') or 0.0,
+                    data.get('operation'), data.get('market'), data.get('side')
+                ))
+                self.conn.commit()
         except Exception as e:
-            LOGGER.error(f"Erro ao logar estado: {e}")
\ No newline at end of file
+            LOGGER.error(f"Erro ao logar execução: {e}")
@@ -0,0 +1,90 @@
+import ccxt
+from urllib.parse import urlsplit
+from configs.config import *
+from tools.rate_governor import GOVERNOR, PRIORITY_SCAN
+from tools.metrics import instrument_client
+from tools.http_pool import http_session
+from tools.resilience import RESILIENCE
+
+
+def create_client(default_type, exchange_id=EXCHANGE_ID, base_url=None, priority=PRIORITY_SCAN, label=None, lane='shared', governed=True, **overrides):
+    """
+    Cria um cliente CCXT com as credenciais do config, governado pelo RequestGovernor.
+
+    Args:
+        default_type (str): 'spot' ou 'swap'.
+        priority (int): Prioridade padrão das requisições do cliente no governador.
+        label (str, optional): Nome do cliente nas métricas (padrão: default_type).
+        lane (str): Faixa do pool HTTP ('shared' ou 'guardian'). Clientes da mesma faixa
+                    reaproveitam as mesmas conexões keep-alive.
+        base_url (str, optional): Redireciona todas as APIs para outro host
+                                  (ex: exchange local do tools/fake_exchange.py).
+                                  Se None, usa EXCHANGE_BASE_URL do config.
+        governed (bool): Coloca o cliente sob o governador (pesos e limites da conta Binance).
+                         False mantém o rate limiter do próprio CCXT (ex: outras exchanges do scanner).
+        overrides: Chaves extras da configuração CCXT (ex: rateLimit).
+    """
+    options = {'defaultType': default_type}
+    options.update(overrides.pop('options', {}))
+
+    config = {
+        'apiKey': API_KEY,
+        'secret': API_SECRET,
+        'enableRateLimit': True,
+        'session': http_session(lane),
+        **overrides,
+        'options': options
+    }
+
+    base_url = base_url or EXCHANGE_BASE_URL
+
+    if base_url:
+        # A exchange local não valida assinatura, mas o CCXT exige credenciais nas rotas privadas
+        config['apiKey'] = config['apiKey'] or 'local'
+        config['secret'] = config['secret'] or 'local'
+        # Evita rotas que a exchange local não implementa (moedas, opções, contratos inversos)
+        options.setdefault('fetchCurrencies', False)
+        options.setdefault('fetchMargins', False)
+        options.setdefault('fetchMarkets', {'types': ['spot', 'linear']})
+
+    client = getattr(ccxt, exchange_id)(config)
+
+    if base_url:
+        point_to_base_url(client, base_url)
+
+    # Mede só o tempo de rede: a espera na fila do governador fica fora do histograma
+    instrument_client(client, label or default_type)
+    # O governador substitui o rate limiter fixo do CCXT (respeita o peso real por endpoint)
+    if governed:
+        GOVERNOR.attach(client, default_priority=priority)
+    # Disjuntores e retries por fora do governador: chamada barrada não espera na fila.
+    # Clientes da exchange principal compartilham o escopo 'home'; cada venue do scanner tem o seu
+    RESILIENCE.attach(client, scope='home' if governed else (label or exchange_id), priority=priority)
+
+    return client
+
+
+def point_to_base_url(client, base_url):
+    """
+    Troca esquema e host de todas as URLs de API do cliente, mantendo os caminhos
+    (/api/v3, /sapi/v1, /fapi/v1...). Assim um único servidor local atende Spot e Futuros.
+    """
+    target = urlsplit(base_url)
+
+    def _rewrite(urls):
+        for key, value in urls.items():
+            if isinstance(value, dict):
+                _rewrite(value)
+            elif isinstance(value, str) and value.startswith('http'):
+                path = urlsplit(value).path
+                urls[key] = f"{target.scheme}://{target.netloc}{path}"
+
+    _rewrite(client.urls['api'])
+    return client
+
+
+def ping(client):
+    """Requisição mínima (peso 1) ao produto do cliente: abre/mantém a conexão do pool quente."""
+    if client.options.get('defaultType') == 'spot':
+        return client.publicGetPing()
+    return client.fapiPublicGetPing()
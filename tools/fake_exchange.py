@@ -0,0 +1,857 @@
+import json
+import math
+import time
+import base64
+import random
+import socket
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from configs.config import LOGGER
+from tools.api_accounting import endpoint_weight, endpoint_pool
+
+# Cenário padrão: alguns pares líquidos + um contrato com multiplicador (1000PEPE)
+DEFAULT_SCENARIO = {
+    'time_scale': 1.0,                  # 1.0 = tempo real; 3600 = 1h de cenário por segundo
+    'funding_interval_hours': 8,
+    'latency_ms': 0,
+    'jitter_ms': 0,
+    'error_rate': 0.0,                  # Probabilidade global de erro por requisição
+    'errors': {},                       # Por rota: {"/fapi/v1/order": {"rate": 0.1, "status": 503}}
+    'fill_ratio': 1.0,                  # Fração máxima preenchida em ordens IOC (simula parciais)
+    'balances': {'spot': {'USDT': 1000.0}, 'future': {'USDT': 1000.0}},
+    'fees': {'spot': 0.001, 'swap': 0.0004},  # Swap igual ao tier 0 que o CCXT reporta
+    'symbols': {
+        'BTC': {'price': 60000.0, 'funding': 0.0003, 'basis': 0.0008, 'volume': 2_000_000_000},
+        'ETH': {'price': 3000.0, 'funding': 0.00025, 'basis': 0.0006, 'volume': 1_000_000_000},
+        'SOL': {'price': 150.0, 'funding': 0.0008, 'basis': 0.0005, 'volume': 400_000_000},
+        'DOGE': {'price': 0.15, 'funding': 0.0001, 'basis': 0.0003, 'volume': 150_000_000},
+        'PEPE': {'price': 0.00001, 'funding': 0.001, 'basis': 0.0009, 'volume': 300_000_000, 'swap_multiplier': 1000},
+    }
+}
+
+class FakeExchangeError(Exception):
+    """Erro de negócio devolvido no formato da Binance ({code, msg})."""
+    def __init__(self, status, code, msg):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class FakeExchange:
+    """
+    Estado e motor de casamento da exchange local.
+
+    Gera livros sintéticos a partir dos caminhos de preço/funding do cenário,
+    casa ordens LIMIT IOC e MARKET contra esses livros, mantém saldos Spot/Futuros,
+    posições Short e liquida o funding a cada fronteira de intervalo.
+    """
+    def __init__(self, scenario=None):
+        self.scenario = json.loads(json.dumps(DEFAULT_SCENARIO))
+        self.scenario.update(scenario or {})
+        self.lock = threading.RLock()
+        self.start_time = time.time()
+        self.rng = random.Random(self.scenario.get('seed'))
+
+        self.spot_balances = dict(self.scenario['balances'].get('spot', {}))
+        self.future_balances = dict(self.scenario['balances'].get('future', {}))
+        self.positions = {}          # {swap_id: {'qty': float (negativo = short), 'entry': float}}
+        self.income = []
+        self.funding_history = {}    # {swap_id: [(time_ms, rate, mark)]}
+        self.order_seq = 1000
+        self.tran_seq = 5000
+        self.weight_used = {}        # {(spot/futures, minuto): peso}
+
+        interval_ms = self.scenario['funding_interval_hours'] * 3600 * 1000
+        self.interval_ms = interval_ms
+        self.last_settlement_ms = (self._now_ms() // interval_ms) * interval_ms
+
+        self.markets = {}
+        for base, spec in self.scenario['symbols'].items():
+            multiplier = spec.get('swap_multiplier', 1)
+            swap_base = f"{multiplier}{base}" if multiplier != 1 else base
+            self.markets[base] = {
+                'spec': spec,
+                'base': base,
+                'spot_id': f"{base}USDT",
+                'swap_id': f"{swap_base}USDT",
+                'swap_base': swap_base,
+                'multiplier': multiplier,
+            }
+            self.spot_balances.setdefault(base, 0.0)
+
+        self.by_spot_id = {m['spot_id']: m for m in self.markets.values()}
+        self.by_swap_id = {m['swap_id']: m for m in self.markets.values()}
+        self._seed_funding_history()
+
+    # --- Relógio e caminhos de cenário ---
+
+    def _now_ms(self):
+        """Tempo do cenário (acelerado por time_scale) em milissegundos."""
+        elapsed = (time.time() - self.start_time) * self.scenario.get('time_scale', 1.0)
+        return int((self.start_time + elapsed) * 1000)
+
+    def _elapsed(self):
+        return (self._now_ms() / 1000) - self.start_time
+
+    def _path_value(self, spec, field, column):
+        """
+        Interpola linearmente o caminho scriptado: path = [[segundos, preço, funding], ...].
+        Sem caminho, usa o valor fixo do cenário.
+        """
+        path = spec.get('path')
+        if not path:
+            return spec[field]
+
+        t = self._elapsed()
+        if t <= path[0][0]:
+            return path[0][column]
+        for (t0, *v0), (t1, *v1) in zip(path, path[1:]):
+            if t0 <= t <= t1:
+                w = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+                return v0[column - 1] + (v1[column - 1] - v0[column - 1]) * w
+        return path[-1][column]
+
+    def spot_price(self, market):
+        return self._path_value(market['spec'], 'price', 1)
+
+    def swap_price(self, market):
+        basis = market['spec'].get('basis', 0.0)
+        return self.spot_price(market) * (1 + basis) * market['multiplier']
+
+    def funding_rate(self, market):
+        return self._path_value(market['spec'], 'funding', 2)
+
+    def next_funding_ms(self):
+        return self.last_settlement_ms + self.interval_ms
+
+    # --- Livros sintéticos ---
+
+    def order_book(self, market, swap, limit=50):
+        """
+        Livro determinístico em torno do preço atual: spread fixo e níveis
+        com profundidade crescente (depth_usd por nível, padrão 1% do volume / 1000).
+        """
+        mid = self.swap_price(market) if swap else self.spot_price(market)
+        spec = market['spec']
+        spread = spec.get('spread', 0.0002)
+        step = spec.get('level_step', 0.0001)
+        depth_usd = spec.get('depth_usd', spec.get('volume', 1_000_000) / 100_000)
+
+        bids, asks = [], []
+        for i in range(limit):
+            qty = depth_usd * (1 + i * 0.5) / mid
+            bids.append([mid * (1 - spread / 2 - i * step), qty])
+            asks.append([mid * (1 + spread / 2 + i * step), qty])
+        return bids, asks
+
+    # --- Motor de Casamento ---
+
+    def match(self, market, swap, side, amount, limit_price=None):
+        """
+        Casa uma ordem contra o livro sintético.
+        IOC: consome níveis até o preço limite e cancela o resto.
+        MARKET (limit_price None): consome o livro inteiro, estendendo o último nível.
+        Retorna (quantidade executada, custo em USDT).
+        """
+        bids, asks = self.order_book(market, swap, limit=50)
+        book = asks if side == 'buy' else bids
+        max_fill = amount * self.scenario.get('fill_ratio', 1.0) if limit_price is not None else amount
+
+        filled = 0.0
+        cost = 0.0
+        for price, qty in book:
+            if limit_price is not None:
+                if side == 'buy' and price > limit_price:
+                    break
+                if side == 'sell' and price < limit_price:
+                    break
+            take = min(qty, max_fill - filled)
+            filled += take
+            cost += take * price
+            if filled >= max_fill:
+                break
+
+        if limit_price is None and filled < amount:
+            last_price = book[-1][0]
+            cost += (amount - filled) * last_price
+            filled = amount
+
+        return filled, cost
+
+    def place_order(self, swap, params):
+        """
+        Executa uma ordem (POST /api/v3/order ou /fapi/v1/order) e atualiza saldos/posições.
+        """
+        with self.lock:
+            self.settle_funding()
+            symbol_id = params.get('symbol')
+            market = (self.by_swap_id if swap else self.by_spot_id).get(symbol_id)
+            if market is None:
+                raise FakeExchangeError(400, -1121, "Invalid symbol.")
+
+            side = params.get('side', '').lower()
+            order_type = params.get('type', 'LIMIT').upper()
+            amount = float(params.get('quantity', 0))
+            limit_price = float(params['price']) if order_type == 'LIMIT' else None
+
+            if amount <= 0:
+                raise FakeExchangeError(400, -1013, "Filter failure: LOT_SIZE")
+
+            mid = self.swap_price(market) if swap else self.spot_price(market)
+            if amount * mid < 5.0:
+                raise FakeExchangeError(400, -1013, "Filter failure: MIN_NOTIONAL")
+
+            filled, cost = self.match(market, swap, side, amount, limit_price)
+            fee_rate = self.scenario['fees']['swap' if swap else 'spot']
+            fee = cost * fee_rate
+
+            if swap:
+                self._apply_swap_fill(market, side, filled, cost, fee)
+            else:
+                self._apply_spot_fill(market, side, filled, cost, fee)
+
+            self.order_seq += 1
+            avg = cost / filled if filled > 0 else 0.0
+            status = 'FILLED' if filled >= amount else 'EXPIRED'
+            return self._order_response(swap, symbol_id, params, self.order_seq, amount, filled, cost, avg, fee, status)
+
+    def _apply_spot_fill(self, market, side, filled, cost, fee):
+        base = market['base']
+        if side == 'buy':
+            if self.spot_balances.get('USDT', 0.0) < cost + fee:
+                raise FakeExchangeError(400, -2010, "Account has insufficient balance for requested action.")
+            self.spot_balances['USDT'] -= cost + fee
+            self.spot_balances[base] = self.spot_balances.get(base, 0.0) + filled
+        else:
+            if self.spot_balances.get(base, 0.0) + 1e-12 < filled:
+                raise FakeExchangeError(400, -2010, "Account has insufficient balance for requested action.")
+            self.spot_balances[base] -= filled
+            self.spot_balances['USDT'] = self.spot_balances.get('USDT', 0.0) + cost - fee
+
+    def _apply_swap_fill(self, market, side, filled, cost, fee):
+        if filled <= 0:
+            return
+        pos = self.positions.setdefault(market['swap_id'], {'qty': 0.0, 'entry': 0.0})
+        signed = filled if side == 'buy' else -filled
+        price = cost / filled
+        realized = 0.0
+
+        # Reduzindo posição: realiza PnL sobre a parte fechada
+        if pos['qty'] != 0 and (pos['qty'] > 0) != (signed > 0):
+            closing = min(abs(signed), abs(pos['qty']))
+            direction = 1 if pos['qty'] > 0 else -1
+            realized = (price - pos['entry']) * closing * direction
+            new_qty = pos['qty'] + signed
+            if abs(new_qty) < 1e-12:
+                pos['qty'], pos['entry'] = 0.0, 0.0
+            elif (new_qty > 0) == (pos['qty'] > 0):
+                pos['qty'] = new_qty
+            else:
+                pos['qty'], pos['entry'] = new_qty, price
+        else:
+            total = abs(pos['qty']) + filled
+            pos['entry'] = (pos['entry'] * abs(pos['qty']) + price * filled) / total
+            pos['qty'] += signed
+
+        self.future_balances['USDT'] = self.future_balances.get('USDT', 0.0) + realized - fee
+
+    def _order_response(self, swap, symbol_id, params, order_id, amount, filled, cost, avg, fee, status):
+        now = self._now_ms()
+        common = {
+            'symbol': symbol_id,
+            'orderId': order_id,
+            'clientOrderId': params.get('newClientOrderId', f"fake{order_id}"),
+            'price': params.get('price', '0'),
+            'origQty': str(amount),
+            'executedQty': str(filled),
+            'status': status,
+            'timeInForce': params.get('timeInForce', 'GTC'),
+            'type': params.get('type', 'LIMIT').upper(),
+            'side': params.get('side', '').upper(),
+        }
+        if swap:
+            return {
+                **common,
+                'avgPrice': str(avg),
+                'cumQty': str(filled),
+                'cumQuote': str(cost),
+                'reduceOnly': False,
+                'closePosition': False,
+                'positionSide': 'BOTH',
+                'stopPrice': '0',
+                'workingType': 'CONTRACT_PRICE',
+                'origType': common['type'],
+                'updateTime': now,
+            }
+        return {
+            **common,
+            'orderListId': -1,
+            'transactTime': now,
+            'cummulativeQuoteQty': str(cost),
+            'fills': [{
+                'price': str(avg), 'qty': str(filled), 'commission': str(fee),
+                'commissionAsset': 'USDT', 'tradeId': order_id
+            }] if filled > 0 else [],
+        }
+
+    # --- Funding ---
+
+    def _seed_funding_history(self):
+        """Histórico retroativo (100 períodos) usando o funding inicial de cada par."""
+        for market in self.markets.values():
+            rate = self.funding_rate(market)
+            mark = self.swap_price(market)
+            self.funding_history[market['swap_id']] = [
+                (self.last_settlement_ms - i * self.interval_ms, rate, mark) for i in range(100, 0, -1)
+            ]
+
+    def settle_funding(self):
+        """
+        Liquida todas as fronteiras de funding vencidas: registra o histórico
+        e credita/debita o funding das posições abertas (Short recebe com funding positivo).
+        """
+        with self.lock:
+            now = self._now_ms()
+            while now >= self.next_funding_ms():
+                self.last_settlement_ms = self.next_funding_ms()
+                for market in self.markets.values():
+                    rate = self.funding_rate(market)
+                    mark = self.swap_price(market)
+                    self.funding_history[market['swap_id']].append((self.last_settlement_ms, rate, mark))
+
+                    pos = self.positions.get(market['swap_id'])
+                    if pos and pos['qty'] != 0:
+                        payment = -pos['qty'] * mark * rate
+                        self.future_balances['USDT'] = self.future_balances.get('USDT', 0.0) + payment
+                        self.tran_seq += 1
+                        self.income.append({
+                            'symbol': market['swap_id'], 'incomeType': 'FUNDING_FEE',
+                            'income': str(payment), 'asset': 'USDT', 'info': 'FUNDING_FEE',
+                            'time': self.last_settlement_ms, 'tranId': self.tran_seq, 'tradeId': ''
+                        })
+
+    # --- Transferências e contas ---
+
+    def transfer(self, params):
+        with self.lock:
+            asset = params.get('asset', 'USDT')
+            amount = float(params.get('amount', 0))
+            kind = params.get('type')
+            if kind == 'MAIN_UMFUTURE':
+                source, target = self.spot_balances, self.future_balances
+            elif kind == 'UMFUTURE_MAIN':
+                source, target = self.future_balances, self.spot_balances
+            else:
+                raise FakeExchangeError(400, -1100, f"Unsupported transfer type {kind}")
+            if source.get(asset, 0.0) + 1e-9 < amount:
+                raise FakeExchangeError(400, -5002, "You have insufficient balance.")
+            source[asset] -= amount
+            target[asset] = target.get(asset, 0.0) + amount
+            self.tran_seq += 1
+            return {'tranId': self.tran_seq}
+
+    def unrealized_pnl(self, market, pos):
+        return (self.swap_price(market) - pos['entry']) * pos['qty']
+
+    def liquidation_price(self, market, pos):
+        """
+        Aproximação de margem cruzada: o Short é liquidado quando a perda consome
+        95% do saldo de Futuros.
+        """
+        if pos['qty'] == 0:
+            return 0.0
+        wallet = self.future_balances.get('USDT', 0.0)
+        return max(pos['entry'] - (wallet * 0.95) / pos['qty'], 0.0)
+
+    def weight_header(self, method, url):
+        """Acumula o peso usado no minuto corrente (Spot e Futuros contam separado)."""
+        key = (endpoint_pool(url), int(time.time() // 60))
+        with self.lock:
+            self.weight_used[key] = self.weight_used.get(key, 0) + endpoint_weight(method, url)
+            return self.weight_used[key]
+
+    # --- Respostas das rotas ---
+
+    def _precision(self, price):
+        tick = 10 ** (math.floor(math.log10(price)) - 4)
+        step = min(max(10 ** math.floor(math.log10(1 / price)), 1e-8), 1.0)
+        return tick, step
+
+    @staticmethod
+    def _fmt(value):
+        return f"{value:.10f}".rstrip('0').rstrip('.') or '0'
+
+    def spot_exchange_info(self):
+        symbols = []
+        for base, market in self.markets.items():
+            tick, step = self._precision(self.spot_price(market))
+            symbols.append({
+                'symbol': market['spot_id'], 'status': 'TRADING',
+                'baseAsset': base, 'baseAssetPrecision': 8,
+                'quoteAsset': 'USDT', 'quotePrecision': 8, 'quoteAssetPrecision': 8,
+                'orderTypes': ['LIMIT', 'MARKET'], 'icebergAllowed': True, 'ocoAllowed': True,
+                'isSpotTradingAllowed': True, 'isMarginTradingAllowed': False,
+                'permissions': ['SPOT'], 'permissionSets': [['SPOT']],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': self._fmt(tick), 'maxPrice': '1000000', 'tickSize': self._fmt(tick)},
+                    {'filterType': 'LOT_SIZE', 'minQty': self._fmt(step), 'maxQty': '90000000000', 'stepSize': self._fmt(step)},
+                    {'filterType': 'NOTIONAL', 'minNotional': '5', 'maxNotional': '9000000'},
+                ]
+            })
+        return {'timezone': 'UTC', 'serverTime': self._now_ms(), 'rateLimits': [], 'symbols': symbols}
+
+    def swap_exchange_info(self):
+        symbols = []
+        for market in self.markets.values():
+            tick, step = self._precision(self.swap_price(market))
+            symbols.append({
+                'symbol': market['swap_id'], 'pair': market['swap_id'], 'contractType': 'PERPETUAL',
+                'deliveryDate': 4133404800000, 'onboardDate': 1569398400000, 'status': 'TRADING',
+                'baseAsset': market['swap_base'], 'quoteAsset': 'USDT', 'marginAsset': 'USDT',
+                'pricePrecision': max(0, -int(math.log10(tick))), 'quantityPrecision': max(0, -int(math.log10(step))),
+                'baseAssetPrecision': 8, 'quotePrecision': 8, 'underlyingType': 'COIN',
+                'fundingIntervalHours': self.scenario['funding_interval_hours'],
+                'orderTypes': ['LIMIT', 'MARKET'], 'timeInForce': ['GTC', 'IOC', 'FOK'],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': self._fmt(tick), 'maxPrice': '1000000', 'tickSize': self._fmt(tick)},
+                    {'filterType': 'LOT_SIZE', 'minQty': self._fmt(step), 'maxQty': '90000000000', 'stepSize': self._fmt(step)},
+                    {'filterType': 'MARKET_LOT_SIZE', 'minQty': self._fmt(step), 'maxQty': '90000000000', 'stepSize': self._fmt(step)},
+                    {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+                ]
+            })
+        return {'timezone': 'UTC', 'serverTime': self._now_ms(), 'rateLimits': [], 'assets': [], 'symbols': symbols}
+
+    def ticker_24hr(self, swap, symbol_id=None):
+        now = self._now_ms()
+        rows = []
+        for market in self.markets.values():
+            sid = market['swap_id'] if swap else market['spot_id']
+            if symbol_id and sid != symbol_id:
+                continue
+            price = self.swap_price(market) if swap else self.spot_price(market)
+            bids, asks = self.order_book(market, swap, limit=1)
+            volume_usd = market['spec'].get('volume', 0)
+            row = {
+                'symbol': sid, 'priceChange': '0', 'priceChangePercent': '0',
+                'weightedAvgPrice': self._fmt(price), 'lastPrice': self._fmt(price), 'lastQty': '1',
+                'openPrice': self._fmt(price), 'highPrice': self._fmt(price), 'lowPrice': self._fmt(price),
+                'volume': self._fmt(volume_usd / price), 'quoteVolume': self._fmt(volume_usd),
+                'openTime': now - 86_400_000, 'closeTime': now, 'firstId': 0, 'lastId': 0, 'count': 0,
+            }
+            if not swap:
+                row.update({
+                    'prevClosePrice': self._fmt(price),
+                    'bidPrice': self._fmt(bids[0][0]), 'bidQty': self._fmt(bids[0][1]),
+                    'askPrice': self._fmt(asks[0][0]), 'askQty': self._fmt(asks[0][1]),
+                })
+            rows.append(row)
+        if symbol_id:
+            if not rows:
+                raise FakeExchangeError(400, -1121, "Invalid symbol.")
+            return rows[0]
+        return rows
+
+    def depth(self, swap, symbol_id, limit):
+        market = (self.by_swap_id if swap else self.by_spot_id).get(symbol_id)
+        if market is None:
+            raise FakeExchangeError(400, -1121, "Invalid symbol.")
+        bids, asks = self.order_book(market, swap, limit=limit)
+        now = self._now_ms()
+        return {
+            'lastUpdateId': now, 'E': now, 'T': now,
+            'bids': [[self._fmt(p), self._fmt(q)] for p, q in bids],
+            'asks': [[self._fmt(p), self._fmt(q)] for p, q in asks],
+        }
+
+    def premium_index(self, symbol_id=None):
+        self.settle_funding()
+        rows = []
+        for market in self.markets.values():
+            if symbol_id and market['swap_id'] != symbol_id:
+                continue
+            mark = self.swap_price(market)
+            rows.append({
+                'symbol': market['swap_id'], 'markPrice': self._fmt(mark),
+                'indexPrice': self._fmt(self.spot_price(market) * market['multiplier']),
+                'estimatedSettlePrice': self._fmt(mark),
+                'lastFundingRate': self._fmt(self.funding_rate(market)), 'interestRate': '0.0001',
+                'nextFundingTime': self.next_funding_ms(), 'time': self._now_ms(),
+            })
+        if symbol_id:
+            if not rows:
+                raise FakeExchangeError(400, -1121, "Invalid symbol.")
+            return rows[0]
+        return rows
+
+    def funding_rate_history(self, symbol_id, limit):
+        self.settle_funding()
+        history = self.funding_history.get(symbol_id, [])[-limit:]
+        return [
+            {'symbol': symbol_id, 'fundingTime': t, 'fundingRate': self._fmt(rate), 'markPrice': self._fmt(mark)}
+            for t, rate, mark in history
+        ]
+
+    def klines(self, swap, symbol_id, limit):
+        market = (self.by_swap_id if swap else self.by_spot_id).get(symbol_id)
+        if market is None:
+            raise FakeExchangeError(400, -1121, "Invalid symbol.")
+        price = self.swap_price(market) if swap else self.spot_price(market)
+        volume = market['spec'].get('volume', 0) / price / 3
+        start = self.last_settlement_ms - limit * self.interval_ms
+        rows = []
+        for i in range(limit):
+            t = start + (i + 1) * self.interval_ms
+            p = self._fmt(price)
+            rows.append([t, p, p, p, p, self._fmt(volume), t + self.interval_ms - 1, self._fmt(volume * price), 0, '0', '0', '0'])
+        return rows
+
+    def spot_account(self):
+        with self.lock:
+            return {
+                'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'canWithdraw': True,
+                'canDeposit': True, 'updateTime': self._now_ms(), 'accountType': 'SPOT', 'permissions': ['SPOT'],
+                'balances': [
+                    {'asset': asset, 'free': self._fmt(amount), 'locked': '0'}
+                    for asset, amount in self.spot_balances.items()
+                ]
+            }
+
+    def futures_positions(self, symbol_id=None):
+        self.settle_funding()
+        with self.lock:
+            rows = []
+            for market in self.markets.values():
+                if symbol_id and market['swap_id'] != symbol_id:
+                    continue
+                pos = self.positions.get(market['swap_id'], {'qty': 0.0, 'entry': 0.0})
+                mark = self.swap_price(market)
+                rows.append({
+                    'symbol': market['swap_id'], 'positionAmt': self._fmt(pos['qty']),
+                    'entryPrice': self._fmt(pos['entry']), 'breakEvenPrice': self._fmt(pos['entry']),
+                    'markPrice': self._fmt(mark), 'unRealizedProfit': self._fmt(self.unrealized_pnl(market, pos)),
+                    'liquidationPrice': self._fmt(self.liquidation_price(market, pos)),
+                    'leverage': '1', 'maxNotionalValue': '1000000000', 'marginType': 'cross',
+                    'isolatedMargin': '0', 'isAutoAddMargin': 'false', 'positionSide': 'BOTH',
+                    'notional': self._fmt(pos['qty'] * mark), 'isolatedWallet': '0',
+                    'updateTime': self._now_ms(),
+                })
+            return rows
+
+    def futures_account(self):
+        self.settle_funding()
+        with self.lock:
+            wallet = self.future_balances.get('USDT', 0.0)
+            unrealized = sum(
+                self.unrealized_pnl(self.by_swap_id[sid], pos) for sid, pos in self.positions.items()
+            )
+            margin_used = sum(abs(pos['qty'] * pos['entry']) for pos in self.positions.values())
+            available = wallet + unrealized - margin_used
+            asset = {
+                'asset': 'USDT', 'walletBalance': self._fmt(wallet), 'unrealizedProfit': self._fmt(unrealized),
+                'marginBalance': self._fmt(wallet + unrealized), 'maintMargin': '0', 'initialMargin': self._fmt(margin_used),
+                'positionInitialMargin': self._fmt(margin_used), 'openOrderInitialMargin': '0',
+                'crossWalletBalance': self._fmt(wallet), 'crossUnPnl': self._fmt(unrealized),
+                'availableBalance': self._fmt(available), 'maxWithdrawAmount': self._fmt(available),
+                'marginAvailable': True, 'updateTime': self._now_ms(),
+            }
+            return {
+                'feeTier': 0, 'canTrade': True, 'canDeposit': True, 'canWithdraw': True, 'updateTime': 0,
+                'totalWalletBalance': asset['walletBalance'], 'totalUnrealizedProfit': asset['unrealizedProfit'],
+                'totalMarginBalance': asset['marginBalance'], 'availableBalance': asset['availableBalance'],
+                'maxWithdrawAmount': asset['maxWithdrawAmount'],
+                'assets': [asset], 'positions': self.futures_positions(),
+            }
+
+    def income_history(self, params):
+        self.settle_funding()
+        start = int(params.get('startTime', 0))
+        limit = int(params.get('limit', 100))
+        symbol_id = params.get('symbol')
+        with self.lock:
+            rows = [
+                r for r in self.income
+                if r['time'] >= start and (not symbol_id or r['symbol'] == symbol_id)
+                and (not params.get('incomeType') or r['incomeType'] == params['incomeType'])
+            ]
+        return rows[:limit]
+
+    def trade_fees(self, symbol_id=None):
+        rate = self._fmt(self.scenario['fees']['spot'])
+        return [
+            {'symbol': m['spot_id'], 'makerCommission': rate, 'takerCommission': rate}
+            for m in self.markets.values() if not symbol_id or m['spot_id'] == symbol_id
+        ]
+
+    def commission_rate(self, symbol_id):
+        rate = self._fmt(self.scenario['fees']['swap'])
+        return {'symbol': symbol_id, 'makerCommissionRate': rate, 'takerCommissionRate': rate}
+
+
+class FakeExchangeHandler(BaseHTTPRequestHandler):
+    """
+    Roteador HTTP no dialeto da Binance (subconjunto usado pelo CCXT neste projeto).
+    Aplica latência, jitter e injeção de erros configurados no cenário.
+    """
+    exchange = None
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Cabeçalhos e corpo saem em dois envios: sem NODELAY o Nagle + ACK atrasado somam ~40ms por requisição keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        LOGGER.debug("FakeExchange: %s %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _params(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            params.update({k: v[-1] for k, v in parse_qs(body).items()})
+        return url.path, params
+
+    def _handle(self, method):
+        path, params = self._params()
+        scenario = self.exchange.scenario
+
+        latency = scenario.get('latency_ms', 0) + self.exchange.rng.uniform(0, scenario.get('jitter_ms', 0))
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+        used_weight = self.exchange.weight_header(method, self.path)
+
+        # Injeção de erros (por rota ou global)
+        injected = scenario.get('errors', {}).get(path, {})
+        rate = injected.get('rate', scenario.get('error_rate', 0.0))
+        if rate > 0 and self.exchange.rng.random() < rate:
+            status = injected.get('status', 503)
+            code = {418: -1003, 429: -1003}.get(status, -1001)
+            return self._send(status, {'code': code, 'msg': injected.get('msg', 'Injected failure.')}, used_weight)
+
+        try:
+            payload = self.route(method, path, params)
+        except FakeExchangeError as e:
+            return self._send(e.status, {'code': e.code, 'msg': e.msg}, used_weight)
+        except Exception as e:
+            LOGGER.error(f"FakeExchange: erro interno em {method} {path}: {e}")
+            return self._send(500, {'code': -1000, 'msg': str(e)}, used_weight)
+
+        if payload is None:
+            return self._send(404, {'code': -1000, 'msg': f"Route not implemented: {method} {path}"}, used_weight)
+        return self._send(200, payload, used_weight)
+
+    def route(self, method, path, params):
+        ex = self.exchange
+        symbol_id = params.get('symbol')
+        limit = int(params.get('limit', 100))
+
+        routes = {
+            ('GET', '/api/v3/ping'): lambda: {},
+            ('GET', '/fapi/v1/ping'): lambda: {},
+            ('GET', '/api/v3/time'): lambda: {'serverTime': ex._now_ms()},
+            ('GET', '/fapi/v1/time'): lambda: {'serverTime': ex._now_ms()},
+            ('GET', '/api/v3/exchangeInfo'): ex.spot_exchange_info,
+            ('GET', '/fapi/v1/exchangeInfo'): ex.swap_exchange_info,
+            ('GET', '/api/v3/ticker/24hr'): lambda: ex.ticker_24hr(False, symbol_id),
+            ('GET', '/fapi/v1/ticker/24hr'): lambda: ex.ticker_24hr(True, symbol_id),
+            ('GET', '/api/v3/depth'): lambda: ex.depth(False, symbol_id, limit),
+            ('GET', '/fapi/v1/depth'): lambda: ex.depth(True, symbol_id, limit),
+            ('GET', '/api/v3/klines'): lambda: ex.klines(False, symbol_id, limit),
+            ('GET', '/fapi/v1/klines'): lambda: ex.klines(True, symbol_id, limit),
+            ('GET', '/fapi/v1/premiumIndex'): lambda: ex.premium_index(symbol_id),
+            ('GET', '/fapi/v1/fundingRate'): lambda: ex.funding_rate_history(symbol_id, limit),
+            ('GET', '/fapi/v1/fundingInfo'): lambda: [],
+            ('POST', '/api/v3/order'): lambda: ex.place_order(False, params),
+            ('POST', '/fapi/v1/order'): lambda: ex.place_order(True, params),
+            ('GET', '/api/v3/account'): ex.spot_account,
+            ('GET', '/fapi/v2/account'): ex.futures_account,
+            ('GET', '/fapi/v3/account'): ex.futures_account,
+            ('GET', '/fapi/v2/balance'): lambda: ex.futures_account()['assets'],
+            ('GET', '/fapi/v2/positionRisk'): lambda: ex.futures_positions(symbol_id),
+            ('GET', '/fapi/v3/positionRisk'): lambda: ex.futures_positions(symbol_id),
+            ('GET', '/fapi/v1/income'): lambda: ex.income_history(params),
+            ('GET', '/fapi/v1/commissionRate'): lambda: ex.commission_rate(symbol_id),
+            ('GET', '/fapi/v1/accountConfig'): lambda: {
+                'feeTier': 0, 'canTrade': True, 'canDeposit': True, 'canWithdraw': True,
+                'dualSidePosition': False, 'multiAssetsMargin': False, 'updateTime': 0,
+            },
+            ('GET', '/fapi/v1/leverageBracket'): lambda: [
+                {'symbol': m['swap_id'], 'brackets': [{
+                    'bracket': 1, 'initialLeverage': 20, 'notionalCap': 1_000_000_000,
+                    'notionalFloor': 0, 'maintMarginRatio': 0.004, 'cum': 0
+                }]} for m in ex.markets.values() if not symbol_id or m['swap_id'] == symbol_id
+            ],
+            ('GET', '/sapi/v1/margin/allPairs'): lambda: [],
+            ('GET', '/sapi/v1/margin/isolated/allPairs'): lambda: [],
+            ('GET', '/sapi/v1/asset/tradeFee'): lambda: ex.trade_fees(symbol_id),
+            ('POST', '/sapi/v1/asset/transfer'): lambda: ex.transfer(params),
+        }
+        handler = routes.get((method, path))
+        return handler() if handler else None
+
+    def _send(self, status, payload, used_weight):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-MBX-USED-WEIGHT-1M', str(used_weight))
+        if status in (418, 429):
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeWebSocketServer:
+    """
+    Stream WebSocket mínimo (RFC 6455, só texto servidor -> cliente).
+    Publica '<symbol>@bookTicker' e '!markPrice@arr' a cada 'interval' segundos.
+    """
+    GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    def __init__(self, exchange, host='127.0.0.1', port=8651, interval=1.0):
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.clients = []
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._publish_loop, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+                request = conn.recv(4096).decode(errors='ignore')
+                key = next(
+                    (line.split(':', 1)[1].strip() for line in request.split('\r\n')
+                     if line.lower().startswith('sec-websocket-key')), None
+                )
+                if not key:
+                    conn.close()
+                    continue
+                accept = base64.b64encode(hashlib.sha1((key + self.GUID).encode()).digest()).decode()
+                conn.sendall((
+                    "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+                ).encode())
+                with self.lock:
+                    self.clients.append(conn)
+            except OSError:
+                break
+
+    @staticmethod
+    def _frame(text):
+        data = text.encode()
+        header = bytearray([0x81])
+        if len(data) < 126:
+            header.append(len(data))
+        elif len(data) < 65536:
+            header += bytes([126]) + len(data).to_bytes(2, 'big')
+        else:
+            header += bytes([127]) + len(data).to_bytes(8, 'big')
+        return bytes(header) + data
+
+    def _publish_loop(self):
+        while self.running:
+            ex = self.exchange
+            now = ex._now_ms()
+            messages = [{
+                'stream': '!markPrice@arr',
+                'data': [
+                    {'e': 'markPriceUpdate', 'E': now, 's': row['symbol'], 'p': row['markPrice'],
+                     'r': row['lastFundingRate'], 'T': row['nextFundingTime']}
+                    for row in ex.premium_index()
+                ]
+            }]
+            for market in ex.markets.values():
+                for swap, sid in ((False, market['spot_id']), (True, market['swap_id'])):
+                    bids, asks = ex.order_book(market, swap, limit=1)
+                    messages.append({
+                        'stream': f"{sid.lower()}@bookTicker",
+                        'data': {'s': sid, 'b': ex._fmt(bids[0][0]), 'B': ex._fmt(bids[0][1]),
+                                 'a': ex._fmt(asks[0][0]), 'A': ex._fmt(asks[0][1]), 'E': now}
+                    })
+
+            frames = [self._frame(json.dumps(m)) for m in messages]
+            with self.lock:
+                for conn in list(self.clients):
+                    try:
+                        for frame in frames:
+                            conn.sendall(frame)
+                    except OSError:
+                        self.clients.remove(conn)
+            time.sleep(self.interval)
+
+
+def run_fake_exchange(scenario=None, host='127.0.0.1', port=8650, ws_port=None):
+    """
+    Sobe a exchange local em uma thread daemon.
+    Retorna (servidor HTTP, FakeExchange, servidor WebSocket ou None).
+    Aponte o bot para ela com EXCHANGE_BASE_URL=http://host:port.
+    """
+    exchange = FakeExchange(scenario)
+    handler = type('BoundFakeExchangeHandler', (FakeExchangeHandler,), {'exchange': exchange})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ws_server = None
+    if ws_port:
+        ws_server = FakeWebSocketServer(exchange, host=host, port=ws_port)
+        ws_server.start()
+
+    LOGGER.info(f"Exchange local ativa em http://{host}:{server.server_address[1]}" + (f" | WS :{ws_port}" if ws_port else ""))
+    return server, exchange, ws_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exchange local no dialeto Binance (Spot + USDT-M) para testes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8650)
+    parser.add_argument('--ws-port', type=int, default=None)
+    parser.add_argument('--scenario', help="JSON com o cenário (símbolos, caminhos, latência, erros)")
+    args = parser.parse_args()
+
+    scenario = None
+    if args.scenario:
+        with open(args.scenario, 'r') as f:
+            scenario = json.load(f)
+
+    server, _, _ = run_fake_exchange(scenario, host=args.host, port=args.port, ws_port=args.ws_port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import time
+from configs.config import *
+from tools.metrics import FUNDING_ACCRUED
+
+
+class FundingLedger:
+    """
+    Livro-razão do funding realmente liquidado (GET /fapi/v1/income, tipo FUNDING_FEE).
+
+    Puxa só os registros novos desde o cursor (horário do último registro + ids já vistos
+    nesse mesmo milissegundo), então o custo por sincronização é constante e nenhuma
+    liquidação se perde, mesmo que o monitoramento atrase.
+    """
+    def __init__(self, client, cursor=None):
+        self.client = client
+        self.cursor = cursor
+        self.last_sync = 0.0
+
+    def sync_due(self, now=None):
+        return (now or time.time()) - self.last_sync >= FUNDING_LEDGER_SYNC_INTERVAL
+
+    def sync(self):
+        """
+        Busca os pagamentos de funding desde o cursor.
+        Retorna a lista de registros novos: {'tran_id', 'timestamp', 'symbol', 'amount', 'asset'}.
+        """
+        self.last_sync = time.time()
+        if self.cursor is None:
+            # Primeira execução: só liquidações futuras (o passado já está no estado do bot)
+            self.cursor = {'since': int(self.last_sync * 1000), 'seen_ids': []}
+            LOGGER.info("Ledger de funding iniciado a partir de agora.")
+            return []
+
+        records = []
+        since = self.cursor['since']
+        seen = set(self.cursor['seen_ids'])
+
+        while True:
+            page = self.client.fetch_funding_history(None, since=since, limit=FUNDING_LEDGER_PAGE)
+            fresh = [item for item in page if str(item['id']) not in seen]
+
+            for item in fresh:
+                records.append({
+                    'tran_id': str(item['id']),
+                    'timestamp': item['timestamp'],
+                    'symbol': item['symbol'],
+                    'amount': float(item['amount']),
+                    'asset': item.get('code') or 'USDT',
+                })
+                # Cursor avança para o maior horário; guarda os ids desse milissegundo
+                if item['timestamp'] > since:
+                    since = item['timestamp']
+                    seen = set()
+                seen.add(str(item['id']))
+
+            # Página incompleta (ou só repetidos) = alcançou o presente
+            if len(page) < FUNDING_LEDGER_PAGE or not fresh:
+                break
+
+        self.cursor = {'since': since, 'seen_ids': sorted(seen)}
+
+        for record in records:
+            FUNDING_ACCRUED.inc(record['amount'])
+        if records:
+            LOGGER.info(
+                "Ledger de funding: %d pagamento(s) novos, total $%.4f",
+                len(records), sum(record['amount'] for record in records)
+            )
+        return records
@@ -0,0 +1,137 @@
+import time
+import atexit
+import socket
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from configs.config import *
+from tools.api_accounting import endpoint_key, endpoint_weight
+from tools.rate_governor import ORDER_ENDPOINTS
+
+# TCP keep-alive no nível do socket: detecta conexões mortas em pools ociosos
+KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+if hasattr(socket, 'TCP_KEEPIDLE'):
+    KEEPALIVE_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3),
+    ]
+
+
+# --- Cache de DNS ---
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """socket.getaddrinfo com TTL: novas conexões do pool não pagam a resolução de novo."""
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def forget_host(host):
+    """Descarta as resoluções de um host (ex: após falha de conexão para o IP em cache)."""
+    with _dns_lock:
+        for key in [key for key in _dns_cache if key[0] == host]:
+            del _dns_cache[key]
+
+
+def install_dns_cache():
+    if DNS_CACHE_TTL > 0 and socket.getaddrinfo is not _cached_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+# --- Sessões ---
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter com TCP keep-alive nos sockets e sem retries próprios (o CCXT trata erros)."""
+    def __init__(self, pool_maxsize):
+        super().__init__(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_maxsize, max_retries=0)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + KEEPALIVE_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledSession(requests.Session):
+    """
+    Sessão compartilhada de uma faixa (lane) de tráfego.
+
+    - O timeout vem da classe do endpoint (ordem, consulta pesada, padrão) e não do
+      timeout único do CCXT; a faixa do Guardião tem um timeout curto fixo para leituras.
+    - close() é ignorado: o CCXT fecha a sessão no __del__ de cada cliente e isso
+      derrubaria as conexões quentes dos outros. O encerramento real é shutdown().
+    """
+    def __init__(self, lane, pool_maxsize, timeouts):
+        super().__init__()
+        self.lane = lane
+        self.timeouts = timeouts
+        # Mesmo padrão do CCXT: ignora proxies/certificados de variáveis de ambiente
+        self.trust_env = False
+        adapter = KeepAliveAdapter(pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs['timeout'] = self.timeout_for(method, url, kwargs.get('data'))
+        try:
+            return super().request(method, url, **kwargs)
+        except requests.ConnectionError:
+            forget_host(requests.utils.urlparse(url).hostname)
+            raise
+
+    def timeout_for(self, method, url, body=None):
+        """(conexão, leitura) em segundos conforme a classe do endpoint."""
+        if endpoint_key(method, url) in ORDER_ENDPOINTS or method.upper() == 'DELETE':
+            return self.timeouts['order']
+        if 'read' in self.timeouts:
+            return self.timeouts['read']
+        if endpoint_weight(method, url, body) >= 10:
+            return self.timeouts['bulk']
+        return self.timeouts['default']
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def http_session(lane='shared'):
+    """
+    Sessão HTTP da faixa informada (criada na primeira chamada).
+    'shared': clientes Spot/Swap e APIs externas; 'guardian': exclusiva do Guardião.
+    """
+    with _sessions_lock:
+        session = _sessions.get(lane)
+        if session is None:
+            install_dns_cache()
+            session = PooledSession(lane, HTTP_POOL_MAXSIZE[lane], HTTP_TIMEOUTS[lane])
+            _sessions[lane] = session
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.shutdown()
+        _sessions.clear()
+
+
+atexit.register(close_sessions)
@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+import itertools
+from configs.config import *
+
+# Papéis do modo multiprocesso (cada um com a sua caixa de entrada)
+ROLE_MARKET_DATA = 'market_data'
+ROLE_STRATEGY = 'strategy'
+ROLE_EXECUTION = 'execution'
+ROLE_SUPERVISOR = 'supervisor'
+ROLES = (ROLE_MARKET_DATA, ROLE_STRATEGY, ROLE_EXECUTION)
+
+# Esquemas das mensagens: tipo -> campos obrigatórios (além de type, source, target, ts e seq)
+SCHEMAS = {
+    # Estratégia -> Dados de mercado: pede um retrato do mercado para o scan
+    'market.request': ('request_id',),
+    # Dados de mercado -> Estratégia: tickers Spot/Swap e funding em lote {symbol: (taxa, próxima liquidação s)}
+    'market.snapshot': ('request_id', 'tickers_swap', 'tickers_spot', 'funding_rates', 'fetched_at'),
+    # Estratégia -> Execução: abrir posição no melhor candidato do scan
+    'order.entry': ('request_id', 'symbol', 'spot_symbol', 'funding_rate'),
+    # Execução -> Estratégia: resultado da entrada (success False se recusada ou falhou)
+    'order.result': ('request_id', 'success', 'reason'),
+    # Execução -> Estratégia: posição (ou None) e capital atuais; a estratégia só escaneia sem posição
+    'position.update': ('position', 'capital'),
+    # Todos -> Supervisor: processo vivo
+    'sys.heartbeat': ('role', 'pid'),
+    # Supervisor -> Todos: encerrar
+    'sys.shutdown': (),
+}
+
+_sequence = itertools.count()
+
+
+class MessageError(ValueError):
+    """Mensagem fora do esquema (tipo desconhecido ou campo obrigatório ausente)."""
+
+
+def validate(message):
+    kind = message.get('type') if isinstance(message, dict) else None
+    if kind not in SCHEMAS:
+        raise MessageError(f"Tipo de mensagem desconhecido: {kind}")
+    missing = [field for field in ('source', 'target', *SCHEMAS[kind]) if field not in message]
+    if missing:
+        raise MessageError(f"Mensagem '{kind}' sem os campos: {', '.join(missing)}")
+    return message
+
+
+def make_message(kind, source, target, **fields):
+    """Monta e valida uma mensagem {'type', 'source', 'target', 'ts', 'seq', ...campos}."""
+    return validate({'type': kind, 'source': source, 'target': target, 'ts': time.time(), 'seq': next(_sequence), **fields})
+
+
+def new_request_id(role):
+    return f"{role}-{os.getpid()}-{next(_sequence)}"
+
+
+class Channel:
+    """
+    Ponta de IPC de um processo filho: um Pipe exclusivo com o supervisor, que roteia
+    cada mensagem para a caixa do destino (campo 'target').
+
+    Um processo morto no meio de uma escrita só corrompe o próprio Pipe, que o supervisor
+    descarta ao reiniciá-lo; os outros processos não compartilham locks com ele.
+    Mensagens fora do esquema são descartadas com log (nunca derrubam o processo).
+    """
+    def __init__(self, role, conn):
+        self.role = role
+        self.conn = conn
+        self.lock = threading.Lock()    # Heartbeat e loop principal enviam de threads diferentes
+
+    def send(self, target, kind, **fields):
+        message = make_message(kind, self.role, target=target, **fields)
+        try:
+            with self.lock:
+                self.conn.send(message)
+        except (OSError, EOFError) as e:
+            LOGGER.warning(f"IPC ({self.role}): falha ao enviar '{kind}' para '{target}': {e}")
+            return False
+        return True
+
+    def recv(self, timeout=None):
+        """
+        Próxima mensagem válida ou None se o tempo acabar.
+        Se o supervisor sumir (Pipe fechado), devolve um sys.shutdown: o processo não fica órfão.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                if not self.conn.poll(remaining):
+                    return None
+                message = self.conn.recv()
+            except (OSError, EOFError):
+                LOGGER.error(f"IPC ({self.role}): conexão com o supervisor perdida. Encerrando.")
+                return make_message('sys.shutdown', ROLE_SUPERVISOR, target=self.role)
+            try:
+                return validate(message)
+            except MessageError as e:
+                LOGGER.error(f"IPC ({self.role}): {e}")
+                if deadline is not None and time.time() >= deadline:
+                    return None
+
+    def heartbeat(self):
+        self.send(ROLE_SUPERVISOR, 'sys.heartbeat', role=self.role, pid=os.getpid())
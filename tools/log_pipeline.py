@@ -0,0 +1,185 @@
+import os
+import re
+import gzip
+import json
+import glob
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime
+
+# Atenção: este módulo é importado pelo configs/config.py, então NÃO pode importar o config.
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+# Cores aplicadas apenas no console (o arquivo recebe JSON puro)
+CONSOLE_COLORS = {
+    'green': "\033[92m",
+    'red': "\033[91m",
+    'yellow': "\033[93m",
+    'cyan': "\033[96m",
+}
+LEVEL_COLORS = {
+    logging.WARNING: CONSOLE_COLORS['yellow'],
+    logging.ERROR: CONSOLE_COLORS['red'],
+    logging.CRITICAL: CONSOLE_COLORS['red'],
+}
+COLOR_RESET = "\033[0m"
+
+# Atributos padrão de um LogRecord (o resto veio via extra= e vai para o JSON)
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'color'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Um objeto JSON por linha: horário, nível, logger, processo, thread, mensagem (sem ANSI)
+    e os campos estruturados passados via extra={...}.
+    """
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'thread': record.threadName,
+            'msg': ANSI_PATTERN.sub('', record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Formato legível do console. A cor vem de extra={'color': ...} ou do nível;
+    se a saída não for um terminal, os códigos ANSI são removidos.
+    """
+    def __init__(self, use_color=True):
+        super().__init__(fmt='%(asctime)s | %(levelname)s | %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        self.use_color = use_color
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        if not self.use_color:
+            return ANSI_PATTERN.sub('', line)
+        color = CONSOLE_COLORS.get(getattr(record, 'color', None)) or LEVEL_COLORS.get(record.levelno)
+        return f"{color}{line}{COLOR_RESET}" if color else line
+
+
+class CompressedRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Rotaciona por tamanho OU por tempo (o que vier primeiro) e comprime o arquivo
+    fechado em .gz, mantendo no máximo backup_count arquivos antigos.
+    Roda na thread do QueueListener, nunca na thread de trading.
+    """
+    def __init__(self, filename, max_bytes=0, interval=0, backup_count=0, encoding='utf-8'):
+        super().__init__(filename, 'a', encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        start = os.path.getmtime(filename) if os.path.exists(filename) else datetime.now().timestamp()
+        self.rollover_at = start + interval if interval else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at and record.created >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        root, ext = os.path.splitext(self.baseFilename)
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            stamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')
+            target = f"{root}.{stamp}{ext}.gz"
+            with open(self.baseFilename, 'rb') as src, gzip.open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.baseFilename)
+
+        if self.backup_count > 0:
+            # Só os arquivos deste log (carimbo numérico): bot_execution.strategy.*.gz é de outro processo
+            archives = sorted(glob.glob(f"{glob.escape(root)}.[0-9]*{ext}.gz"))
+            for old in archives[:-self.backup_count]:
+                os.remove(old)
+
+        if self.interval:
+            self.rollover_at = datetime.now().timestamp() + self.interval
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que NÃO formata na thread chamadora (o padrão da stdlib formata em prepare()).
+    A mensagem e os argumentos seguem crus pela fila e só viram texto no listener.
+    """
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(log_path, level=logging.INFO, max_bytes=0, interval=0, backup_count=0):
+    """
+    Pipeline de logging não bloqueante:
+    loggers -> DeferredQueueHandler -> fila -> QueueListener (thread própria) -> arquivo JSON-lines + console.
+
+    Retorna o QueueListener (já iniciado; é parado no atexit).
+    """
+    file_handler = CompressedRotatingFileHandler(log_path, max_bytes=max_bytes, interval=interval, backup_count=backup_count)
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(ConsoleFormatter(use_color=console_handler.stream.isatty()))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    return _attach_queue(root, file_handler, console_handler)
+
+
+def configure_file_logger(name, log_path, max_bytes=0, interval=0, backup_count=0):
+    """
+    Logger dedicado (não propaga para o root) gravando JSON-lines em arquivo próprio,
+    também via fila. Usado para fluxos de alto volume como os spans de tracing.
+    """
+    file_handler = CompressedRotatingFileHandler(log_path, max_bytes=max_bytes, interval=interval, backup_count=backup_count)
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    _attach_queue(logger, file_handler)
+    return logger
+
+
+def _attach_queue(logger, *handlers):
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Processos filhos via fork (ex: workers do sweep) herdam a fila mas não a thread do listener
+    def _restart_in_child():
+        listener._thread = None
+        listener.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_in_child)
+
+    return listener
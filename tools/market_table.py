@@ -0,0 +1,218 @@
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from configs.config import *
+
+# Uma linha por símbolo (Spot e Swap na mesma tabela; o ID é a posição da linha e nunca muda)
+ROW_DTYPE = np.dtype([
+    ('seq', np.uint64),             # Seqlock: ímpar = escrita em andamento
+    ('symbol', 'S48'),
+    ('swap', np.bool_),
+    ('bid', np.float64),
+    ('ask', np.float64),
+    ('last', np.float64),
+    ('quote_volume', np.float64),
+    ('mark', np.float64),
+    ('funding', np.float64),
+    ('next_funding', np.float64),   # ms (como o CCXT)
+    ('exchange_ts', np.float64),    # ms, horário da exchange
+    ('updated', np.float64),        # s, horário local da escrita
+])
+HEADER_DTYPE = np.dtype([('count', np.uint64), ('capacity', np.uint64)])
+VALUE_FIELDS = ('bid', 'ask', 'last', 'quote_volume', 'mark', 'funding', 'next_funding', 'exchange_ts')
+
+
+def _open_segment(name, create, size=0):
+    """
+    Abre o segmento sem deixá-lo com o resource_tracker: quem cria/remove é o supervisor,
+    e um leitor ou escritor que sai (ou é reiniciado) não pode apagar a tabela dos outros.
+    """
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    try:
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+    return segment
+
+
+class MarketTable:
+    """
+    Estado de mercado em memória compartilhada (array estruturado NumPy), sem cópia para os leitores.
+
+    - Linha por símbolo com bid/ask/último/volume/mark/funding/próxima liquidação e horários.
+      O ID do símbolo é a linha (estável enquanto o segmento existir, mesmo se o escritor reiniciar).
+    - Um escritor por feed; a alocação de linhas é de um único processo (o de dados de mercado).
+    - Seqlock por linha: o escritor deixa seq ímpar durante a escrita e par no fim; o leitor
+      copia a linha e só aceita se seq era par e não mudou.
+    """
+    def __init__(self, name=MARKET_TABLE_NAME, capacity=MARKET_TABLE_CAPACITY, create=False):
+        self.name = name
+        self.lock = threading.Lock()
+        if create:
+            size = HEADER_DTYPE.itemsize + capacity * ROW_DTYPE.itemsize
+            try:
+                self.segment = _open_segment(name, True, size)
+            except FileExistsError:
+                # Sobra de uma execução que não encerrou limpo
+                stale = _open_segment(name, False)
+                stale.close()
+                stale.unlink()
+                self.segment = _open_segment(name, True, size)
+        else:
+            self.segment = _open_segment(name, False)
+
+        self.header = np.ndarray((1,), HEADER_DTYPE, buffer=self.segment.buf)
+        if create:
+            self.header['capacity'] = capacity
+            self.header['count'] = 0
+        self.capacity = int(self.header['capacity'][0])
+        self.rows = np.ndarray((self.capacity,), ROW_DTYPE, buffer=self.segment.buf, offset=HEADER_DTYPE.itemsize)
+        if create:
+            self.rows['seq'] = 0
+            for field in (*VALUE_FIELDS, 'updated'):
+                self.rows[field] = np.nan
+
+        self.ids = {}
+        self.known = 0
+
+    @classmethod
+    def attach(cls, name=MARKET_TABLE_NAME):
+        """Tabela já criada pelo supervisor, ou None se ainda não existir."""
+        try:
+            return cls(name=name)
+        except FileNotFoundError:
+            return None
+
+    # --- IDs de símbolo ---
+
+    def _sync_ids(self):
+        count = int(self.header['count'][0])
+        for row in range(self.known, count):
+            self.ids[self.rows['symbol'][row].decode()] = row
+        self.known = count
+
+    def symbol_id(self, symbol):
+        row = self.ids.get(symbol)
+        if row is None:
+            self._sync_ids()
+            row = self.ids.get(symbol)
+        return row
+
+    def _allocate(self, symbol, swap):
+        row = self.symbol_id(symbol)
+        if row is not None:
+            return row
+        row = self.known
+        if row >= self.capacity:
+            raise OverflowError(f"Tabela de mercado cheia ({self.capacity} símbolos)")
+        self.rows['symbol'][row] = symbol.encode()
+        self.rows['swap'][row] = swap
+        # Publica a linha só depois de preenchida (leitores descobrem pelo count)
+        self.header['count'] = row + 1
+        self.ids[symbol] = row
+        self.known = row + 1
+        return row
+
+    # --- Escrita ---
+
+    def write(self, symbols, swap, **columns):
+        """
+        Atualiza vários símbolos de uma vez (vetorizado). columns: {campo: sequência alinhada com symbols};
+        campos omitidos mantêm o valor anterior.
+        """
+        if not symbols:
+            return
+        with self.lock:
+            ids = np.fromiter((self._allocate(symbol, swap) for symbol in symbols), dtype=np.int64, count=len(symbols))
+        values = {name: np.asarray(column, dtype=np.float64) for name, column in columns.items()}
+
+        seq = self.rows['seq']
+        seq[ids] |= 1           # Ímpar: leitores descartam o que copiarem agora (mesmo se um escritor morreu no meio)
+        for name, column in values.items():
+            self.rows[name][ids] = column
+        self.rows['updated'][ids] = time.time()
+        seq[ids] += 1           # Par: linha consistente
+
+    # --- Leitura ---
+
+    def _read_row(self, row):
+        for _ in range(MARKET_TABLE_READ_RETRIES):
+            before = int(self.rows['seq'][row])
+            if before & 1:
+                continue
+            copy = self.rows[row].copy()
+            if int(self.rows['seq'][row]) == before:
+                return copy
+        return None
+
+    def read(self, symbol, max_age=MARKET_TABLE_MAX_AGE):
+        """Linha do símbolo como dicionário, ou None se ausente, inconsistente ou mais velha que max_age."""
+        row = self.symbol_id(symbol)
+        if row is None:
+            return None
+        copy = self._read_row(row)
+        if copy is None or not (time.time() - copy['updated'] <= max_age):
+            return None
+        return {field: float(copy[field]) for field in (*VALUE_FIELDS, 'updated')}
+
+    def snapshot(self, max_age=MARKET_TABLE_MAX_AGE):
+        """
+        Retrato do mercado inteiro no formato do market.snapshot (tickers Spot/Swap e funding em lote),
+        ou None se faltarem linhas Spot ou Swap recentes. Linhas pegas no meio de uma escrita são relidas.
+        """
+        self._sync_ids()
+        count = self.known
+        copy = self.rows[:count].copy()
+        torn = (copy['seq'] & 1).astype(bool) | (copy['seq'] != self.rows['seq'][:count])
+        for row in np.flatnonzero(torn):
+            reread = self._read_row(row)
+            if reread is not None:
+                copy[row] = reread
+            else:
+                copy['updated'][row] = np.nan
+
+        fresh = time.time() - copy['updated'] <= max_age
+        if not (np.any(fresh & copy['swap']) and np.any(fresh & ~copy['swap'])):
+            return None
+
+        tickers_swap, tickers_spot, funding_rates = {}, {}, {}
+        for row in np.flatnonzero(fresh):
+            item = copy[row]
+            symbol = item['symbol'].decode()
+            ticker = {
+                'symbol': symbol,
+                'bid': float(item['bid']),
+                'ask': float(item['ask']),
+                'last': float(item['last']),
+                'quoteVolume': float(item['quote_volume']),
+            }
+            if item['swap']:
+                tickers_swap[symbol] = ticker
+                if not np.isnan(item['funding']):
+                    next_funding = float(item['next_funding']) / 1000 if not np.isnan(item['next_funding']) else None
+                    funding_rates[symbol] = (float(item['funding']), next_funding)
+            else:
+                tickers_spot[symbol] = ticker
+
+        return {
+            'tickers_swap': tickers_swap,
+            'tickers_spot': tickers_spot,
+            'funding_rates': funding_rates,
+            'fetched_at': float(np.nanmin(copy['updated'][fresh])),
+        }
+
+    # --- Ciclo de vida ---
+
+    def close(self):
+        # Views NumPy precisam sair antes de fechar o mmap
+        self.header = self.rows = None
+        self.segment.close()
+
+    def unlink(self):
+        # SharedMemory.unlink() também tira o segmento do resource_tracker: registra de volta antes
+        resource_tracker.register(self.segment._name, 'shared_memory')
+        try:
+            self.segment.unlink()
+        except FileNotFoundError:
+            pass
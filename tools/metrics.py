@@ -0,0 +1,278 @@
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from configs.config import *
+from tools.api_accounting import endpoint_key, wrap_fetch
+
+# Buckets padrão de latência (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    """Escapa valores de label no formato texto do Prometheus."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    """
+    Base das métricas. Cada combinação de labels vira um filho cacheado,
+    então o caminho quente é só um lookup de dicionário + soma sob lock.
+    Nada é formatado até alguém fazer scrape no endpoint.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + (extra or [])
+        if not pairs:
+            return ''
+        body = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return '{' + body + '}'
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self.children.items()):
+            lines.extend(self._expose_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _expose_child(self, key, child):
+        return [f"{self.name}{self._format_labels(key)} {child.value}"]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _expose_child(self, key, child):
+        return [f"{self.name}{self._format_labels(key)} {child.value}"]
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'total', 'count', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager que observa a duração do bloco no histograma."""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _expose_child(self, key, child):
+        with child.lock:
+            counts = list(child.counts)
+            total, count = child.total, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def expose(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Métricas do Bot ---
+API_LATENCY = REGISTRY.histogram('bot_api_latency_seconds', 'Latência das chamadas de API por endpoint', ('client', 'endpoint'))
+API_ERRORS = REGISTRY.counter('bot_api_errors_total', 'Chamadas de API com erro por endpoint', ('client', 'endpoint'))
+SCAN_DURATION = REGISTRY.histogram('bot_scan_duration_seconds', 'Duração da varredura de mercado')
+SCAN_CANDIDATES = REGISTRY.gauge('bot_scan_candidates', 'Candidatos por estágio do último scan', ('stage',))
+LEG_SKEW = REGISTRY.histogram('bot_leg_skew_seconds', 'Diferença entre execução das pernas Spot e Swap', ('operation',),
+                              buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+GUARDIAN_DISTANCE = REGISTRY.gauge('bot_guardian_liquidation_distance', 'Distância até o preço de liquidação (fração)')
+FUNDING_ACCRUED = REGISTRY.counter('bot_funding_accrued_usd_total', 'Funding acumulado (USD)')
+ACCUMULATED_PROFIT = REGISTRY.gauge('bot_accumulated_profit_usd', 'Lucro acumulado da posição (USD)')
+BOREDOM_SCORE = REGISTRY.gauge('bot_boredom_score', 'Score de tédio da posição atual')
+DB_WRITE_LATENCY = REGISTRY.histogram('bot_db_write_latency_seconds', 'Latência de escrita no SQLite', ('table',))
+BALANCE_FETCHES = REGISTRY.counter('bot_balance_fetches_total', 'Consultas de saldo à exchange por carteira', ('wallet',))
+WALLET_TRANSFERS = REGISTRY.counter('bot_wallet_transfers_total', 'Transferências entre carteiras', ('direction',))
+LOOP_CYCLES = REGISTRY.counter('bot_loop_cycles_total', 'Ciclos do loop principal', ('branch',))
+LOOP_DURATION = REGISTRY.histogram('bot_loop_cycle_seconds', 'Duração de cada ciclo do loop principal', ('branch',))
+PRETRADE_READ_LATENCY = REGISTRY.histogram('bot_pretrade_read_seconds', 'Leituras pré-ordem por tipo e origem do resultado (primary, hedge, cache, failed)', ('read', 'source'))
+PRETRADE_HEDGES = REGISTRY.counter('bot_pretrade_hedges_total', 'Cópias (hedge) disparadas nas leituras pré-ordem', ('read',))
+CIRCUIT_STATE = REGISTRY.gauge('bot_circuit_state', 'Estado dos disjuntores (0 fechado, 1 meio-aberto, 2 aberto)', ('scope', 'breaker'))
+CIRCUIT_REJECTED = REGISTRY.counter('bot_circuit_rejected_total', 'Chamadas barradas por disjuntor aberto', ('scope', 'breaker'))
+API_RETRIES = REGISTRY.counter('bot_api_retries_total', 'Leituras repetidas após erro de rede', ('scope', 'endpoint'))
+PRETRADE_LATENCY = REGISTRY.histogram('bot_pretrade_seconds', 'Da primeira leitura pré-ordem ao disparo das ordens', ('operation',))
+SWEEP_RESIDUE = REGISTRY.gauge('bot_sweep_residue_usd', 'Sobras fora do livro de posições na última varredura (USD)', ('kind',))
+SWEEP_ACTIONS = REGISTRY.counter('bot_sweep_actions_total', 'Ações da varredura de sobras', ('kind', 'result'))
+
+
+def instrument_client(client, label):
+    """
+    Mede a latência de todas as chamadas HTTP do cliente CCXT (por endpoint).
+    """
+    def hook(client, method, url, body, call):
+        key = endpoint_key(method, url)
+        start = time.perf_counter()
+        try:
+            return call()
+        except Exception:
+            API_ERRORS.labels(client=label, endpoint=key).inc()
+            raise
+        finally:
+            API_LATENCY.labels(client=label, endpoint=key).observe(time.perf_counter() - start)
+
+    return wrap_fetch(client, hook)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = REGISTRY.expose().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Sobe o endpoint /metrics (formato texto do Prometheus) em uma thread daemon.
+    Retorna o servidor, ou None se desativado (porta 0).
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        LOGGER.error(f"Falha ao iniciar endpoint de métricas na porta {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    LOGGER.info(f"Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,415 @@
+import json
+import os
+import time
+import threading
+import ccxt
+from configs.config import *
+
+
+class PaperBroker:
+    """
+    Execução simulada (paper trading) por cima dos clientes CCXT reais.
+
+    - Leituras de mercado (livros, tickers, funding) continuam indo para a exchange configurada:
+      a Binance ao vivo ou a exchange local com dados gravados (tools/fake_exchange.py).
+    - Ordens, transferências, saldos, posições e histórico de funding são resolvidos aqui:
+      nenhuma escrita chega à exchange. attach() troca esses métodos no próprio cliente,
+      então estratégia, diário de execução, cache de saldos e Guardião não mudam.
+    - Ordens casam contra o livro atual (IOC até o preço limite, MARKET no livro todo),
+      com a taxa Taker da tabela da conta (ou os padrões do config sem credenciais).
+    - O funding é liquidado na fronteira informada pela exchange, sobre o mark price,
+      e vira um registro de income como o do /fapi/v1/income.
+    - A conta simulada é persistida em JSON para sobreviver a reinícios (como o bot_state).
+    """
+    def __init__(self, state_file=PAPER_STATE_FILE, balances=PAPER_BALANCES):
+        self.state_file = state_file
+        self.lock = threading.RLock()
+        self.clients = {}
+        self.fee_tables = {}
+        self.on_change = None          # Callback on_change(carteira) ('spot' ou 'future')
+
+        self.wallets = {'spot': dict(balances.get('spot', {})), 'future': dict(balances.get('future', {}))}
+        self.positions = {}            # {símbolo swap: {'contracts': float (negativo = short), 'entry': float}}
+        self.funding = {}              # {símbolo swap: {'rate', 'next', 'mark'}} última leitura de funding
+        self.income = []
+        self.order_seq = 0
+        self.tran_seq = 0
+        self._load()
+
+    # --- Persistência ---
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.wallets = state['wallets']
+            self.positions = state.get('positions', {})
+            self.income = state.get('income', [])
+            self.order_seq = state.get('order_seq', 0)
+            self.tran_seq = state.get('tran_seq', 0)
+            LOGGER.info("Paper trading: conta simulada carregada de %s", self.state_file)
+        except Exception as e:
+            LOGGER.error(f"Erro ao carregar conta simulada: {e}")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            state = {
+                'wallets': self.wallets,
+                'positions': self.positions,
+                'income': self.income[-PAPER_INCOME_KEEP:],
+                'order_seq': self.order_seq,
+                'tran_seq': self.tran_seq,
+            }
+            with open(self.state_file, 'w') as f:
+                json.dump(state, f, indent=4)
+        except Exception as e:
+            LOGGER.error(f"Erro ao salvar conta simulada: {e}")
+
+    def _changed(self, wallet):
+        self._save()
+        if self.on_change:
+            self.on_change(wallet)
+
+    # --- Ligação com os clientes ---
+
+    def attach(self, client):
+        """Substitui as chamadas de conta/escrita do cliente pelas simuladas."""
+        market_type = client.options.get('defaultType', 'spot')
+        self.clients.setdefault(market_type, client)
+
+        client.create_order = lambda symbol, type, side, amount, price=None, params={}: \
+            self.create_order(client, symbol, type, side, amount, price, params)
+        client.fetch_balance = lambda params={}: self.fetch_balance(client)
+
+        if market_type == 'spot':
+            client.transfer = lambda code, amount, fromAccount, toAccount, params={}: \
+                self.transfer(code, amount, fromAccount, toAccount)
+        else:
+            client.fetch_positions = lambda symbols=None, params={}: self.fetch_positions(client, symbols)
+            client.fetch_funding_history = lambda symbol=None, since=None, limit=None, params={}: \
+                self.fetch_funding_history(client, symbol, since, limit)
+
+            # Leituras de funding passam direto, mas alimentam a liquidação simulada
+            fetch_rate = client.fetch_funding_rate
+            fetch_rates = client.fetch_funding_rates
+
+            def fetch_funding_rate(symbol, params={}):
+                info = fetch_rate(symbol, params)
+                self.observe_funding(info)
+                return info
+
+            def fetch_funding_rates(symbols=None, params={}):
+                rates = fetch_rates(symbols, params)
+                for info in rates.values():
+                    self.observe_funding(info)
+                return rates
+
+            client.fetch_funding_rate = fetch_funding_rate
+            client.fetch_funding_rates = fetch_funding_rates
+        return client
+
+    # --- Taxas ---
+
+    def fee_rate(self, client, symbol):
+        """Taxa Taker da tabela da conta (uma consulta por tipo de mercado) ou o padrão do config."""
+        market_type = client.options.get('defaultType', 'spot')
+        default = FEE_TAKER_SPOT_DEFAULT if market_type == 'spot' else FEE_TAKER_SWAP_DEFAULT
+        table = self.fee_tables.get(market_type)
+        if table is None:
+            try:
+                table = client.fetch_trading_fees()
+            except Exception as e:
+                LOGGER.warning(f"Paper trading: tabela de taxas indisponível ({market_type}): {e}. Usando padrão.")
+                table = {}
+            self.fee_tables[market_type] = table
+        fee = table.get(symbol, {}).get('taker')
+        return float(fee) if fee is not None else default
+
+    # --- Ordens ---
+
+    def _match(self, client, symbol, side, amount, limit_price):
+        """
+        Casa a ordem contra o livro atual.
+        IOC: consome níveis até o preço limite e cancela o resto.
+        MARKET (limit_price None): consome o livro lido, estendendo o último nível.
+        Retorna (quantidade executada, custo em USDT por unidade de contrato).
+        """
+        book = client.fetch_order_book(symbol, limit=PRICE_BAND_BOOK_DEPTH)
+        levels = book['asks'] if side == 'buy' else book['bids']
+        if not levels:
+            raise ccxt.OrderNotFillable(f"Paper trading: livro vazio para {symbol}")
+
+        filled = cost = 0.0
+        for price, qty in levels:
+            if limit_price is not None:
+                if (side == 'buy' and price > limit_price) or (side == 'sell' and price < limit_price):
+                    break
+            take = min(qty, amount - filled)
+            filled += take
+            cost += take * price
+            if filled >= amount * (1 - 1e-12):
+                break
+
+        if limit_price is None and filled < amount:
+            cost += (amount - filled) * levels[-1][0]
+            filled = amount
+        return filled, cost
+
+    def create_order(self, client, symbol, type, side, amount, price=None, params={}):
+        market = client.market(symbol)
+        amount = float(amount)
+        limit_price = float(price) if type == 'limit' else None
+        if amount <= 0:
+            raise ccxt.InvalidOrder(f"Paper trading: quantidade inválida ({amount})")
+
+        filled, cost = self._match(client, symbol, side, amount, limit_price)
+        # Contratos escalados: o custo do livro é por contrato, o nocional multiplica pelo tamanho
+        contract_size = float(market.get('contractSize') or 1.0) if market.get('contract') else 1.0
+        notional = cost * contract_size
+        min_cost = (market.get('limits', {}).get('cost') or {}).get('min')
+        if min_cost and filled > 0 and notional < min_cost:
+            raise ccxt.InvalidOrder(f"Paper trading: nocional abaixo do mínimo ({notional:.2f} < {min_cost})")
+
+        fee_rate = self.fee_rate(client, symbol)
+        fee = notional * fee_rate
+
+        opened = False
+        with self.lock:
+            if market.get('spot'):
+                self._apply_spot_fill(market, side, filled, notional, fee)
+                wallet = 'spot'
+            else:
+                opened = self._apply_swap_fill(symbol, side, filled, cost / filled if filled else 0.0, fee)
+                wallet = 'future'
+            self.order_seq += 1
+            order_id = f"paper{self.order_seq}"
+
+        if opened:
+            # Posição nova: a leitura de funding anterior (se houver) pode ser de antes de uma liquidação
+            self.funding.pop(symbol, None)
+            try:
+                client.fetch_funding_rate(symbol)
+            except Exception as e:
+                LOGGER.warning(f"Paper trading: falha ao ler funding de {symbol} na abertura: {e}")
+        self._changed(wallet)
+
+        average = cost / filled if filled > 0 else None
+        now = client.milliseconds()
+        order = {
+            'id': order_id,
+            'clientOrderId': order_id,
+            'timestamp': now,
+            'datetime': client.iso8601(now),
+            'lastTradeTimestamp': now if filled > 0 else None,
+            'symbol': symbol,
+            'type': type,
+            'timeInForce': (params or {}).get('timeInForce', 'GTC' if type == 'limit' else 'IOC'),
+            'side': side,
+            'price': limit_price if limit_price is not None else average,
+            'amount': amount,
+            'filled': filled,
+            'remaining': amount - filled,
+            'cost': notional,
+            'average': average,
+            'status': 'closed' if filled >= amount * (1 - 1e-12) else 'expired',
+            'fee': {'cost': fee, 'currency': market['quote'], 'rate': fee_rate},
+            'trades': [],
+            'info': {'paper': True},
+        }
+        LOGGER.info(
+            "Paper trading: %s %s %s %.8f/%.8f @ %s (taxa $%.4f)",
+            type, side, symbol, filled, amount, average, fee,
+            extra={'symbol': symbol, 'side': side, 'order_id': order_id, 'paper': True}
+        )
+        return order
+
+    def _apply_spot_fill(self, market, side, filled, cost, fee):
+        balances = self.wallets['spot']
+        base, quote = market['base'], market['quote']
+        if side == 'buy':
+            if balances.get(quote, 0.0) + 1e-9 < cost + fee:
+                raise ccxt.InsufficientFunds("Paper trading: saldo Spot insuficiente para a compra.")
+            balances[quote] -= cost + fee
+            balances[base] = balances.get(base, 0.0) + filled
+        else:
+            if balances.get(base, 0.0) + 1e-12 < filled:
+                raise ccxt.InsufficientFunds(f"Paper trading: saldo insuficiente de {base} para a venda.")
+            balances[base] -= filled
+            balances[quote] = balances.get(quote, 0.0) + cost - fee
+
+    def _apply_swap_fill(self, symbol, side, filled, price, fee):
+        """
+        Atualiza a posição (preço médio, PnL realizado na redução) e cobra a taxa na carteira de Futuros.
+        Retorna True se a ordem abriu uma posição nova.
+        """
+        if filled <= 0:
+            return False
+        contract_size = self._contract_size(symbol)
+        pos = self.positions.setdefault(symbol, {'contracts': 0.0, 'entry': 0.0})
+        signed = filled if side == 'buy' else -filled
+        opening = pos['contracts'] == 0
+        realized = 0.0
+
+        if pos['contracts'] != 0 and (pos['contracts'] > 0) != (signed > 0):
+            closing = min(abs(signed), abs(pos['contracts']))
+            direction = 1 if pos['contracts'] > 0 else -1
+            realized = (price - pos['entry']) * closing * direction * contract_size
+            remaining = pos['contracts'] + signed
+            if abs(remaining) < 1e-12:
+                pos['contracts'], pos['entry'] = 0.0, 0.0
+            elif (remaining > 0) == (pos['contracts'] > 0):
+                pos['contracts'] = remaining
+            else:
+                pos['contracts'], pos['entry'] = remaining, price
+        else:
+            total = abs(pos['contracts']) + filled
+            pos['entry'] = (pos['entry'] * abs(pos['contracts']) + price * filled) / total
+            pos['contracts'] += signed
+
+        self.wallets['future']['USDT'] = self.wallets['future'].get('USDT', 0.0) + realized - fee
+
+        if pos['contracts'] == 0:
+            del self.positions[symbol]
+        return opening and symbol in self.positions
+
+    def _contract_size(self, symbol):
+        market = self.clients['swap'].market(symbol)
+        return float(market.get('contractSize') or 1.0)
+
+    # --- Funding ---
+
+    def observe_funding(self, info):
+        """
+        Registra a leitura de funding de um símbolo e liquida a fronteira que ela já passou.
+        A taxa paga é a última prevista antes da liquidação; o nocional usa o mark atual.
+        """
+        symbol = info.get('symbol')
+        now = info.get('timestamp') or int(time.time() * 1000)
+        settled = False
+        with self.lock:
+            previous = self.funding.get(symbol)
+            pos = self.positions.get(symbol)
+            if previous and pos and previous['next'] and now >= previous['next'] and previous['rate'] is not None:
+                contract_size = self._contract_size(symbol)
+                mark = info.get('markPrice') or previous['mark']
+                # Short recebe com funding positivo
+                payment = -pos['contracts'] * contract_size * mark * previous['rate']
+                self.wallets['future']['USDT'] = self.wallets['future'].get('USDT', 0.0) + payment
+                self.tran_seq += 1
+                self.income.append({
+                    'id': f"paper{self.tran_seq}", 'symbol': symbol, 'timestamp': previous['next'],
+                    'amount': payment, 'code': 'USDT', 'rate': previous['rate'],
+                })
+                settled = True
+                LOGGER.info(
+                    "Paper trading: funding liquidado em %s: $%.4f (taxa %.4f%%)",
+                    symbol, payment, previous['rate'] * 100, extra={'symbol': symbol, 'paper': True}
+                )
+
+            self.funding[symbol] = {
+                'rate': info.get('fundingRate'),
+                'next': info.get('fundingTimestamp'),
+                'mark': info.get('markPrice'),
+            }
+        if settled:
+            self._changed('future')
+
+    def fetch_funding_history(self, client, symbol=None, since=None, limit=None):
+        # Relê o funding das posições abertas: liquida fronteiras vencidas antes de responder
+        for held in list(self.positions):
+            try:
+                client.fetch_funding_rate(held)
+            except Exception as e:
+                LOGGER.warning(f"Paper trading: falha ao ler funding de {held}: {e}")
+
+        with self.lock:
+            rows = [
+                dict(record, datetime=client.iso8601(record['timestamp']), info={'paper': True})
+                for record in self.income
+                if (since is None or record['timestamp'] >= since) and (symbol is None or record['symbol'] == symbol)
+            ]
+        return rows[:limit] if limit else rows
+
+    # --- Saldos, posições e transferências ---
+
+    def _unrealized(self, symbol, pos):
+        contract_size = self._contract_size(symbol)
+        mark = (self.funding.get(symbol) or {}).get('mark') or pos['entry']
+        return (mark - pos['entry']) * pos['contracts'] * contract_size, mark
+
+    def fetch_balance(self, client):
+        market_type = client.options.get('defaultType', 'spot')
+        with self.lock:
+            if market_type == 'spot':
+                balances = {asset: {'free': amount, 'used': 0.0, 'total': amount}
+                            for asset, amount in self.wallets['spot'].items()}
+            else:
+                # Mesma aproximação da exchange local: margem inicial = nocional de entrada (1x)
+                wallet = self.wallets['future'].get('USDT', 0.0)
+                unrealized = margin = 0.0
+                for symbol, pos in self.positions.items():
+                    pnl, _ = self._unrealized(symbol, pos)
+                    unrealized += pnl
+                    margin += abs(pos['contracts'] * pos['entry']) * self._contract_size(symbol)
+                free = wallet + unrealized - margin
+                balances = {'USDT': {'free': free, 'used': margin, 'total': wallet + unrealized}}
+
+        result = {'info': {'paper': True}, 'free': {}, 'used': {}, 'total': {}}
+        for asset, row in balances.items():
+            result[asset] = row
+            for key in ('free', 'used', 'total'):
+                result[key][asset] = row[key]
+        return result
+
+    def fetch_positions(self, client, symbols=None):
+        # Mark atualizado (e liquidação de funding vencida) pela leitura leve do premiumIndex
+        for held in list(self.positions):
+            if not symbols or held in symbols:
+                try:
+                    client.fetch_funding_rate(held)
+                except Exception as e:
+                    LOGGER.warning(f"Paper trading: falha ao ler mark de {held}: {e}")
+
+        with self.lock:
+            wallet = self.wallets['future'].get('USDT', 0.0)
+            rows = []
+            for symbol, pos in self.positions.items():
+                if symbols and symbol not in symbols:
+                    continue
+                pnl, mark = self._unrealized(symbol, pos)
+                contract_size = self._contract_size(symbol)
+                # Margem cruzada: liquidado quando a perda consome 95% da carteira de Futuros
+                liquidation = max(pos['entry'] - (wallet * 0.95) / (pos['contracts'] * contract_size), 0.0)
+                rows.append({
+                    'symbol': symbol,
+                    'contracts': abs(pos['contracts']),
+                    'contractSize': contract_size,
+                    'side': 'short' if pos['contracts'] < 0 else 'long',
+                    'entryPrice': pos['entry'],
+                    'markPrice': mark,
+                    'notional': abs(pos['contracts']) * contract_size * mark,
+                    'unrealizedPnl': pnl,
+                    'liquidationPrice': liquidation,
+                    'leverage': 1,
+                    'marginMode': 'cross',
+                    'timestamp': client.milliseconds(),
+                    'info': {'paper': True},
+                })
+        return rows
+
+    def transfer(self, code, amount, source, target):
+        amount = float(amount)
+        with self.lock:
+            if self.wallets[source].get(code, 0.0) + 1e-9 < amount:
+                raise ccxt.InsufficientFunds(f"Paper trading: saldo insuficiente em {source} para transferir {amount} {code}.")
+            self.wallets[source][code] -= amount
+            self.wallets[target][code] = self.wallets[target].get(code, 0.0) + amount
+            self.tran_seq += 1
+            transfer_id = f"paper{self.tran_seq}"
+        self._save()
+        return {'id': transfer_id, 'currency': code, 'amount': amount, 'fromAccount': source,
+                'toAccount': target, 'status': 'ok', 'info': {'paper': True}}
@@ -0,0 +1,138 @@
+import time
+import threading
+import collections
+import concurrent.futures
+import numpy as np
+from configs.config import *
+from tools.metrics import PRETRADE_READ_LATENCY, PRETRADE_HEDGES
+from tools.rate_governor import GOVERNOR
+
+_MISSING = object()
+
+
+class HedgedReader:
+    """
+    Leituras sensíveis a latência logo antes do disparo das ordens (livros de ofertas).
+
+    - Prazo por chamada (PRETRADE_DEADLINE), independente do timeout HTTP do CCXT.
+    - Hedge: sem resposta até o percentil PRETRADE_HEDGE_PERCENTILE da latência recente
+      daquele tipo de leitura, dispara uma cópia e fica com a primeira que chegar.
+      Erro rápido da primeira tentativa antecipa a cópia.
+    - Prazo estourado (ou as duas tentativas falharam): devolve a última leitura da
+      mesma chave se for mais nova que PRETRADE_CACHE_MAX_AGE; senão, levanta o erro.
+    - Tentativas abandonadas terminam em segundo plano e ainda alimentam a latência
+      e o cache (o percentil enxerga a cauda real, não só o que chegou no prazo).
+    """
+    def __init__(self, workers=PRETRADE_WORKERS):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pretrade')
+        self.lock = threading.Lock()
+        self.latencies = {}     # {tipo: deque de segundos}
+        self.cache = {}         # {chave: (horário, valor)}
+
+    def hedge_delay(self, kind):
+        with self.lock:
+            samples = list(self.latencies.get(kind, ()))
+        if len(samples) < PRETRADE_MIN_SAMPLES:
+            return PRETRADE_HEDGE_DELAY_DEFAULT
+        return max(float(np.percentile(samples, PRETRADE_HEDGE_PERCENTILE)), PRETRADE_HEDGE_DELAY_MIN)
+
+    def _submit(self, key, kind, fetch):
+        started = time.monotonic()
+
+        def _done(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            with self.lock:
+                self.latencies.setdefault(kind, collections.deque(maxlen=PRETRADE_LATENCY_WINDOW)).append(time.monotonic() - started)
+                cached = self.cache.get(key)
+                if cached is None or cached[0] < started:
+                    self.cache[key] = (started, future.result())
+
+        future = self.pool.submit(fetch)
+        future.add_done_callback(_done)
+        return future
+
+    def read_many(self, calls, deadline=PRETRADE_DEADLINE):
+        """
+        Executa as leituras em paralelo. calls: [(chave, tipo, função sem argumentos)].
+        Retorna os valores na mesma ordem; levanta o erro da primeira leitura sem resultado.
+        """
+        start = time.monotonic()
+        end = start + deadline
+        reads = []
+        for key, kind, fetch in calls:
+            # As threads do pool não herdam a prioridade da chamadora (thread-local do governador)
+            fetch = GOVERNOR.inherit(fetch)
+            reads.append({
+                'key': key, 'kind': kind, 'fetch': fetch,
+                'attempts': {self._submit(key, kind, fetch): 'primary'},
+                'hedge_at': start + min(self.hedge_delay(kind), deadline),
+                'value': _MISSING, 'error': None,
+            })
+
+        while True:
+            now = time.monotonic()
+            pending = [read for read in reads if read['value'] is _MISSING and read['error'] is None]
+            if not pending or now >= end:
+                break
+
+            for read in pending:
+                if len(read['attempts']) == 1 and now >= read['hedge_at']:
+                    self._hedge(read)
+
+            waiting = [future for read in pending for future in read['attempts'] if not future.done()]
+            hedge_times = [read['hedge_at'] for read in pending if len(read['attempts']) == 1]
+            timeout = max(0.0, min([end, *hedge_times]) - now)
+            if waiting:
+                concurrent.futures.wait(waiting, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for read in pending:
+                self._settle(read)
+
+        return [self._finish(read, start) for read in reads]
+
+    def read(self, key, kind, fetch, deadline=PRETRADE_DEADLINE):
+        return self.read_many([(key, kind, fetch)], deadline=deadline)[0]
+
+    def _hedge(self, read):
+        read['attempts'][self._submit(read['key'], read['kind'], read['fetch'])] = 'hedge'
+        PRETRADE_HEDGES.labels(read=read['kind']).inc()
+
+    def _settle(self, read):
+        """Primeiro resultado válido vence; tentativa com erro antecipa o hedge ou encerra a leitura."""
+        failed = 0
+        for future, source in read['attempts'].items():
+            if not future.done():
+                continue
+            if future.exception() is None:
+                read['value'], read['source'] = future.result(), source
+                return
+            failed += 1
+            read['last_error'] = future.exception()
+
+        if failed == len(read['attempts']):
+            if len(read['attempts']) == 1:
+                self._hedge(read)
+            else:
+                read['error'] = read['last_error']
+
+    def _finish(self, read, start):
+        elapsed = time.monotonic() - start
+        if read['value'] is not _MISSING:
+            PRETRADE_READ_LATENCY.labels(read=read['kind'], source=read['source']).observe(elapsed)
+            return read['value']
+
+        with self.lock:
+            cached = self.cache.get(read['key'])
+        error = read['error'] or read.get('last_error') or TimeoutError(f"Leitura pré-ordem '{read['kind']}' passou do prazo ({elapsed:.2f}s)")
+        if cached and time.monotonic() - cached[0] <= PRETRADE_CACHE_MAX_AGE:
+            LOGGER.warning(
+                "Leitura pré-ordem %s sem resposta a tempo (%s). Usando cache de %.2fs.",
+                read['key'], error, time.monotonic() - cached[0],
+                extra={'read': read['kind'], 'cache_age': time.monotonic() - cached[0]}
+            )
+            PRETRADE_READ_LATENCY.labels(read=read['kind'], source='cache').observe(elapsed)
+            return cached[1]
+
+        PRETRADE_READ_LATENCY.labels(read=read['kind'], source='failed').observe(elapsed)
+        raise error
@@ -0,0 +1,145 @@
+import math
+import time
+import threading
+from configs.config import *
+
+
+class PriceBands:
+    """
+    Preço limite das ordens IOC calibrado pelo livro e pelas próprias execuções.
+
+    - plan() percorre o livro atual até cobrir a quantidade e usa o pior nível tocado
+      como base; soma um buffer para a latência/volatilidade entre a leitura do livro
+      e a chegada da ordem.
+    - record_fill() aprende esse buffer: média e variância exponenciais do deslocamento
+      adverso observado (preço médio executado vs. preço esperado pelo livro). Execução
+      parcial alarga o buffer imediatamente.
+    - O buffer é por (símbolo, lado), com o agregado por lado como fallback até haver
+      PRICE_BAND_MIN_FILLS execuções do símbolo.
+    - seed() retoma a calibração das ordens IOC do diário de execução ao iniciar (sem ela o
+      buffer voltaria ao padrão a cada reinício).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    # --- Planejamento ---
+
+    def buffer(self, symbol, side):
+        with self.lock:
+            stats = self.stats.get((symbol, side))
+            if not stats or stats['n'] < PRICE_BAND_MIN_FILLS:
+                stats = self.stats.get(('*', side))
+            if not stats:
+                return PRICE_BAND_DEFAULT_BUFFER
+            value = stats['mean'] + PRICE_BAND_SIGMAS * math.sqrt(stats['var'])
+        return min(max(value, PRICE_BAND_FLOOR), PRICE_BAND_MAX)
+
+    def plan(self, client, symbol, side, amount=None, usd=None, book=None):
+        """
+        Planeja a perna: {'symbol', 'side', 'best', 'expected', 'limit', 'buffer', 'depth_ok', 'planned_at'}.
+        Informe amount (quantidade na unidade do mercado) ou usd (valor financeiro).
+        book: livro já lido (ex: leitura pré-ordem com prazo); se None, busca agora.
+        """
+        if book is None:
+            book = client.fetch_order_book(symbol, limit=PRICE_BAND_BOOK_DEPTH)
+        # Compra consome os asks; venda consome os bids
+        levels = book['asks'] if side == 'buy' else book['bids']
+        if not levels:
+            raise ValueError(f"Livro vazio para {symbol}")
+
+        best = levels[0][0]
+        filled = cost = 0.0
+        worst = best
+        for price, qty in levels:
+            if amount is not None:
+                take = min(qty, amount - filled)
+            else:
+                take = min(qty, (usd - cost) / price)
+            filled += take
+            cost += take * price
+            worst = price
+            if (amount is not None and filled >= amount) or (usd is not None and cost >= usd - 1e-9):
+                break
+
+        target = amount if amount is not None else usd
+        depth_ok = (filled if amount is not None else cost) >= target * (1 - 1e-9)
+        expected = cost / filled if filled else best
+        sign = 1 if side == 'buy' else -1
+        buffer = self.buffer(symbol, side)
+
+        if depth_ok:
+            limit = worst * (1 + sign * buffer)
+        else:
+            # Livro raso demais para a quantidade: usa a banda máxima
+            limit = best * (1 + sign * PRICE_BAND_MAX)
+
+        # Nunca se afasta do topo do livro mais que a banda máxima
+        if sign > 0:
+            limit = min(limit, best * (1 + PRICE_BAND_MAX))
+        else:
+            limit = max(limit, best * (1 - PRICE_BAND_MAX))
+
+        return {
+            'symbol': symbol, 'side': side, 'best': best, 'expected': expected,
+            'limit': limit, 'buffer': buffer, 'depth_ok': depth_ok, 'planned_at': time.time(),
+        }
+
+    # --- Calibração ---
+
+    def record_fill(self, plan, order):
+        """Atualiza o buffer com o resultado da ordem planejada (ordem None = falha de envio, ignorada)."""
+        if not plan or not order:
+            return
+        amount = float(order.get('amount') or 0.0)
+        filled = float(order.get('filled') or 0.0)
+        average = order.get('average')
+        sign = 1 if plan['side'] == 'buy' else -1
+
+        observations = []
+        if filled > 0 and average:
+            # Positivo = executou pior que o livro lido no planejamento
+            observations.append(max(0.0, sign * (float(average) - plan['expected']) / plan['expected']))
+        if amount > 0 and filled < amount * (1 - 1e-9):
+            # Parcial: o buffer usado não bastou
+            observations.append(plan['buffer'] * PRICE_BAND_WIDEN)
+            LOGGER.info(
+                "Banda IOC: execução parcial em %s (%s) com buffer %.4f%%. Alargando.",
+                plan['symbol'], plan['side'], plan['buffer'] * 100,
+                extra={'symbol': plan['symbol'], 'side': plan['side'], 'fill_ratio': filled / amount}
+            )
+
+        with self.lock:
+            for value in observations:
+                for key in ((plan['symbol'], plan['side']), ('*', plan['side'])):
+                    self._update(key, value)
+
+    def seed(self, fills):
+        """
+        Reaplica execuções do diário (mais antigas primeiro): {'symbol', 'side', 'amount', 'filled',
+        'limit_price', 'intended_price', 'avg_price'}. O diário não guarda o buffer usado; numa parcial
+        ele é aproximado pela distância do limite ao preço esperado.
+        """
+        with self.lock:
+            for fill in fills:
+                expected = fill['intended_price']
+                sign = 1 if fill['side'] == 'buy' else -1
+                observations = []
+                if fill['filled'] > 0 and fill['avg_price']:
+                    observations.append(max(0.0, sign * (fill['avg_price'] - expected) / expected))
+                if fill['filled'] < fill['amount'] * (1 - 1e-9) and fill['limit_price']:
+                    observations.append(max(0.0, sign * (fill['limit_price'] - expected) / expected) * PRICE_BAND_WIDEN)
+                for value in observations:
+                    for key in ((fill['symbol'], fill['side']), ('*', fill['side'])):
+                        self._update(key, value)
+        return len(fills)
+
+    def _update(self, key, value):
+        stats = self.stats.get(key)
+        if stats is None:
+            self.stats[key] = {'mean': value, 'var': 0.0, 'n': 1}
+            return
+        diff = value - stats['mean']
+        stats['mean'] += PRICE_BAND_ALPHA * diff
+        stats['var'] = (1 - PRICE_BAND_ALPHA) * (stats['var'] + PRICE_BAND_ALPHA * diff * diff)
+        stats['n'] += 1
@@ -0,0 +1,471 @@
+import os
+import time
+import signal
+import threading
+import numpy as np
+from datetime import datetime
+from configs.config import *
+from tools.ipc import Channel, new_request_id, ROLE_MARKET_DATA, ROLE_STRATEGY, ROLE_EXECUTION
+from tools.exchanges import create_client
+from tools.strategy import CashAndCarryBot
+from tools.database import DataManager, monthly_db_path
+from tools.market_table import MarketTable
+from tools.state import Position
+from tools.metrics import start_metrics_server, LOOP_CYCLES, LOOP_DURATION
+from tools.tracing import span, PROFILER
+from tools.scheduler import EventScheduler, plan_scan_time, plan_monitor_time, plan_degraded_time
+
+# Processos do modo multiprocesso (main.py --multiprocess). Cada função é o alvo de um
+# processo filho do supervisor e recebe a sua ponta do Pipe com ele (tools/ipc.py).
+
+
+def _bootstrap(role, conn):
+    """Preparação comum dos processos filhos: sinais, métricas e heartbeat."""
+    # Ctrl+C chega ao grupo inteiro: só o supervisor reage e pede o encerramento pela fila
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    start_metrics_server(port=MP_METRICS_PORTS.get(role, 0))
+
+    channel = Channel(role, conn)
+
+    def _beat():
+        while True:
+            channel.heartbeat()
+            time.sleep(MP_HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=_beat, name=f"{role}-heartbeat", daemon=True).start()
+    LOGGER.info(f"Processo '{role}' iniciado (pid {os.getpid()}).")
+    return channel
+
+
+def _run_cycle(branch, func):
+    """Executa um ciclo com métricas e span de tracing."""
+    LOOP_CYCLES.labels(branch=branch).inc()
+    with LOOP_DURATION.labels(branch=branch).time(), span('cycle', branch=branch):
+        func()
+
+
+# --- Dados de Mercado ---
+
+def _number(value):
+    return float(value) if value is not None else np.nan
+
+
+def _feed_swap(table, client):
+    """Tickers de todos os perpétuos USDT + funding em lote (premiumIndex) -> tabela."""
+    tickers = client.fetch_tickers()
+    symbols = [symbol for symbol in tickers if symbol.endswith(':USDT')]
+    table.write(
+        symbols, True,
+        bid=[_number(tickers[s].get('bid')) for s in symbols],
+        ask=[_number(tickers[s].get('ask')) for s in symbols],
+        last=[_number(tickers[s].get('last')) for s in symbols],
+        quote_volume=[_number(tickers[s].get('quoteVolume')) for s in symbols],
+        exchange_ts=[_number(tickers[s].get('timestamp')) for s in symbols],
+    )
+
+    # Falha no funding mantém a última taxa escrita (leitores a descartam pela idade da linha)
+    rates = {symbol: info for symbol, info in client.fetch_funding_rates().items()
+             if symbol.endswith(':USDT') and info.get('fundingRate') is not None}
+    symbols = list(rates)
+    table.write(
+        symbols, True,
+        mark=[_number(rates[s].get('markPrice')) for s in symbols],
+        funding=[_number(rates[s]['fundingRate']) for s in symbols],
+        next_funding=[_number(rates[s].get('nextFundingTimestamp') or rates[s].get('fundingTimestamp')) for s in symbols],
+        exchange_ts=[_number(rates[s].get('timestamp')) for s in symbols],
+    )
+
+
+def _feed_spot(table, client):
+    """Tickers de todos os pares Spot em USDT -> tabela."""
+    tickers = client.fetch_tickers()
+    symbols = [symbol for symbol in tickers if symbol.endswith('/USDT')]
+    table.write(
+        symbols, False,
+        bid=[_number(tickers[s].get('bid')) for s in symbols],
+        ask=[_number(tickers[s].get('ask')) for s in symbols],
+        last=[_number(tickers[s].get('last')) for s in symbols],
+        quote_volume=[_number(tickers[s].get('quoteVolume')) for s in symbols],
+        exchange_ts=[_number(tickers[s].get('timestamp')) for s in symbols],
+    )
+
+
+def _start_feed(name, table, update):
+    """Thread de um feed: único escritor das suas linhas, com cliente próprio (o CCXT não é thread-safe)."""
+    client = create_client(name, label=f"market_feed_{name}")
+
+    def _loop():
+        while True:
+            started = time.time()
+            try:
+                with span('market_data.feed', feed=name):
+                    update(table, client)
+            except Exception as e:
+                LOGGER.warning(f"Dados de mercado: falha no feed '{name}': {e}")
+            time.sleep(max(0.0, MARKET_TABLE_INTERVAL - (time.time() - started)))
+
+    threading.Thread(target=_loop, name=f"market-feed-{name}", daemon=True).start()
+
+
+def run_market_data(conn):
+    """
+    Dono dos feeds em lote: tickers Spot/Swap e funding de todos os perpétuos.
+    Cada feed reescreve a tabela em memória compartilhada a cada MARKET_TABLE_INTERVAL, lida
+    sem cópia pelos outros processos. market.request é atendido pela tabela; sem ela (ou com
+    ela velha), por um retrato buscado na hora (reaproveitado por MP_SNAPSHOT_MAX_AGE).
+    """
+    channel = _bootstrap(ROLE_MARKET_DATA, conn)
+    exchange_swap = create_client('swap', label='market_data_swap')
+    exchange_spot = create_client('spot', label='market_data_spot')
+    snapshot = None
+
+    table = MarketTable.attach()
+    if table is None:
+        LOGGER.warning("Dados de mercado: tabela em memória compartilhada indisponível. Só retratos sob demanda.")
+    else:
+        _start_feed('swap', table, _feed_swap)
+        _start_feed('spot', table, _feed_spot)
+
+    while True:
+        message = channel.recv()
+        if message['type'] == 'sys.shutdown':
+            break
+        if message['type'] != 'market.request':
+            continue
+
+        try:
+            table_snapshot = table.snapshot() if table else None
+            if table_snapshot:
+                snapshot = table_snapshot
+            elif snapshot is None or time.time() - snapshot['fetched_at'] > MP_SNAPSHOT_MAX_AGE:
+                with span('market_data.snapshot'):
+                    tickers_swap = exchange_swap.fetch_tickers()
+                    tickers_spot = exchange_spot.fetch_tickers()
+                    funding_rates = {}
+                    try:
+                        for symbol, info in exchange_swap.fetch_funding_rates().items():
+                            if info.get('fundingRate') is not None:
+                                ts = info.get('nextFundingTimestamp') or info.get('fundingTimestamp')
+                                funding_rates[symbol] = (info['fundingRate'], ts / 1000 if ts else None)
+                    except Exception as e:
+                        # Sem o lote, o scanner da estratégia consulta par a par
+                        LOGGER.warning(f"Dados de mercado: falha ao buscar funding em lote: {e}")
+                snapshot = {
+                    'tickers_swap': tickers_swap,
+                    'tickers_spot': tickers_spot,
+                    'funding_rates': funding_rates,
+                    'fetched_at': time.time(),
+                }
+            channel.send(message['source'], 'market.snapshot', request_id=message['request_id'], **snapshot)
+        except Exception as e:
+            LOGGER.error(f"Dados de mercado: falha ao montar retrato: {e}")
+
+    if table:
+        table.close()
+    LOGGER.info("Processo de dados de mercado encerrado.")
+
+
+# --- Estratégia ---
+
+def run_strategy(conn):
+    """
+    Dono do scan e da decisão de entrada. Escaneia só sem posição (segundo o último
+    position.update da execução), lê o retrato de mercado da tabela em memória compartilhada
+    (ou o pede ao processo de dados de mercado), pontua os candidatos e envia order.entry
+    com o melhor; o scan é registrado no banco quando chega o order.result.
+    """
+    channel = _bootstrap(ROLE_STRATEGY, conn)
+    bot = CashAndCarryBot(role=ROLE_STRATEGY)
+    table = MarketTable.attach()
+
+    current_month = datetime.now().strftime('%m-%Y')
+    db_manager = DataManager(db_name=monthly_db_path(current_month))
+
+    known = False               # Só escaneia depois de saber se há posição
+    next_scan = time.time()
+    pending_snapshot = None     # (request_id, enviado em)
+    pending_order = None        # {'request_id', 'sent_at', 'record'}
+
+    def log_scan(record):
+        nonlocal db_manager, current_month
+        new_month = datetime.now().strftime('%m-%Y')
+        if new_month != current_month:
+            db_manager.close()
+            current_month = new_month
+            db_manager = DataManager(db_name=monthly_db_path(current_month))
+        db_manager.log_scan_attempt(record)
+
+    def scan(snapshot):
+        nonlocal pending_order, next_scan
+        top_pairs, tickers_swap, tickers_spot = bot.get_top_volume_pairs(snapshot)
+        next_scan = plan_scan_time(time.time())
+
+        if not top_pairs:
+            LOGGER.info("Nenhum par aprovado. Aguardando próximo ciclo...")
+            return
+
+        viable, unviable, reasons = bot.evaluate_candidates(top_pairs, tickers_swap, tickers_spot)
+        if not viable:
+            log_scan(bot.scan_record(top_pairs, unviable, reasons))
+            return
+
+        best = bot.best_opportunity(viable)
+        LOGGER.info(f"{COLOR_CYAN}MELHOR OPORTUNIDADE:{COLOR_RESET}")
+        LOGGER.info(f"{COLOR_CYAN}Par: {best['pair']}{COLOR_RESET}")
+        LOGGER.info(f"{COLOR_CYAN}Funding: {best['funding_rate']:.4%}{COLOR_RESET}")
+
+        request_id = new_request_id(ROLE_STRATEGY)
+        channel.send(ROLE_EXECUTION, 'order.entry', request_id=request_id, symbol=best['pair'],
+                     spot_symbol=best['spot_symbol'], funding_rate=best['funding_rate'])
+        pending_order = {
+            'request_id': request_id,
+            'sent_at': time.time(),
+            'record': (top_pairs, unviable, reasons, best),
+        }
+
+    def run_scan(snapshot):
+        nonlocal next_scan
+        try:
+            _run_cycle('scan', lambda: scan(snapshot))
+        except Exception as e:
+            LOGGER.error(f"Estratégia: erro no scan: {e}")
+            next_scan = plan_scan_time(time.time())
+
+    while True:
+        now = time.time()
+        wait = max(0.0, next_scan - now) if known and bot.position is None else None
+        message = channel.recv(timeout=min(wait, MP_HEARTBEAT_INTERVAL) if wait is not None else MP_HEARTBEAT_INTERVAL)
+
+        if message:
+            kind = message['type']
+            if kind == 'sys.shutdown':
+                break
+
+            elif kind == 'position.update':
+                had_position = bot.position is not None
+                bot.position = Position.from_dict(message['position']) if message['position'] else None
+                bot.capital = message['capital']
+                if had_position and bot.position is None:
+                    # Posição encerrada: próximo scan no horário planejado
+                    next_scan = plan_scan_time(time.time())
+                known = True
+
+            elif kind == 'market.snapshot' and pending_snapshot and message['request_id'] == pending_snapshot[0]:
+                pending_snapshot = None
+                run_scan(message)
+
+            elif kind == 'order.result' and pending_order and message['request_id'] == pending_order['request_id']:
+                top_pairs, unviable, reasons, best = pending_order['record']
+                pending_order = None
+                outcome = "ENTRY_EXECUTED" if message['success'] else "ENTRY_FAILED"
+                if not message['success'] and message['reason']:
+                    LOGGER.warning(f"Estratégia: entrada recusada/falhou ({message['reason']})")
+                log_scan(bot.scan_record(top_pairs, unviable, reasons, best=best, outcome=outcome))
+
+        now = time.time()
+        if pending_snapshot and now - pending_snapshot[1] > MP_SNAPSHOT_TIMEOUT:
+            LOGGER.warning("Estratégia: retrato de mercado não chegou. Tentando de novo.")
+            pending_snapshot = None
+        if pending_order and now - pending_order['sent_at'] > MP_ORDER_TIMEOUT:
+            LOGGER.warning("Estratégia: execução não respondeu à ordem. Voltando a escanear.")
+            pending_order = None
+
+        if not known or bot.position is not None or pending_snapshot or pending_order or now < next_scan:
+            continue
+
+        if (bot.capital / 2) < MIN_ORDER_VALUE_USD:
+            LOGGER.info("CAPITAL INSUFICIENTE! (< $22) Aguardando próximo scan...")
+            next_scan = plan_scan_time(now)
+            continue
+
+        degraded_until = plan_degraded_time(now)
+        if degraded_until:
+            LOGGER.warning("Estratégia: exchange degradada (disjuntor aberto). Scan adiado.")
+            next_scan = degraded_until
+            continue
+
+        # Tabela recente: scan direto, sem ida e volta pelo supervisor
+        snapshot = table.snapshot() if table else None
+        if snapshot:
+            run_scan(snapshot)
+            continue
+
+        request_id = new_request_id(ROLE_STRATEGY)
+        channel.send(ROLE_MARKET_DATA, 'market.request', request_id=request_id)
+        pending_snapshot = (request_id, now)
+
+    if table:
+        table.close()
+    db_manager.close()
+    LOGGER.info("Processo de estratégia encerrado.")
+
+
+# --- Execução e Risco ---
+
+def run_execution(conn):
+    """
+    Dono das ordens, do estado, dos saldos e do Guardião. Executa order.entry, monitora a
+    posição aberta (saídas, compounding, funding) e publica position.update para a estratégia.
+    Não escaneia: scans e pontuação pesados rodam em outro processo, longe do GIL do Guardião.
+    """
+    channel = _bootstrap(ROLE_EXECUTION, conn)
+    PROFILER.install_signal()
+
+    bot = CashAndCarryBot()
+    bot.market_table = MarketTable.attach()
+    bot.start_guardian()
+    bot.start_sweeper()
+
+    current_month = datetime.now().strftime('%m-%Y')
+    db_manager = DataManager(db_name=monthly_db_path(current_month))
+    bot.db_manager = db_manager
+    bot.seed_price_bands()
+
+    scheduler = EventScheduler()
+
+    def publish():
+        channel.send(ROLE_STRATEGY, 'position.update', position=bot.position.to_dict() if bot.position else None, capital=bot.capital)
+
+    def schedule_idle(when=None):
+        scheduler.cancel('monitor')
+        scheduler.schedule('idle', when if when is not None else time.time() + MP_POSITION_BROADCAST, idle_job)
+
+    def schedule_monitor(when=None):
+        when = when if when is not None else plan_monitor_time(bot, time.time())
+        scheduler.cancel('idle')
+        scheduler.schedule('monitor', when, lambda: _run_cycle('monitor', monitor_job))
+
+    def idle_job():
+        try:
+            idle_cycle()
+        finally:
+            ensure_next_cycle()
+
+    def idle_cycle():
+        if bot.position is not None:
+            schedule_monitor(time.time())
+            return
+        try:
+            # Capital publicado para a estratégia nunca passa de MP_POSITION_BROADCAST
+            bot.auto_balance_wallets(max_age=BALANCE_SCAN_MAX_AGE)
+        except Exception as e:
+            LOGGER.error(f"Falha no auto-balanceamento: {e}")
+        publish()
+        schedule_idle()
+
+    def ensure_next_cycle():
+        """Uma exceção no meio do ciclo não pode deixar o loop sem próximo idle/monitoramento."""
+        if scheduler.next_run('idle') or scheduler.next_run('monitor'):
+            return
+        LOGGER.warning("Execução: ciclo terminou sem reagendar. Agendando o próximo por segurança.")
+        if bot.position is None:
+            schedule_idle()
+        else:
+            schedule_monitor(time.time() + MONITOR_INTERVAL_ALERT)
+
+    def monitor_job():
+        try:
+            monitor_cycle()
+        finally:
+            ensure_next_cycle()
+
+    def monitor_cycle():
+        if bot.position is None:
+            publish()
+            schedule_idle(time.time())
+            return
+
+        degraded_until = plan_degraded_time(time.time())
+        if degraded_until:
+            LOGGER.warning("Exchange degradada (disjuntor aberto). Monitoramento adiado.")
+            schedule_monitor(degraded_until)
+            return
+
+        bot.monitor_and_manage(db_manager)
+        publish()
+
+        if bot.position is None:
+            schedule_idle()
+        else:
+            schedule_monitor()
+
+    def entry_job(message):
+        success, reason = False, None
+        try:
+            if bot.position is not None:
+                reason = "POSITION_OPEN"
+            elif plan_degraded_time(time.time()):
+                reason = "EXCHANGE_DEGRADED"
+            else:
+                # Índice Perpétuo -> Spot (multiplicadores) deste processo; o scan roda em outro
+                bot._refresh_markets()
+                # Antes da entrada o saldo não pode ser velho
+                bot.auto_balance_wallets(max_age=BALANCE_SCAN_MAX_AGE)
+                if (bot.capital / 2) < MIN_ORDER_VALUE_USD:
+                    reason = "INSUFFICIENT_CAPITAL"
+                else:
+                    success = bot.execute_real_entry(message['symbol'], message['spot_symbol'], bot.capital)
+        except Exception as e:
+            LOGGER.error(f"Execução: erro na entrada: {e}")
+            reason = "ERROR"
+
+        channel.send(message['source'], 'order.result', request_id=message['request_id'], success=success, reason=reason)
+        publish()
+        if success:
+            # Primeiro monitoramento logo após a entrada (lê a próxima liquidação)
+            schedule_monitor(time.time())
+
+    def housekeeping_job():
+        nonlocal db_manager, current_month
+        new_month = datetime.now().strftime('%m-%Y')
+        if new_month != current_month:
+            LOGGER.info(f"Virada de mês detectada ({current_month} -> {new_month}). Rotacionando DB...")
+            previous_db = db_manager
+            current_month = new_month
+            db_manager = DataManager(db_name=monthly_db_path(current_month))
+            bot.db_manager = db_manager
+            previous_db.close()
+
+        PROFILER.poll_toggle()
+        scheduler.schedule_in('housekeeping', HOUSEKEEPING_INTERVAL, housekeeping_job)
+
+    def on_bot_event(event):
+        """Eventos vindos do bot/Guardião (qualquer thread)."""
+        if event == 'POSITION_CLOSED':
+            publish()
+            schedule_idle()
+        elif event == 'RISK_ALERT':
+            next_monitor = scheduler.next_run('monitor')
+            if next_monitor and next_monitor - time.time() > MONITOR_INTERVAL_ALERT:
+                scheduler.trigger('monitor', reason="alerta de risco do Guardião")
+
+    def pump():
+        """Caixa de entrada -> agendador (as ordens rodam na mesma thread do monitoramento)."""
+        while True:
+            message = channel.recv()
+            if message['type'] == 'sys.shutdown':
+                scheduler.stop()
+                return
+            if message['type'] == 'order.entry':
+                scheduler.schedule(f"entry:{message['request_id']}", time.time(),
+                                   lambda message=message: _run_cycle('entry', lambda: entry_job(message)))
+
+    bot.on_event = on_bot_event
+    threading.Thread(target=pump, name="execution-inbox", daemon=True).start()
+
+    scheduler.schedule_in('housekeeping', HOUSEKEEPING_INTERVAL, housekeeping_job)
+    if bot.position is None:
+        schedule_idle(time.time())
+    else:
+        publish()
+        schedule_monitor(time.time())
+
+    try:
+        scheduler.run()
+    finally:
+        bot.guardian_active = False
+        if bot.market_table:
+            bot.market_table.close()
+        PROFILER.stop()
+        db_manager.close()
+        LOGGER.info("Processo de execução encerrado.")
@@ -0,0 +1,156 @@
+import time
+import heapq
+import itertools
+import threading
+from configs.config import *
+
+
+class CandidateRanking:
+    """
+    Ranking incremental dos pares aprovados no filtro de consistência de funding.
+
+    - Cada símbolo guarda os valores de referência (funding, volume, basis) da última
+      análise completa; só volta a ser analisado se algum deles andar além do limite,
+      se passar uma liquidação (o histórico muda) ou na reconciliação completa.
+    - Pares reprovados ficam num cache negativo com TTL (também expira na liquidação
+      ou se o funding se mover além do limite).
+    - O melhor candidato sai de um heap com invalidação preguiçosa: O(log n).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.negative = {}
+        self.heap = []
+        self.seq = itertools.count()
+        self.last_full_scan = 0.0
+
+    # --- Decisão de reanálise ---
+
+    def full_rescan_due(self, now=None):
+        now = now or time.time()
+        return now - self.last_full_scan >= RANK_FULL_RESCAN_INTERVAL
+
+    def mark_full_scan(self, now=None):
+        self.last_full_scan = now or time.time()
+
+    def is_negative(self, symbol, funding_rate, now=None):
+        """True se o par reprovou recentemente e nada relevante mudou desde então."""
+        now = now or time.time()
+        entry = self.negative.get(symbol)
+        if not entry:
+            return False
+        if now >= entry['expires'] or abs(funding_rate - entry['funding_rate']) > RANK_FUNDING_DELTA:
+            self.negative.pop(symbol, None)
+            return False
+        return True
+
+    def needs_refresh(self, symbol, funding_rate, volume, basis, now=None):
+        """True se o par é novo no ranking ou se moveu além dos limites desde a última análise."""
+        now = now or time.time()
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return True
+        if entry['next_funding'] and now >= entry['next_funding']:
+            return True
+        if abs(funding_rate - entry['ref_funding']) > RANK_FUNDING_DELTA:
+            return True
+        if entry['ref_volume'] > 0 and abs(volume - entry['ref_volume']) / entry['ref_volume'] > RANK_VOLUME_DELTA:
+            return True
+        if abs(basis - entry['ref_basis']) > RANK_BASIS_DELTA:
+            return True
+        return False
+
+    # --- Atualização ---
+
+    def record_analysis(self, symbol, is_valid, funding_rate, avg_rate, volume, basis, next_funding=None, now=None):
+        """Resultado de uma análise completa (_analyze_funding_consistency)."""
+        now = now or time.time()
+        with self.lock:
+            if not is_valid:
+                self._remove(symbol)
+                expires = now + NEGATIVE_CACHE_TTL
+                if next_funding:
+                    expires = min(expires, next_funding)
+                self.negative[symbol] = {'funding_rate': funding_rate, 'expires': expires}
+                return
+
+            self.negative.pop(symbol, None)
+            self.entries[symbol] = {
+                'symbol': symbol,
+                'funding_rate': funding_rate,
+                'avg_rate': avg_rate,
+                'volume': volume,
+                'ref_funding': funding_rate,
+                'ref_volume': volume,
+                'ref_basis': basis,
+                'next_funding': next_funding,
+                'analyzed_at': now,
+            }
+            self._push(symbol)
+
+    def observe(self, symbol, funding_rate, volume):
+        """Atualiza funding/volume correntes de um par já aprovado (sem nova análise)."""
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None or (entry['funding_rate'] == funding_rate and entry['volume'] == volume):
+                return
+            entry['funding_rate'] = funding_rate
+            entry['volume'] = volume
+            self._push(symbol)
+
+    def retain(self, symbols):
+        """Remove do ranking os pares que saíram do universo de candidatos (volume, status)."""
+        with self.lock:
+            for symbol in list(self.entries):
+                if symbol not in symbols:
+                    self._remove(symbol)
+
+    def _push(self, symbol):
+        entry = self.entries[symbol]
+        version = next(self.seq)
+        entry['version'] = version
+        heapq.heappush(self.heap, (-entry['funding_rate'], -entry['volume'], version, symbol))
+
+        # Compacta quando os itens órfãos dominam o heap
+        if len(self.heap) > 4 * len(self.entries) + 64:
+            self.heap = [
+                (-e['funding_rate'], -e['volume'], e['version'], s) for s, e in self.entries.items()
+            ]
+            heapq.heapify(self.heap)
+
+    def _remove(self, symbol):
+        # O item no heap fica órfão e é descartado quando chegar ao topo
+        self.entries.pop(symbol, None)
+
+    # --- Consulta ---
+
+    def best(self, eligible=None):
+        """
+        Melhor par aprovado (maior funding, desempate por volume) ou None.
+        eligible restringe aos símbolos informados (ex: os viáveis após custos); os que ficam
+        de fora saem do topo só durante a consulta e voltam ao heap no final.
+        """
+        with self.lock:
+            skipped = []
+            try:
+                while self.heap:
+                    _, _, version, symbol = self.heap[0]
+                    entry = self.entries.get(symbol)
+                    if entry is None or entry['version'] != version:
+                        heapq.heappop(self.heap)
+                    elif eligible is not None and symbol not in eligible:
+                        skipped.append(heapq.heappop(self.heap))
+                    else:
+                        return dict(entry)
+                return None
+            finally:
+                for item in skipped:
+                    heapq.heappush(self.heap, item)
+
+    def approved(self):
+        """Pares aprovados no formato do scanner: {symbol: {'funding_rate', 'volume'}}."""
+        with self.lock:
+            return {
+                symbol: {'funding_rate': entry['funding_rate'], 'volume': entry['volume']}
+                for symbol, entry in self.entries.items()
+            }
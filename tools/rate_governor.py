@@ -0,0 +1,189 @@
+import ccxt
+import time
+import heapq
+import functools
+import itertools
+import threading
+from contextlib import contextmanager
+from configs.config import *
+from tools.api_accounting import endpoint_key, endpoint_weight, endpoint_pool, wrap_fetch
+
+# Prioridades (menor = mais urgente)
+PRIORITY_GUARDIAN = 0
+PRIORITY_ORDER = 1
+PRIORITY_MONITOR = 2
+PRIORITY_SCAN = 3
+
+# Endpoints que sempre sobem para prioridade de ordem
+ORDER_ENDPOINTS = {'POST /api/v3/order', 'POST /fapi/v1/order', 'POST /sapi/v1/asset/transfer'}
+
+
+class RequestGovernor:
+    """
+    Governador único do processo para o peso de requisições da Binance.
+
+    - Contabiliza o peso por janela de 1 minuto em cada pool (spot: api/sapi, futures: fapi),
+      reconciliando com o header X-MBX-USED-WEIGHT-1M devolvido pela exchange.
+    - Requisições aguardam em fila de prioridade: Guardião e ordens passam primeiro, scans por último.
+    - Scans só usam a fração WEIGHT_SAFETY_MARGIN do limite; o restante fica reservado
+      para Guardião/ordens.
+    - Em 418/429 bloqueia o pool inteiro pelo Retry-After informado.
+    """
+    def __init__(self, limits=None, safety_margin=WEIGHT_SAFETY_MARGIN):
+        self.limits = limits or {'spot': WEIGHT_LIMIT_SPOT, 'futures': WEIGHT_LIMIT_FUTURES}
+        self.safety_margin = safety_margin
+        self.cond = threading.Condition()
+        self.local = threading.local()
+        self.seq = itertools.count()
+
+        self.window = {pool: int(time.time() // 60) for pool in self.limits}
+        self.used = {pool: 0 for pool in self.limits}
+        self.blocked_until = {pool: 0.0 for pool in self.limits}
+        self.queues = {pool: [] for pool in self.limits}
+
+    # --- Contexto de prioridade ---
+
+    @contextmanager
+    def priority(self, level):
+        """
+        Define a prioridade das requisições feitas pela thread atual dentro do bloco.
+        Blocos aninhados só aumentam a urgência (ex: fechamento disparado pelo Guardião).
+        """
+        previous = getattr(self.local, 'priority', None)
+        self.local.priority = level if previous is None else min(level, previous)
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def inherit(self, func):
+        """
+        Envolve func para rodar com a prioridade da thread atual (threads de pool não herdam o thread-local).
+        """
+        level = getattr(self.local, 'priority', None)
+        if level is None:
+            return func
+
+        def _run(*args, **kwargs):
+            with self.priority(level):
+                return func(*args, **kwargs)
+        return _run
+
+    def attach(self, client, default_priority=PRIORITY_SCAN):
+        """
+        Coloca o cliente CCXT sob o governador (desliga o rate limiter fixo do CCXT).
+        """
+        client.enableRateLimit = False
+
+        def hook(client, method, url, body, call):
+            key = endpoint_key(method, url)
+            priority = getattr(self.local, 'priority', None)
+            priority = default_priority if priority is None else min(priority, default_priority)
+            if key in ORDER_ENDPOINTS:
+                priority = min(priority, PRIORITY_ORDER)
+
+            pool = endpoint_pool(url)
+            self.acquire(pool, endpoint_weight(method, url, body), priority)
+            banned = False
+            try:
+                return call()
+            except ccxt.DDoSProtection:
+                # 418 (banido) e 429 (RateLimitExceeded) chegam como DDoSProtection no CCXT
+                banned = True
+                raise
+            finally:
+                self.observe(pool, client.last_response_headers, banned)
+
+        return wrap_fetch(client, hook)
+
+    # --- Admissão ---
+
+    def _roll_window(self, pool, now):
+        minute = int(now // 60)
+        if minute != self.window[pool]:
+            self.window[pool] = minute
+            self.used[pool] = 0
+
+    def _budget(self, pool, priority):
+        limit = self.limits[pool]
+        if priority <= PRIORITY_ORDER:
+            return limit
+        return limit * self.safety_margin
+
+    def acquire(self, pool, weight, priority):
+        """
+        Bloqueia até a requisição caber no orçamento do minuto, respeitando a fila de prioridade.
+        """
+        ticket = (priority, next(self.seq))
+        with self.cond:
+            heapq.heappush(self.queues[pool], ticket)
+            try:
+                while True:
+                    now = time.time()
+                    self._roll_window(pool, now)
+
+                    wait = self.blocked_until[pool] - now
+                    if wait <= 0 and self.queues[pool][0] == ticket:
+                        if self.used[pool] + weight <= self._budget(pool, priority):
+                            self.used[pool] += weight
+                            return
+                        # Sem orçamento: espera a virada do minuto
+                        wait = 60 - (now % 60)
+                        LOGGER.debug("Governador: pool %s no limite (%s), aguardando %.1fs", pool, self.used[pool], wait)
+                    elif wait <= 0:
+                        wait = 60 - (now % 60)
+
+                    self.cond.wait(timeout=wait)
+            finally:
+                self.queues[pool].remove(ticket)
+                heapq.heapify(self.queues[pool])
+                self.cond.notify_all()
+
+    def observe(self, pool, headers, banned=False):
+        """
+        Reconciliação com a exchange: peso usado real e bloqueios por 418/429.
+        """
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+        with self.cond:
+            now = time.time()
+            self._roll_window(pool, now)
+
+            used = headers.get('x-mbx-used-weight-1m')
+            if used is not None:
+                self.used[pool] = max(self.used[pool], int(used))
+
+            if banned:
+                retry_after = float(headers.get('retry-after', 60))
+                self.blocked_until[pool] = max(self.blocked_until[pool], now + retry_after)
+                LOGGER.critical(f"Governador: limite excedido (418/429) no pool {pool}. Pausando por {retry_after:.0f}s.")
+
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            now = time.time()
+            return {
+                pool: {
+                    'used': self.used[pool],
+                    'limit': self.limits[pool],
+                    'waiting': len(self.queues[pool]),
+                    'blocked_for': max(0.0, self.blocked_until[pool] - now),
+                }
+                for pool in self.limits
+            }
+
+
+# Instância única do processo (compartilhada por todos os clientes, inclusive o Guardião)
+GOVERNOR = RequestGovernor()
+
+
+def governed(level):
+    """Decorador: executa o método inteiro com a prioridade indicada no governador."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with GOVERNOR.priority(level):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
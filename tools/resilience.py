@@ -0,0 +1,252 @@
+import time
+import random
+import threading
+import ccxt
+import requests
+from configs.config import *
+from tools.api_accounting import endpoint_key, endpoint_pool, wrap_fetch
+from tools.rate_governor import GOVERNOR, ORDER_ENDPOINTS, PRIORITY_GUARDIAN
+from tools.metrics import CIRCUIT_STATE, CIRCUIT_REJECTED, API_RETRIES
+
+# Classes de erro
+ERROR_RATE_LIMIT = 'rate_limit'         # 418/429: parar de chamar já
+ERROR_NETWORK = 'network'               # Timeout, conexão caída: costuma passar sozinho
+ERROR_EXCHANGE_DOWN = 'exchange_down'   # 5xx, manutenção
+ERROR_REJECT = 'reject'                 # Regra de negócio (saldo, ordem inválida, símbolo): repetir não resolve
+ERROR_CIRCUIT_OPEN = 'circuit_open'     # Barrado localmente pelo disjuntor
+TRANSIENT_ERRORS = (ERROR_RATE_LIMIT, ERROR_NETWORK, ERROR_EXCHANGE_DOWN)
+
+STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(ccxt.NetworkError):
+    """Chamada barrada sem ir à rede: o disjuntor do endpoint (ou do produto) está aberto."""
+    def __init__(self, name, retry_at):
+        super().__init__(f"Disjuntor aberto ({name}); nova tentativa em {max(0.0, retry_at - time.time()):.1f}s")
+        self.name = name
+        self.retry_at = retry_at
+
+
+def classify(error):
+    """Classe do erro (ERROR_*) ou None se não vier da exchange/rede (bug, dado inesperado)."""
+    if isinstance(error, CircuitOpenError):
+        return ERROR_CIRCUIT_OPEN
+    if isinstance(error, ccxt.DDoSProtection):              # Inclui RateLimitExceeded
+        return ERROR_RATE_LIMIT
+    if isinstance(error, ccxt.ExchangeNotAvailable):        # Inclui OnMaintenance
+        return ERROR_EXCHANGE_DOWN
+    if isinstance(error, (ccxt.NetworkError, requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return ERROR_NETWORK
+    if isinstance(error, ccxt.OperationFailed):             # Erro interno da exchange ("tente de novo", ex: Binance -1001)
+        return ERROR_EXCHANGE_DOWN
+    if isinstance(error, ccxt.BaseError):
+        return ERROR_REJECT
+    return None
+
+
+def is_transient(error):
+    """Falha que tende a passar sozinha (inclui o disjuntor aberto): vale degradar, não decidir."""
+    return classify(error) in (*TRANSIENT_ERRORS, ERROR_CIRCUIT_OPEN)
+
+
+def _jittered(seconds):
+    return seconds * random.uniform(1 - BREAKER_JITTER, 1 + BREAKER_JITTER)
+
+
+class CircuitBreaker:
+    """
+    Disjuntor clássico: fechado -> aberto após `threshold` falhas transitórias seguidas;
+    aberto -> meio-aberto quando o período (backoff exponencial com jitter) acaba; no
+    meio-aberto passa uma chamada de teste: sucesso fecha, falha reabre com período maior.
+    """
+    def __init__(self, name, threshold):
+        self.name = name
+        self.threshold = threshold
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.last_error = None
+
+    def allow(self, now):
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN:
+            if now < self.retry_at:
+                return False
+            self.state = STATE_HALF_OPEN
+            self.probing = False
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def success(self):
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.probing = False
+
+    def failure(self, kind, now, retry_after=None, threshold=None):
+        """Registra uma falha transitória; devolve True se o disjuntor abriu agora."""
+        self.failures += 1
+        self.last_error = kind
+        self.probing = False
+        if self.state != STATE_HALF_OPEN and self.failures < (threshold or self.threshold):
+            return False
+        period = _jittered(min(BREAKER_BACKOFF_MIN * 2 ** self.trips, BREAKER_BACKOFF_MAX))
+        if retry_after:
+            period = max(period, retry_after)
+        self.trips += 1
+        self.state = STATE_OPEN
+        self.retry_at = now + period
+        return True
+
+
+class Resilience:
+    """
+    Camada de resiliência no transporte dos clientes CCXT (empilhada sobre o governador).
+
+    - Disjuntor por endpoint e por produto (spot/futuros) dentro de um escopo ('home' para os
+      clientes da exchange principal; cada venue do scanner tem o seu). Rede instável abre o
+      endpoint; exchange fora do ar ou rate limit abrem o produto inteiro.
+    - Disjuntor aberto barra a chamada na hora (CircuitOpenError), sem gastar o tempo do ciclo.
+      Ordens nunca são barradas (rollback e ejeção precisam tentar), mas contam no estado.
+    - Leituras do Guardião (prioridade PRIORITY_GUARDIAN) passam pelos disjuntores abertos por falhas
+      de scan/monitoramento e servem de teste de reabertura; só o rate limit também as barra.
+    - Leituras (GET) com erro de rede são repetidas até RETRY_ATTEMPTS vezes, com backoff e jitter.
+    - Rejeição de negócio prova que a exchange respondeu: conta como sucesso para os disjuntores.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def _breaker(self, scope, name, threshold):
+        key = (scope, name)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(name, threshold)
+        return breaker
+
+    def _publish(self, scope, breaker):
+        CIRCUIT_STATE.labels(scope=scope, breaker=breaker.name).set(STATE_VALUES[breaker.state])
+
+    def attach(self, client, scope='home', priority=None):
+        """priority: prioridade padrão do cliente no governador (a da thread, se mais urgente, prevalece)."""
+        def hook(client, method, url, body, call):
+            key = endpoint_key(method, url)
+            pool = endpoint_pool(url)
+            # Ordens, transferências e cancelamentos: nunca barrados nem repetidos
+            writes = key in ORDER_ENDPOINTS or method.upper() != 'GET'
+            guardian = PRIORITY_GUARDIAN in (priority, getattr(GOVERNOR.local, 'priority', None))
+
+            with self.lock:
+                pool_breaker = self._breaker(scope, pool, BREAKER_POOL_FAILURES)
+                endpoint_breaker = self._breaker(scope, key, BREAKER_FAILURES)
+                now = time.time()
+                # Guardião não fica cego por falhas dos outros ciclos; rate limit vale para todos
+                bypass = guardian and not any(
+                    breaker.state != STATE_CLOSED and breaker.last_error == ERROR_RATE_LIMIT
+                    for breaker in (pool_breaker, endpoint_breaker)
+                )
+                if not writes and not bypass:
+                    if not pool_breaker.allow(now):
+                        CIRCUIT_REJECTED.labels(scope=scope, breaker=pool_breaker.name).inc()
+                        raise CircuitOpenError(pool_breaker.name, pool_breaker.retry_at)
+                    if not endpoint_breaker.allow(now):
+                        # Devolve a chamada de teste do produto, se esta a tinha pego
+                        pool_breaker.probing = False
+                        CIRCUIT_REJECTED.labels(scope=scope, breaker=endpoint_breaker.name).inc()
+                        raise CircuitOpenError(endpoint_breaker.name, endpoint_breaker.retry_at)
+
+            attempts = 1 if writes else RETRY_ATTEMPTS
+            for attempt in range(attempts):
+                try:
+                    result = call()
+                except Exception as e:
+                    kind = classify(e)
+                    if kind == ERROR_NETWORK and attempt + 1 < attempts:
+                        API_RETRIES.labels(scope=scope, endpoint=key).inc()
+                        time.sleep(_jittered(RETRY_BACKOFF * 2 ** attempt))
+                        continue
+                    if kind == ERROR_REJECT:
+                        # Rejeição de negócio: a exchange respondeu, o caminho está saudável
+                        self._record_success(scope, pool_breaker, endpoint_breaker)
+                    elif kind in TRANSIENT_ERRORS:
+                        self._record_failure(scope, client, pool_breaker, endpoint_breaker, kind, e)
+                    else:
+                        with self.lock:
+                            pool_breaker.probing = endpoint_breaker.probing = False
+                    raise
+                self._record_success(scope, pool_breaker, endpoint_breaker)
+                return result
+
+        return wrap_fetch(client, hook)
+
+    def _record_success(self, scope, *breakers):
+        with self.lock:
+            for breaker in breakers:
+                if breaker.state != STATE_CLOSED:
+                    LOGGER.info(f"Disjuntor '{breaker.name}' ({scope}) fechado: a exchange voltou a responder.")
+                breaker.success()
+                self._publish(scope, breaker)
+
+    def _record_failure(self, scope, client, pool_breaker, endpoint_breaker, kind, error):
+        retry_after = self._retry_after(client) if kind == ERROR_RATE_LIMIT else None
+        now = time.time()
+        with self.lock:
+            opened = [endpoint_breaker] if endpoint_breaker.failure(kind, now) else []
+            if kind in (ERROR_RATE_LIMIT, ERROR_EXCHANGE_DOWN):
+                # Rate limit é por produto: abre na primeira ocorrência
+                threshold = 1 if kind == ERROR_RATE_LIMIT else None
+                if pool_breaker.failure(kind, now, retry_after=retry_after, threshold=threshold):
+                    opened.append(pool_breaker)
+            for breaker in (pool_breaker, endpoint_breaker):
+                self._publish(scope, breaker)
+
+        for breaker in opened:
+            LOGGER.warning(
+                "Disjuntor '%s' (%s) aberto por %.1fs após %s: %s",
+                breaker.name, scope, breaker.retry_at - now, kind, error,
+                extra={'breaker': breaker.name, 'scope': scope, 'error_class': kind, 'retry_at': breaker.retry_at}
+            )
+
+    @staticmethod
+    def _retry_after(client):
+        for name, value in (client.last_response_headers or {}).items():
+            if name.lower() == 'retry-after':
+                try:
+                    return float(value)
+                except ValueError:
+                    return None
+        return None
+
+    # --- Estado (agendador, métricas) ---
+
+    def blocked_until(self, scope='home'):
+        """Horário em que um produto do escopo volta a aceitar chamadas; None se nenhum estiver aberto."""
+        now = time.time()
+        with self.lock:
+            retry = [
+                breaker.retry_at for (breaker_scope, name), breaker in self.breakers.items()
+                if breaker_scope == scope and name in ('spot', 'futures')
+                and breaker.state == STATE_OPEN and breaker.retry_at > now
+            ]
+        return max(retry) if retry else None
+
+    def snapshot(self):
+        """{escopo: {disjuntor: {'state', 'failures', 'retry_at', 'last_error'}}} dos disjuntores fora do normal."""
+        with self.lock:
+            state = {}
+            for (scope, name), breaker in self.breakers.items():
+                if breaker.state != STATE_CLOSED or breaker.failures:
+                    state.setdefault(scope, {})[name] = {
+                        'state': breaker.state, 'failures': breaker.failures,
+                        'retry_at': breaker.retry_at, 'last_error': breaker.last_error,
+                    }
+            return state
+
+
+RESILIENCE = Resilience()
@@ -0,0 +1,157 @@
+import threading
+import numpy as np
+from configs.config import *
+
+# Séries mantidas por símbolo (colunas dos arrays)
+FIELDS = ('funding', 'basis', 'mark', 'spread')
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+
+class RollingStats:
+    """
+    Estatísticas móveis por símbolo em buffers circulares NumPy pré-alocados.
+
+    - Cada símbolo ocupa uma linha de values[linha, campo, posição] com capacidade fixa:
+      a memória não cresce com o tempo de execução, só com o tamanho do universo.
+    - Soma, soma dos quadrados e EWMA são atualizadas em O(1) por amostra (o valor que sai
+      do buffer é descontado); update_many() atualiza o universo inteiro numa passada vetorizada.
+    - Valores ausentes (NaN) ocupam a posição mas não entram nas estatísticas.
+    """
+    def __init__(self, capacity=ROLLING_CAPACITY, alpha=2.0 / (ROLLING_EWMA_SPAN + 1), min_spacing=ROLLING_MIN_SPACING):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.min_spacing = min_spacing
+        self.lock = threading.Lock()
+        self.rows = {}
+        self._allocate(64)
+
+    def _allocate(self, size):
+        n = len(FIELDS)
+        self.values = np.full((size, n, self.capacity), np.nan)
+        self.timestamps = np.zeros((size, self.capacity))
+        self.head = np.zeros(size, dtype=np.int64)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros((size, n))
+        self.sumsq = np.zeros((size, n))
+        self.valid = np.zeros((size, n), dtype=np.int64)
+        self.ewma = np.full((size, n), np.nan)
+        self.last_ts = np.full(size, -np.inf)
+
+    def _grow(self):
+        old = (self.values, self.timestamps, self.head, self.count, self.sum, self.sumsq, self.valid, self.ewma, self.last_ts)
+        used = len(old[2])
+        self._allocate(used * 2)
+        for new, previous in zip(
+            (self.values, self.timestamps, self.head, self.count, self.sum, self.sumsq, self.valid, self.ewma, self.last_ts),
+            old
+        ):
+            new[:used] = previous
+
+    def _row(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            row = len(self.rows)
+            if row >= len(self.head):
+                self._grow()
+            self.rows[symbol] = row
+        return row
+
+    # --- Atualização ---
+
+    def update(self, symbol, timestamp, **fields):
+        """Uma amostra de um símbolo (campos omitidos ficam NaN)."""
+        self.update_many([symbol], timestamp, {name: [value] for name, value in fields.items()})
+
+    def update_many(self, symbols, timestamp, fields):
+        """
+        Uma amostra por símbolo para o universo inteiro.
+        fields: {campo: sequência alinhada com symbols}; campos omitidos ficam NaN.
+        Símbolos amostrados há menos de min_spacing segundos são ignorados.
+        """
+        if not symbols:
+            return
+        with self.lock:
+            rows = np.fromiter((self._row(symbol) for symbol in symbols), dtype=np.int64, count=len(symbols))
+            sample = np.full((len(rows), len(FIELDS)), np.nan)
+            for name, column in fields.items():
+                sample[:, FIELD_INDEX[name]] = np.asarray(column, dtype=float)
+
+            due = timestamp - self.last_ts[rows] >= self.min_spacing
+            rows, sample = rows[due], sample[due]
+            if not len(rows):
+                return
+
+            pos = self.head[rows]
+            present = ~np.isnan(sample)
+            clean = np.where(present, sample, 0.0)
+
+            # Desconta o valor que sai do buffer (só existe se a linha já deu a volta)
+            evicted = self.values[rows, :, pos]
+            full = (self.count[rows] >= self.capacity)[:, None]
+            leaving = full & ~np.isnan(evicted)
+            evicted = np.where(leaving, evicted, 0.0)
+
+            self.sum[rows] += clean - evicted
+            self.sumsq[rows] += clean * clean - evicted * evicted
+            self.valid[rows] += present.astype(np.int64) - leaving.astype(np.int64)
+
+            previous = self.ewma[rows]
+            updated = np.where(np.isnan(previous), clean, previous + self.alpha * (clean - previous))
+            self.ewma[rows] = np.where(present, updated, previous)
+
+            self.values[rows, :, pos] = sample
+            self.timestamps[rows, pos] = timestamp
+            self.last_ts[rows] = timestamp
+            self.count[rows] = np.minimum(self.count[rows] + 1, self.capacity)
+            self.head[rows] = (pos + 1) % self.capacity
+
+            # A cada volta completa recalcula as somas do zero (evita deriva de ponto flutuante)
+            wrapped = rows[self.head[rows] == 0]
+            if len(wrapped):
+                window = self.values[wrapped]
+                self.sum[wrapped] = np.nansum(window, axis=2)
+                self.sumsq[wrapped] = np.nansum(window * window, axis=2)
+                self.valid[wrapped] = np.sum(~np.isnan(window), axis=2)
+
+    # --- Consulta ---
+
+    def stats(self, symbol, field):
+        """
+        {'last', 'mean', 'std', 'ewma', 'count'} do campo no buffer do símbolo,
+        ou None se ainda não houver amostra válida.
+        """
+        with self.lock:
+            row = self.rows.get(symbol)
+            if row is None:
+                return None
+            f = FIELD_INDEX[field]
+            n = int(self.valid[row, f])
+            if n == 0:
+                return None
+            mean = self.sum[row, f] / n
+            variance = max(0.0, self.sumsq[row, f] / n - mean * mean)
+            last = self.values[row, f, (self.head[row] - 1) % self.capacity]
+            return {
+                'last': float(last),
+                'mean': float(mean),
+                'std': float(np.sqrt(variance)),
+                'ewma': float(self.ewma[row, f]),
+                'count': n,
+            }
+
+    def zscore(self, symbol, field):
+        """Desvio do último valor em relação à média da janela (em desvios-padrão)."""
+        s = self.stats(symbol, field)
+        if not s or s['count'] < ROLLING_MIN_SAMPLES or s['std'] == 0 or np.isnan(s['last']):
+            return 0.0
+        return (s['last'] - s['mean']) / s['std']
+
+    def history(self, symbol, field):
+        """Série do campo em ordem cronológica (cópia), para análises pontuais."""
+        with self.lock:
+            row = self.rows.get(symbol)
+            if row is None:
+                return np.empty(0)
+            n = int(self.count[row])
+            order = (self.head[row] - n + np.arange(n)) % self.capacity
+            return self.values[row, FIELD_INDEX[field], order].copy()
@@ -0,0 +1,135 @@
+import time
+import heapq
+import itertools
+import threading
+from configs.config import *
+from tools.resilience import RESILIENCE
+
+
+class EventScheduler:
+    """
+    Agenda de tarefas por horário (heap) com despertar por evento.
+
+    - schedule()/schedule_in() (re)agendam uma tarefa pelo nome (só existe uma por nome).
+    - trigger() antecipa uma tarefa para agora (ex: alerta do Guardião), de qualquer thread.
+    - run() executa as tarefas na thread chamadora, dormindo até o próximo horário ou evento.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.jobs = {}
+        self.seq = itertools.count()
+        self.running = False
+
+    def schedule(self, name, when, callback):
+        with self.cond:
+            self._cancel(name)
+            entry = [when, next(self.seq), name, callback, True]
+            self.jobs[name] = entry
+            heapq.heappush(self.heap, entry)
+            self.cond.notify()
+
+    def schedule_in(self, name, delay, callback):
+        self.schedule(name, time.time() + max(0.0, delay), callback)
+
+    def cancel(self, name):
+        with self.cond:
+            self._cancel(name)
+
+    def _cancel(self, name):
+        entry = self.jobs.pop(name, None)
+        if entry:
+            entry[4] = False    # Remoção preguiçosa: descartado quando chegar ao topo do heap
+
+    def trigger(self, name, reason=""):
+        """Antecipa a tarefa para agora (se estiver agendada)."""
+        with self.cond:
+            entry = self.jobs.get(name)
+            if not entry:
+                return False
+            LOGGER.info(f"Agendador: '{name}' antecipado ({reason})")
+            self.schedule(name, time.time(), entry[3])
+            return True
+
+    def next_run(self, name):
+        entry = self.jobs.get(name)
+        return entry[0] if entry else None
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def run(self):
+        self.running = True
+        while self.running:
+            with self.cond:
+                while self.heap and not self.heap[0][4]:
+                    heapq.heappop(self.heap)
+
+                if not self.heap:
+                    self.cond.wait()
+                    continue
+
+                wait = self.heap[0][0] - time.time()
+                if wait > 0:
+                    self.cond.wait(timeout=wait)
+                    continue
+
+                entry = heapq.heappop(self.heap)
+                entry[4] = False
+                self.jobs.pop(entry[2], None)
+
+            # Executa fora do lock (a tarefa pode reagendar a si mesma ou outras)
+            try:
+                entry[3]()
+            except Exception as e:
+                LOGGER.error(f"Agendador: erro na tarefa '{entry[2]}': {e}")
+
+
+def next_funding_boundary(now, interval_hours=FUNDING_INTERVAL_HOURS):
+    """Próxima liquidação da grade padrão (00h/08h/16h UTC para 8h)."""
+    period = interval_hours * 3600
+    return (int(now // period) + 1) * period
+
+
+def plan_scan_time(now):
+    """
+    Próximo scan: alguns minutos antes da próxima liquidação (funding mais recente,
+    tempo de montar a posição antes do pagamento), sem passar de SCAN_INTERVAL_MAX.
+    """
+    boundary = next_funding_boundary(now)
+    target = boundary - SCAN_LEAD_SECONDS
+    if target <= now:
+        target = next_funding_boundary(boundary) - SCAN_LEAD_SECONDS
+    return min(target, now + SCAN_INTERVAL_MAX)
+
+
+def plan_degraded_time(now, scope='home'):
+    """
+    Exchange degradada (disjuntor de um produto aberto): horário em que vale tentar de novo.
+    None se saudável. Ciclos adiados não gastam o tempo deles em chamadas que falhariam.
+    """
+    retry_at = RESILIENCE.blocked_until(scope)
+    return retry_at if retry_at and retry_at > now else None
+
+
+def plan_monitor_time(bot, now):
+    """
+    Próximo monitoramento com posição aberta:
+    - denso (MONITOR_INTERVAL_ALERT) se funding abaixo da meta, score de tédio subindo ou basis comprimido;
+    - espaçado (MONITOR_INTERVAL_IDLE) caso contrário;
+    - sempre logo após a próxima liquidação, para contabilizar o funding.
+    """
+    deteriorating = (
+        bot.boredom_score > 0
+        or bot.last_funding_rate < TARGET_FUNDING
+        or (bot.last_basis is not None and bot.last_basis < MONITOR_BASIS_ALERT)
+    )
+    interval = MONITOR_INTERVAL_ALERT if deteriorating else MONITOR_INTERVAL_IDLE
+    target = now + interval
+
+    if bot.next_funding_timestamp and bot.next_funding_timestamp > now:
+        target = min(target, bot.next_funding_timestamp + MONITOR_SETTLEMENT_DELAY)
+
+    return target
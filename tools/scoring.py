@@ -0,0 +1,54 @@
+import numpy as np
+from configs.config import *
+
+# Motivos de rejeição (códigos do array 'reason' de score_entries)
+REASON_SUCCESS = 0
+REASON_LOW_PROFIT = 1
+REASON_BACKWARDATION = 2
+REASON_LABELS = ('SUCCESS', 'LOW_PROFIT_VS_FEES', 'BACKWARDATION')
+
+PAYBACK_DAYS = 3.0      # O funding projetado precisa pagar os custos em 3 dias
+
+
+def round_trip_cost(fee_spot, fee_swap, slippage_spot, slippage_swap):
+    """Custo de ida e volta das duas pernas (taxas + slippage na entrada e na saída)."""
+    return (np.asarray(fee_spot) + slippage_spot) * 2 + (np.asarray(fee_swap) + slippage_swap) * 2
+
+
+def score_entries(funding_rate, price_spot, price_swap, fee_spot, fee_swap,
+                  slippage_spot, slippage_swap, funding_interval_hours=8.0, target_funding=TARGET_FUNDING):
+    """
+    Avalia a viabilidade de entrada de vários candidatos numa passada NumPy.
+
+    Todos os argumentos aceitam escalares ou arrays com formatos compatíveis (broadcast):
+    (N,) para um scan ao vivo, (T, N) para o backtest do tools/sweep.py.
+    price_swap deve estar por unidade do ativo Spot (já dividido pelo multiplicador do contrato).
+
+    Retorna um dicionário de arrays:
+        cost, hurdle, projected_return, basis, viable (bool) e reason (códigos REASON_*).
+    """
+    funding_rate = np.asarray(funding_rate, dtype=float)
+    price_spot = np.asarray(price_spot, dtype=float)
+    price_swap = np.asarray(price_swap, dtype=float)
+
+    cost = round_trip_cost(fee_spot, fee_swap, slippage_spot, slippage_swap)
+    # O retorno tem que pagar as Taxas + O Lucro Mínimo
+    hurdle = cost + target_funding
+    projected = funding_rate * (24.0 / np.asarray(funding_interval_hours, dtype=float)) * PAYBACK_DAYS
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        basis = (price_swap - price_spot) / price_spot
+
+    low_profit = ~(projected >= hurdle)
+    backwardation = ~low_profit & ~(basis >= NEGATIVE_FUNDING_THRESHOLD)
+    reason = np.where(low_profit, REASON_LOW_PROFIT, np.where(backwardation, REASON_BACKWARDATION, REASON_SUCCESS))
+
+    shape = np.broadcast(hurdle, projected, basis).shape
+    return {
+        'cost': np.broadcast_to(cost, shape),
+        'hurdle': np.broadcast_to(hurdle, shape),
+        'projected_return': np.broadcast_to(projected, shape),
+        'basis': np.broadcast_to(basis, shape),
+        'viable': np.broadcast_to(reason == REASON_SUCCESS, shape),
+        'reason': np.broadcast_to(reason, shape),
+    }
@@ -0,0 +1,448 @@
+import os
+import json
+import struct
+import threading
+import argparse
+from collections import OrderedDict
+from configs.config import *
+
+# Versões do esquema: 1 = JSON legado (bot_state.json, dicionário solto); 2 = diário binário
+SCHEMA_VERSION = 2
+MAGIC = b'BTST'
+HEADER = struct.Struct('<4sHH')             # Assinatura, versão do esquema, reservado
+RECORD = struct.Struct('<BHI')              # Tipo, campo, tamanho do conteúdo
+REC_FIELD, REC_FEE, REC_COMMIT = 1, 2, 3
+
+_FLOAT = struct.Struct('<d')
+_INT = struct.Struct('<q')
+
+
+class _Model:
+    """
+    Base dos modelos de estado: atributos fixos (__slots__) com defaults e registro dos campos
+    alterados desde a última gravação (só eles vão para o disco).
+    """
+    __slots__ = ('_dirty',)
+    DEFAULTS = ()
+
+    def __init__(self, **values):
+        object.__setattr__(self, '_dirty', set())
+        for name, default in self.DEFAULTS:
+            object.__setattr__(self, name, values.get(name, default))
+
+    def __setattr__(self, name, value):
+        if getattr(self, name) != value:
+            self._dirty.add(name)
+        object.__setattr__(self, name, value)
+
+    def take_dirty(self):
+        dirty = self._dirty
+        object.__setattr__(self, '_dirty', set())
+        return dirty
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name, _ in self.DEFAULTS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name, _ in cls.DEFAULTS if name in data})
+
+
+class Position(_Model):
+    """Posição Cash and Carry aberta (size em contratos do Swap)."""
+    DEFAULTS = (
+        ('symbol', ''), ('spot_symbol', ''), ('size', 0.0), ('multiplier', 1),
+        ('entry_price_spot', 0.0), ('entry_price_swap', 0.0), ('entry_time', 0.0),
+    )
+    __slots__ = tuple(name for name, _ in DEFAULTS)
+
+
+class Account(_Model):
+    """Capital e resultados acumulados do bot."""
+    DEFAULTS = (
+        ('capital', 0.0), ('accumulated_profit', 0.0), ('accumulated_fees', 0.0),
+        ('peak_capital', 0.0), ('last_real_balance', 0.0), ('pending_deposit_usd', 0.0),
+        ('last_usd_brl', BRL_USD_RATE),
+    )
+    __slots__ = tuple(name for name, _ in DEFAULTS)
+
+
+class Counters(_Model):
+    """Contadores e marcadores operacionais (tédio, próxima liquidação, cursor do ledger de funding)."""
+    DEFAULTS = (
+        ('boredom_score', 0), ('last_funding_rate', 0.0),
+        ('next_funding_timestamp', None), ('funding_cursor', None),
+    )
+    __slots__ = tuple(name for name, _ in DEFAULTS)
+
+
+class FeeCache:
+    """Taxas por par (fee_cache) limitadas a FEE_CACHE_MAX: a mais antiga sai primeiro."""
+    __slots__ = ('entries', 'limit', 'pending')
+
+    def __init__(self, items=(), limit=FEE_CACHE_MAX):
+        self.entries = OrderedDict()
+        self.limit = limit
+        self.pending = []
+        for key, value in items:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        return self.entries[key]
+
+    def __setitem__(self, key, value):
+        if self.entries.get(key) != value:
+            self.pending.append(key)
+        self._put(key, value)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        return self.entries.items()
+
+    def take_pending(self):
+        pending, self.pending = self.pending, []
+        return [(key, self.entries[key]) for key in dict.fromkeys(pending) if key in self.entries]
+
+
+class BotState(_Model):
+    """Estado persistido do bot: conta, contadores, posição (ou None) e cache de taxas."""
+    DEFAULTS = (('account', None), ('counters', None), ('position', None), ('fee_cache', None))
+    __slots__ = tuple(name for name, _ in DEFAULTS)
+
+    def __init__(self, account=None, counters=None, position=None, fee_cache=None):
+        super().__init__(
+            account=account or Account(), counters=counters or Counters(),
+            position=position, fee_cache=fee_cache if fee_cache is not None else FeeCache(),
+        )
+
+    def to_dict(self):
+        return {
+            'account': self.account.to_dict(),
+            'counters': self.counters.to_dict(),
+            'position': self.position.to_dict() if self.position else None,
+            'fee_cache': dict(self.fee_cache.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        position = data.get('position')
+        return cls(
+            account=Account.from_dict(data.get('account', {})),
+            counters=Counters.from_dict(data.get('counters', {})),
+            position=Position.from_dict(position) if position else None,
+            fee_cache=FeeCache(data.get('fee_cache', {}).items()),
+        )
+
+
+def state_property(part, field):
+    """Atributo do bot delegado ao modelo de estado (bot.capital -> bot.state.account.capital)."""
+    if part is None:
+        return property(lambda bot: getattr(bot.state, field), lambda bot, value: setattr(bot.state, field, value))
+    return property(
+        lambda bot: getattr(getattr(bot.state, part), field),
+        lambda bot, value: setattr(getattr(bot.state, part), field, value),
+    )
+
+
+# --- Codificação dos campos ---
+
+def _encode_float(value):
+    return b'' if value is None else _FLOAT.pack(value)
+
+
+def _decode_float(payload):
+    return _FLOAT.unpack(payload)[0] if payload else None
+
+
+def _encode_int(value):
+    return b'' if value is None else _INT.pack(int(value))
+
+
+def _decode_int(payload):
+    return _INT.unpack(payload)[0] if payload else None
+
+
+def _encode_str(value):
+    return value.encode()
+
+
+def _decode_str(payload):
+    return payload.decode()
+
+
+def _encode_cursor(cursor):
+    # {'since': ms, 'seen_ids': [...]} -> since + ids separados por \0
+    if cursor is None:
+        return b''
+    return _INT.pack(int(cursor['since'])) + '\0'.join(cursor['seen_ids']).encode()
+
+
+def _decode_cursor(payload):
+    if not payload:
+        return None
+    ids = payload[_INT.size:].decode()
+    return {'since': _INT.unpack_from(payload)[0], 'seen_ids': ids.split('\0') if ids else []}
+
+
+CODECS = {
+    'float': (_encode_float, _decode_float),
+    'int': (_encode_int, _decode_int),
+    'str': (_encode_str, _decode_str),
+    'cursor': (_encode_cursor, _decode_cursor),
+}
+
+# ID do campo no arquivo -> (parte, campo, codec). IDs nunca são reaproveitados: campo novo ganha ID novo
+FIELDS = {
+    1: ('account', 'capital', 'float'),
+    2: ('account', 'accumulated_profit', 'float'),
+    3: ('account', 'accumulated_fees', 'float'),
+    4: ('account', 'peak_capital', 'float'),
+    5: ('account', 'last_real_balance', 'float'),
+    6: ('account', 'pending_deposit_usd', 'float'),
+    7: ('account', 'last_usd_brl', 'float'),
+    20: ('counters', 'boredom_score', 'int'),
+    21: ('counters', 'last_funding_rate', 'float'),
+    22: ('counters', 'next_funding_timestamp', 'float'),
+    23: ('counters', 'funding_cursor', 'cursor'),
+    40: ('position', None, 'int'),                  # Posição aberta (1) ou não (0)
+    41: ('position', 'symbol', 'str'),
+    42: ('position', 'spot_symbol', 'str'),
+    43: ('position', 'size', 'float'),
+    44: ('position', 'multiplier', 'int'),
+    45: ('position', 'entry_price_spot', 'float'),
+    46: ('position', 'entry_price_swap', 'float'),
+    47: ('position', 'entry_time', 'float'),
+}
+FIELD_IDS = {(part, field): field_id for field_id, (part, field, _) in FIELDS.items()}
+
+
+def _field_record(part, field, value):
+    field_id = FIELD_IDS[(part, field)]
+    payload = CODECS[FIELDS[field_id][2]][0](value)
+    return RECORD.pack(REC_FIELD, field_id, len(payload)) + payload
+
+
+def _fee_record(key, fee):
+    payload = _FLOAT.pack(fee) + key.encode()
+    return RECORD.pack(REC_FEE, 0, len(payload)) + payload
+
+
+def _position_records(position):
+    if position is None:
+        return [_field_record('position', None, 0)]
+    return [_field_record('position', None, 1)] + [
+        _field_record('position', name, getattr(position, name)) for name, _ in Position.DEFAULTS
+    ]
+
+
+# --- Migrações de esquema (versão n -> n + 1, sobre o dicionário da versão n) ---
+
+def _migrate_v1(data):
+    """JSON legado (tudo no mesmo nível) -> partes da v2."""
+    account = {name: data[name] for name, _ in Account.DEFAULTS if data.get(name) is not None}
+    counters = {name: data[name] for name, _ in Counters.DEFAULTS if name in data}
+    return {'account': account, 'counters': counters, 'position': data.get('position'), 'fee_cache': data.get('fee_cache') or {}}
+
+
+MIGRATIONS = {1: _migrate_v1}
+
+
+def migrate(data, version):
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+    return data
+
+
+class StateStore:
+    """
+    Persistência do BotState em diário binário (configs/bot_state.bin).
+
+    - O arquivo começa com um snapshot (todos os campos) e recebe no fim só os campos alterados
+      em cada gravação, fechados por um registro de commit: gravar custa O(campos alterados).
+    - Na leitura os registros são reaplicados em ordem (o último vence); um lote sem commit
+      (queda no meio da gravação) é descartado inteiro.
+    - O diário é compactado num snapshot novo (arquivo temporário + os.replace) ao carregar
+      e quando passa de STATE_COMPACT_BYTES.
+    - Estado legado em JSON (bot_state.json) é migrado na primeira leitura; STATE_JSON_EXPORT
+      mantém uma cópia legível ao lado (bot_state.export.json) a cada gravação.
+    """
+    def __init__(self, path, json_export=STATE_JSON_EXPORT):
+        root, ext = os.path.splitext(path)
+        self.path = root + '.bin' if ext in ('', '.json') else path
+        self.legacy_path = root + '.json'
+        self.export_path = root + '.export.json'
+        self.json_export = json_export
+        self.lock = threading.Lock()
+        self.size = None
+
+    # --- Leitura ---
+
+    def load(self):
+        """BotState salvo (migrado se preciso), ou None se ainda não houver estado."""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data, version = self._decode(f.read())
+            if version < SCHEMA_VERSION:
+                LOGGER.info(f"Estado: migrando o esquema v{version} -> v{SCHEMA_VERSION}.")
+        elif os.path.exists(self.legacy_path):
+            with open(self.legacy_path, 'r') as f:
+                data = json.load(f)
+            # Exportação renomeada para bot_state.json traz a versão; sem ela é o JSON v1
+            version = data.pop('schema_version', 1)
+            LOGGER.info(f"Estado: migrando {self.legacy_path} (JSON v{version}) para o diário binário v{SCHEMA_VERSION}.")
+        else:
+            return None
+
+        state = BotState.from_dict(migrate(data, version))
+        self.snapshot(state)
+        return state
+
+    def _decode(self, blob):
+        if len(blob) < HEADER.size:
+            raise ValueError(f"Arquivo de estado truncado: {self.path}")
+        magic, version, _ = HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ValueError(f"Arquivo de estado inválido: {self.path}")
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Estado gravado por uma versão mais nova do bot (esquema v{version})")
+
+        data = {'account': {}, 'counters': {}, 'position': {}, 'fee_cache': OrderedDict()}
+        position_open = False
+        pending = []
+        offset = HEADER.size
+        while offset + RECORD.size <= len(blob):
+            kind, field_id, length = RECORD.unpack_from(blob, offset)
+            payload = blob[offset + RECORD.size:offset + RECORD.size + length]
+            if len(payload) < length:
+                break
+            offset += RECORD.size + length
+            if kind != REC_COMMIT:
+                pending.append((kind, field_id, payload))
+                continue
+
+            for kind, field_id, payload in pending:
+                if kind == REC_FEE:
+                    key = payload[_FLOAT.size:].decode()
+                    data['fee_cache'].pop(key, None)
+                    data['fee_cache'][key] = _FLOAT.unpack_from(payload)[0]
+                elif field_id in FIELDS:        # Campo desconhecido (gravado por versão futura): ignorado
+                    part, field, codec = FIELDS[field_id]
+                    value = CODECS[codec][1](payload)
+                    if field is None:
+                        position_open = bool(value)
+                    else:
+                        data[part][field] = value
+            pending = []
+
+        if pending or offset < len(blob):
+            LOGGER.warning("Estado: última gravação incompleta descartada (queda durante a escrita).")
+        if not position_open:
+            data['position'] = None
+        return data, version
+
+    # --- Escrita ---
+
+    def snapshot(self, state):
+        """Reescreve o arquivo inteiro com o estado atual (compactação)."""
+        with self.lock:
+            self._snapshot(state)
+
+    def _snapshot(self, state):
+        records = [HEADER.pack(MAGIC, SCHEMA_VERSION, 0)]
+        for part in ('account', 'counters'):
+            model = getattr(state, part)
+            records += [_field_record(part, name, getattr(model, name)) for name, _ in model.DEFAULTS]
+        records += _position_records(state.position)
+        records += [_fee_record(key, fee) for key, fee in state.fee_cache.items()]
+        records.append(RECORD.pack(REC_COMMIT, 0, 0))
+        blob = b''.join(records)
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.size = len(blob)
+
+        # O snapshot já contém tudo: zera as alterações pendentes
+        self._changes(state)
+        self._export(state)
+
+    def _changes(self, state):
+        records = []
+        for part in ('account', 'counters'):
+            model = getattr(state, part)
+            records += [_field_record(part, name, getattr(model, name)) for name in sorted(model.take_dirty())]
+
+        if 'position' in state.take_dirty():
+            records += _position_records(state.position)
+            if state.position is not None:
+                state.position.take_dirty()
+        elif state.position is not None:
+            records += [_field_record('position', name, getattr(state.position, name)) for name in sorted(state.position.take_dirty())]
+
+        records += [_fee_record(key, fee) for key, fee in state.fee_cache.take_pending()]
+        return records
+
+    def save(self, state):
+        """Acrescenta ao diário só os campos alterados desde a última gravação."""
+        with self.lock:
+            if self.size is None or not os.path.exists(self.path):
+                self._snapshot(state)
+                return
+            records = self._changes(state)
+            if not records:
+                return
+            records.append(RECORD.pack(REC_COMMIT, 0, 0))
+            blob = b''.join(records)
+            with open(self.path, 'ab') as f:
+                f.write(blob)
+            self.size += len(blob)
+
+            if self.size > STATE_COMPACT_BYTES:
+                self._snapshot(state)
+            else:
+                self._export(state)
+
+    def _export(self, state):
+        if self.json_export:
+            export_json(state, self.export_path)
+
+
+def export_json(state, path):
+    """Cópia legível do estado (partes da v2, marcadas com a versão do esquema)."""
+    with open(path, 'w') as f:
+        json.dump({'schema_version': SCHEMA_VERSION, **state.to_dict()}, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o estado binário do bot (bot_state.bin) para JSON.")
+    parser.add_argument('path', nargs='?', default=os.path.join(BASE_DIR, "bot_state.bin"))
+    parser.add_argument('--output', help="Arquivo de saída (padrão: imprime na tela)")
+    args = parser.parse_args()
+
+    store = StateStore(args.path, json_export=False)
+    with open(store.path, 'rb') as f:
+        data, version = store._decode(f.read())
+    state = BotState.from_dict(migrate(data, version))
+    if args.output:
+        export_json(state, args.output)
+    else:
+        print(json.dumps({'schema_version': SCHEMA_VERSION, **state.to_dict()}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,126 @@
-import json
 import os
-import ccxt
 import time
 import threading
 import concurrent.futures
+import numpy as np
 from datetime import datetime
+from collections import Counter
 from configs.config import *
+from tools.exchanges import create_client, ping
+from tools.rate_governor import GOVERNOR, governed, PRIORITY_GUARDIAN, PRIORITY_ORDER, PRIORITY_MONITOR
+from tools.tracing import span, traced
+from tools.ranking import CandidateRanking
+from tools.symbols import SymbolIndex
+from tools.balances import BalanceService, rebalance_band
+from tools.funding_ledger import FundingLedger
+from tools.rolling_stats import RollingStats
+from tools.scoring import score_entries, REASON_LABELS, REASON_BACKWARDATION
+from tools.pricing import PriceBands
+from tools.pretrade import HedgedReader
+from tools.resilience import CircuitOpenError, classify, is_transient
+from tools.paper import PaperBroker
+from tools.state import StateStore, BotState, Position, state_property
+from tools.sweeper import ResidueSweeper
+from tools.venues import MultiVenueScanner
+from tools.metrics import (
+    SCAN_DURATION, SCAN_CANDIDATES, LEG_SKEW, GUARDIAN_DISTANCE,
+    ACCUMULATED_PROFIT, BOREDOM_SCORE, PRETRADE_LATENCY
+)
 
 class CashAndCarryBot:
-    def __init__(self):
+    # Estado persistido: atributos do bot apontam para o modelo tipado (tools/state.py)
+    capital = state_property('account', 'capital')
+    accumulated_profit = state_property('account', 'accumulated_profit')
+    accumulated_fees = state_property('account', 'accumulated_fees')
+    peak_capital = state_property('account', 'peak_capital')
+    last_real_balance = state_property('account', 'last_real_balance')
+    pending_deposit_usd = state_property('account', 'pending_deposit_usd')
+    last_usd_brl = state_property('account', 'last_usd_brl')
+    boredom_score = state_property('counters', 'boredom_score')
+    last_funding_rate = state_property('counters', 'last_funding_rate')
+    next_funding_timestamp = state_property('counters', 'next_funding_timestamp')
+    position = state_property(None, 'position')
+    fee_cache = state_property(None, 'fee_cache')
+
+    def __init__(self, state_file=None, role=None):
         """
         Inicializa o Bot.
         
         Args:
-            initial_capital_usd (float): Capital inicial simulado.
-            exchange_client (obj, optional): Cliente de exchange Mock para backtests. 
-                                             Se None, conecta na Binance real via CCXT.
+            state_file (str, optional): Caminho do arquivo de estado.
+                                        Se None, usa configs/bot_state.bin
+                                        (configs/bot_state_paper.bin em paper trading).
+                                        Um .json legado com o mesmo nome é migrado na primeira leitura.
+            role (str, optional): 'strategy' no modo multiprocesso (main.py --multiprocess):
+                                  só escaneia e pontua candidatos; estado, saldos, ordens e
+                                  Guardião ficam no processo de execução. None = bot completo.
         """
-        self.state_file = os.path.join("configs", "bot_state.json")
-
-        # Dicionário base de configuração
-        exchange_config = {
-            'apiKey': API_KEY,
-            'secret': API_SECRET,
-            'enableRateLimit': True,
-            'rateLimit': 200
-        }
+        default_state = "bot_state_paper.bin" if PAPER_TRADING else "bot_state.bin"
+        self.state_file = state_file or os.path.join("configs", default_state)
+        self.state = BotState()
+        self.store = StateStore(self.state_file)
+
+        # Callback opcional on_event(evento) para o agendador do main.py (ex: 'POSITION_CLOSED')
+        self.on_event = None
+        self.last_basis = None
+        self.last_boredom_eval = 0.0
+
+        # Ranking incremental entre scans (memória apenas; reconstruído no primeiro scan)
+        self.ranking = CandidateRanking()
+
+        # Perpétuo -> Spot (com multiplicador de contrato), reconstruído quando os mercados recarregam
+        self.symbol_index = SymbolIndex()
+        self.markets_loaded_at = 0.0
+
+        # Histórico curto de funding/basis/preço/spread de todo o universo (memória fixa, sem API extra)
+        self.rolling = RollingStats()
+
+        # Preço limite das ordens IOC (livro + buffer aprendido com as próprias execuções)
+        self.price_bands = PriceBands()
+        # Livros lidos logo antes das ordens: em paralelo, com prazo, hedge e cache
+        self.pretrade = HedgedReader()
+
+        # Banco do mês (definido pelo main.py) para o diário de execução
+        self.db_manager = None
+
+        # Tabela de mercado em memória compartilhada (anexada pelo processo de execução no modo multiprocesso)
+        self.market_table = None
+
+        # Varredura de pernas órfãs e dust (iniciada junto com o Guardião, onde as ordens vivem)
+        self.sweeper = None
+        # Última posição encerrada: a varredura só mexe em sobras de símbolos que o bot negociou
+        self.last_position = None
 
         # Inicializa cliente de Futuros (Swap)
-        self.exchange_swap = getattr(ccxt, EXCHANGE_ID)({
-            **exchange_config,  # Desempacota as credenciais
-            'options': {'defaultType': 'swap'}
-        })
+        self.exchange_swap = create_client('swap')
 
         # Inicializa cliente Spot (À vista)
-        self.exchange_spot = getattr(ccxt, EXCHANGE_ID)({
-            **exchange_config,  # Desempacota as credenciais
-            'options': {'defaultType': 'spot'}
-        })
+        self.exchange_spot = create_client('spot')
+
+        # Comparação de funding com outras exchanges (SCAN_VENUES); None com uma venue só
+        self.venue_scanner = MultiVenueScanner.from_config(home_client=self.exchange_swap)
+
+        if role == 'strategy':
+            # Posição e capital chegam do processo de execução (position.update)
+            self.position = None
+            self.capital = 0.0
+            return
+
+        # Paper trading: ordens, transferências e saldos viram simulação local sobre o livro real
+        self.paper = PaperBroker() if PAPER_TRADING else None
+        if self.paper:
+            self.paper.attach(self.exchange_swap)
+            self.paper.attach(self.exchange_spot)
+            LOGGER.warning("MODO PAPER TRADING: nenhuma ordem ou transferência será enviada à exchange.")
+
+        # Saldos em cache (invalidados pelas ordens, atualizados pelas transferências)
+        self.balances = BalanceService(self.exchange_spot, self.exchange_swap)
+        if self.paper:
+            # Ordens simuladas não passam pelo transporte: a conta simulada invalida o cache direto
+            self.paper.on_change = self.balances.invalidate
+
+        # Funding realmente liquidado (cursor incremental persistido no estado)
+        self.funding_ledger = FundingLedger(self.exchange_swap)
 
         # Inicialização de variáveis de estado
         if not self._load_state():
@@ -47,7 +130,6 @@ class CashAndCarryBot:
             self.position = None 
             self.accumulated_profit = 0.0
             self.accumulated_fees = 0.0
-            self.fee_cache = {}
             self.peak_capital = current_real_balance
             self.last_real_balance = current_real_balance
             self.pending_deposit_usd = 0.0
@@ -58,27 +140,14 @@ class CashAndCarryBot:
 
             self._save_state()
 
+    @traced('state_write')
     def _save_state(self):
         """
-        Persiste o estado financeiro e operacional em disco (JSON).
+        Persiste o estado financeiro e operacional em disco (só os campos alterados; ver tools/state.py).
         """
         try:
-            state = {
-                'capital': self.capital,
-                'position': self.position,
-                'accumulated_profit': self.accumulated_profit,
-                'accumulated_fees': self.accumulated_fees,
-                'fee_cache': self.fee_cache,
-                'peak_capital': self.peak_capital,
-                'last_real_balance': self.last_real_balance,
-                'pending_deposit_usd': self.pending_deposit_usd,
-                'next_funding_timestamp': self.next_funding_timestamp,
-                'boredom_score': getattr(self, 'boredom_score', 0),
-                'last_funding_rate': getattr(self, 'last_funding_rate', 0.0),
-                'last_usd_brl': self.last_usd_brl
-            }
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=4)
+            self.state.counters.funding_cursor = self.funding_ledger.cursor
+            self.store.save(self.state)
         except Exception as e:
             LOGGER.error(f"Erro ao salvar estado: {e}")
 
@@ -86,24 +155,13 @@ class CashAndCarryBot:
         """
         Carrega o estado anterior se existir. Retorna True se sucesso.
         """
-        if not os.path.exists(self.state_file):
-            return False   
         try:
-            with open(self.state_file, 'r') as f:
-                state = json.load(f)  
-            self.capital = state.get('capital', 0.0)
-            self.position = state.get('position')
-            self.accumulated_profit = state.get('accumulated_profit', 0.0)
-            self.accumulated_fees = state.get('accumulated_fees', 0.0)
-            self.fee_cache = state.get('fee_cache', {})
-            self.peak_capital = state.get('peak_capital', 0.0)
-            self.last_real_balance = state.get('last_real_balance', 0.0)
-            self.pending_deposit_usd = state.get('pending_deposit_usd', 0.0)
-            self.next_funding_timestamp = state.get('next_funding_timestamp')
-            self.boredom_score = state.get('boredom_score', 0)
-            self.last_funding_rate = state.get('last_funding_rate', 0.0)
-            self.last_usd_brl = state.get('last_usd_brl', BRL_USD_RATE)
-            
+            state = self.store.load()
+            if state is None:
+                return False
+            self.state = state
+            self.funding_ledger.cursor = state.counters.funding_cursor
+
             LOGGER.info("Estado anterior carregado com SUCESSO.")
             return True
         except Exception as e:
@@ -115,16 +173,13 @@ class CashAndCarryBot:
         Inicia a thread de proteção com uma CONEXÃO EXCLUSIVA.
         Isso evita conflitos de 'Nonce' e garante que o Guardião nunca seja bloqueado.
         """
-        # Cria uma nova instância CCXT só para o Guardião (Clone das configs)
-        guardian_config = {
-            'apiKey': API_KEY,
-            'secret': API_SECRET,
-            'enableRateLimit': True,
-            'options': {'defaultType': 'swap'} # Foca em Futuros
-        }
-        
-        # O atributo é novo: self.guardian_exchange
-        self.guardian_exchange = getattr(ccxt, EXCHANGE_ID)(guardian_config)
+        # Cria uma nova instância CCXT só para o Guardião (Foca em Futuros)
+        # Prioridade máxima no governador: passa na frente de scans e monitoramento
+        # Faixa HTTP própria: o tráfego de scan nunca ocupa as conexões do Guardião
+        self.guardian_exchange = create_client('swap', priority=PRIORITY_GUARDIAN, label='guardian', lane='guardian')
+        if self.paper:
+            self.paper.attach(self.guardian_exchange)
+        self.guardian_last_request = 0.0
         
         self.guardian_active = True
         
@@ -133,6 +188,30 @@ class CashAndCarryBot:
         guardian_thread = threading.Thread(target=self._guardian_loop, daemon=True)
         guardian_thread.start()
 
+    def start_sweeper(self):
+        """Inicia a varredura periódica de sobras (saldos Spot e posições Swap x posição do bot)."""
+        # Clientes próprios, como o Guardião: o CCXT não é thread-safe e o governador lê os
+        # cabeçalhos da última resposta de cada cliente
+        sweeper_spot = create_client('spot', priority=PRIORITY_MONITOR, label='sweeper_spot')
+        sweeper_swap = create_client('swap', priority=PRIORITY_MONITOR, label='sweeper_swap')
+        if self.paper:
+            self.paper.attach(sweeper_spot)
+            self.paper.attach(sweeper_swap)
+        self.sweeper = ResidueSweeper(self, sweeper_spot, sweeper_swap)
+        self.sweeper.start()
+
+    def seed_price_bands(self):
+        """Retoma a calibração das bandas IOC a partir do diário de execução do banco atual."""
+        if self.db_manager is None:
+            return
+        count = self.price_bands.seed(self.db_manager.recent_ioc_fills(PRICE_BAND_SEED_FILLS))
+        if count:
+            LOGGER.info(f"Banda IOC: calibração retomada de {count} execuções do diário.")
+
+    def _request_sweep(self, reason):
+        if self.sweeper:
+            self.sweeper.request(reason)
+
     def _guardian_loop(self):
         """
         Loop infinito que roda em background checando APENAS o risco de liquidação.
@@ -140,15 +219,17 @@ class CashAndCarryBot:
         while self.guardian_active:
             # 1. Se não tem posição, descansa para economizar CPU e API
             if not self.position:
+                self._guardian_keep_warm()
                 time.sleep(5)
                 continue
 
             # 2. Se tem posição, monitora com frequência alta (a cada 3s)
             try:
-                symbol = self.position['symbol']
+                symbol = self.position.symbol
                 
                 # Busca apenas a posição específica (leve para a API)
                 positions = self.guardian_exchange.fetch_positions([symbol])
+                self.guardian_last_request = time.time()
                 my_pos = next((p for p in positions if p['symbol'] == symbol), None)
 
                 if my_pos:
@@ -158,9 +239,14 @@ class CashAndCarryBot:
                     if liq_price > 0:
                         # Cálculo da Distância para a Morte (Short: Liq > Mark)
                         distance_pct = (liq_price - mark_price) / mark_price
+                        GUARDIAN_DISTANCE.set(distance_pct)
 
                         # Log de batimento cardíaco (opcional, bom para debug)
-                        LOGGER.debug(f"Guardião: Distância Liq: {distance_pct:.2%}")
+                        LOGGER.debug("Guardião: Distância Liq: %.2f%%", distance_pct * 100)
+
+                        # Zona de atenção (30%): pede monitoramento imediato no loop principal
+                        if distance_pct < 0.30:
+                            self._emit('RISK_ALERT')
 
                         # 3. ZONA DE PERIGO (15% de distância)
                         if distance_pct < 0.15:
@@ -168,54 +254,92 @@ class CashAndCarryBot:
                             LOGGER.critical(f"{COLOR_RED} >>>>> INICIANDO EJEÇÃO DE EMERGÊNCIA IMEDIATA <<<<<{COLOR_RESET}")
                             
                             # Dispara o fechamento na thread principal
-                            spot_symbol = self.position['spot_symbol']
-                            qty = self.position['size']
+                            spot_symbol = self.position.spot_symbol
+                            qty = self.position.size
                             
-                            # Fecha tudo
-                            self.execute_real_close(symbol, spot_symbol, qty, reason="GUARDIAN_LIQUIDATION_RISK")
+                            # Fecha tudo (prioridade do Guardião também nas ordens e tickers do fechamento)
+                            with GOVERNOR.priority(PRIORITY_GUARDIAN):
+                                self.execute_real_close(symbol, spot_symbol, qty, reason="GUARDIAN_LIQUIDATION_RISK")
                             
                             # Pausa breve para evitar loop de ordens enquanto processa
                             time.sleep(10)
                             
+            except CircuitOpenError as e:
+                # Endpoint/produto em pausa: espera a reabertura do disjuntor em vez de insistir a cada 3s
+                LOGGER.warning(f"Guardião: {e}")
+                time.sleep(min(max(e.retry_at - time.time(), 3), BREAKER_BACKOFF_MAX))
+                continue
             except Exception as e:
                 # O Guardião não pode parar se der erro de rede, apenas loga e tenta de novo
-                LOGGER.error(f"Erro no Guardião: {e}")
+                LOGGER.error(f"Erro no Guardião ({classify(e) or 'interno'}): {e}")
             
             # Frequência de Checagem: 3 segundos
             # É rápido o suficiente para evitar flash crash, mas não estoura o Rate Limit da Binance.
             time.sleep(3)
         
+    def _guardian_keep_warm(self):
+        """Sem posição, mantém a conexão do Guardião aberta (a primeira checagem após a entrada não paga handshake TLS)."""
+        if time.time() - self.guardian_last_request < GUARDIAN_KEEPWARM_INTERVAL:
+            return
+        self.guardian_last_request = time.time()
+        try:
+            ping(self.guardian_exchange)
+        except Exception as e:
+            LOGGER.debug("Guardião: falha no ping de keep-alive: %s", e)
+
+    def _emit(self, event):
+        """Notifica o agendador (se houver) sobre eventos de posição e risco."""
+        if self.on_event:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                LOGGER.error(f"Erro ao notificar evento {event}: {e}")
+
     def update_brl_rate(self, new_rate):
         """Atualiza a cotação USD/BRL e salva o estado."""
         self.last_usd_brl = new_rate
         self._save_state()
 
-    def get_top_volume_pairs(self):
+    @traced('scan')
+    def get_top_volume_pairs(self, snapshot=None):
         """
         Retorna um DICIONÁRIO {symbol: funding_rate} dos pares aprovados.
         Isso evita ter que buscar o funding de novo no main.py (Economiza API).
+        snapshot: retrato do processo de dados de mercado (market.snapshot) no modo multiprocesso;
+                  se None, busca tickers e funding direto na exchange.
         """
+        with SCAN_DURATION.time():
+            return self._scan_market(snapshot)
+
+    def _scan_market(self, snapshot=None):
         try:
             LOGGER.info("Iniciando varredura dinâmica de mercado...")
             # Busca Tickers de ambos os mercados
-            tickers_swap = self.exchange_swap.fetch_tickers()
-            tickers_spot = self.exchange_spot.fetch_tickers()
+            if snapshot:
+                tickers_swap = snapshot['tickers_swap']
+                tickers_spot = snapshot['tickers_spot']
+            else:
+                with span('scan.fetch_tickers'):
+                    tickers_swap = self.exchange_swap.fetch_tickers()
+                    tickers_spot = self.exchange_spot.fetch_tickers()
 
             available_spot_pairs = set(tickers_spot.keys())
             
             # Pré-filtro de volume
-            self.exchange_swap.load_markets()
-            self.exchange_spot.load_markets()
+            with span('scan.load_markets'):
+                self._refresh_markets()
 
             candidates = []
+            passed_volume = 0
 
             for symbol, data in tickers_swap.items():
                 if '/USDT:USDT' in symbol and not 'BNB' in symbol:
 
-                    spot_equivalent = symbol.split(':')[0]
+                    spot_equivalent = self.symbol_index.spot_for(symbol)
 
                     if spot_equivalent in available_spot_pairs:
                         if data['quoteVolume'] >= MIN_24H_VOLUME_USD:
+                            passed_volume += 1
 
                             # Verificação segura de status
                             swap_market = self.exchange_swap.markets.get(symbol, {})
@@ -224,51 +348,97 @@ class CashAndCarryBot:
                             swap_active = swap_market.get('active', False)
                             spot_active = spot_market.get('active', False)
 
-                            swap_fmt = f"{COLOR_GREEN}True{COLOR_RESET}" if swap_active else f"{COLOR_RED}False{COLOR_RESET}"
-                            spot_fmt = f"{COLOR_GREEN}True{COLOR_RESET}" if spot_active else f"{COLOR_RED}False{COLOR_RESET}"
-
-                            LOGGER.info(f"Par Candidato: {COLOR_CYAN}{symbol}{COLOR_RESET} | Swap: {swap_fmt} | Spot: {spot_fmt}{COLOR_RESET}")
                             is_active = swap_active and spot_active
 
+                            # Formatação preguiçosa: o texto só é montado na thread do logger
+                            LOGGER.info(
+                                "Par Candidato: %s | Swap: %s | Spot: %s", symbol, swap_active, spot_active,
+                                extra={'color': 'cyan' if is_active else 'red', 'symbol': symbol,
+                                       'swap_active': swap_active, 'spot_active': spot_active}
+                            )
+
                             if is_active:
                                 candidates.append(symbol)
 
             top_candidates = sorted(candidates, key=lambda x: tickers_swap[x]['quoteVolume'], reverse=True)[:100]
-            
-            valid_pairs_data = {} 
+
+            # Funding atual de todos os pares numa chamada só (premiumIndex sem símbolo)
+            if snapshot:
+                current_rates = snapshot['funding_rates']
+            else:
+                with span('scan.fetch_funding_rates'):
+                    current_rates = self._fetch_current_funding_rates()
+
+            # Tabela cruzada com as outras exchanges (só comparação: a entrada continua na casa)
+            if self.venue_scanner:
+                with span('scan.venues'):
+                    try:
+                        self.venue_scanner.scan(home_quotes=(tickers_swap, current_rates))
+                        self.venue_scanner.log_table()
+                    except Exception as e:
+                        LOGGER.warning(f"Scanner multi-exchange falhou: {e}")
+
+            full_scan = self.ranking.full_rescan_due()
+            self.ranking.retain(set(top_candidates))
+            analyzed = reused = skipped = unavailable = 0
+            samples = {'funding': [], 'basis': [], 'mark': [], 'spread': []}
 
             for symbol in top_candidates:
-                # O filtro agora retorna (Bool, Rate)
-                is_valid, rate, avg_rate = self._analyze_funding_consistency(symbol)
+                volume_24h = tickers_swap[symbol]['quoteVolume']
+                price_spot = tickers_spot[self.symbol_index.spot_for(symbol)]['last']
+                price_swap = tickers_swap[symbol]['last'] / self.symbol_index.multiplier(symbol)
+                basis = (price_swap - price_spot) / price_spot if price_spot else 0.0
+                current_rate, next_funding = current_rates.get(symbol, (None, None))
+
+                samples['funding'].append(current_rate if current_rate is not None else np.nan)
+                samples['basis'].append(basis)
+                samples['mark'].append(price_swap)
+                samples['spread'].append(self._relative_spread(tickers_swap[symbol]))
+
+                # Só reanalisa o histórico se algo relevante mudou desde a última análise
+                if current_rate is not None and not full_scan:
+                    if self.ranking.is_negative(symbol, current_rate):
+                        skipped += 1
+                        continue
+                    if not self.ranking.needs_refresh(symbol, current_rate, volume_24h, basis):
+                        self.ranking.observe(symbol, current_rate, volume_24h)
+                        reused += 1
+                        continue
 
-                if rate >= TARGET_FUNDING:
-                    rate_msg = f"{COLOR_GREEN}{rate:.4%}{COLOR_RESET}"
-                elif 0 <= rate < TARGET_FUNDING:
-                    rate_msg = f"{COLOR_YELLOW}{rate:.4%}{COLOR_RESET}"
-                else:
-                    rate_msg = f"{COLOR_RED}{rate:.4%}{COLOR_RESET}"
+                # O filtro agora retorna (Bool, Rate)
+                try:
+                    is_valid, rate, avg_rate = self._analyze_funding_consistency(symbol, current_rate)
+                except Exception as e:
+                    # Exchange instável: pula o par sem registrar análise (disjuntor aberto barra os próximos na hora)
+                    unavailable += 1
+                    LOGGER.debug("Histórico de funding indisponível para %s: %s", symbol, e)
+                    continue
+                self.ranking.record_analysis(symbol, is_valid, rate, avg_rate, volume_24h, basis, next_funding)
+                analyzed += 1
+
+                status = 'APROVADO' if is_valid else 'REJEITADO'
+                LOGGER.info(
+                    "[%s]: %s | Funding Atual: %.4f%% | Funding Médio: %.4f%%", status, symbol, rate * 100, avg_rate * 100,
+                    extra={'color': 'green' if is_valid else 'red', 'symbol': symbol, 'status': status,
+                           'funding_rate': rate, 'avg_funding_rate': avg_rate}
+                )
+            
+            if full_scan:
+                self.ranking.mark_full_scan()
 
-                if avg_rate >= 0.0001:
-                    avg_msg = f"{COLOR_GREEN}{avg_rate:.4%}{COLOR_RESET}"
-                elif 0 <= avg_rate < 0.0001:
-                    avg_msg = f"{COLOR_YELLOW}{avg_rate:.4%}{COLOR_RESET}"
-                else:
-                    avg_msg = f"{COLOR_RED}{avg_rate:.4%}{COLOR_RESET}"
+            # Uma passada vetorizada para o universo inteiro
+            self.rolling.update_many(top_candidates, time.time(), samples)
 
-                time.sleep(0.5)  # Pequena pausa para evitar sobrecarga de API
-                
-                if is_valid:
-                    volume_24h = tickers_swap[symbol]['quoteVolume']
+            valid_pairs_data = self.ranking.approved()
+            LOGGER.info(f"Ranking: {analyzed} pares analisados | {reused} reaproveitados | {skipped} em cache negativo{' (reconciliação completa)' if full_scan else ''}")
+            if unavailable:
+                LOGGER.warning(f"Ranking: {unavailable} pares sem histórico de funding (exchange instável). Ficam para o próximo scan.")
 
-                    valid_pairs_data[symbol] = {
-                        'funding_rate': rate,
-                        'volume': volume_24h
-                    }
+            SCAN_CANDIDATES.labels(stage='volume_filter').set(passed_volume)
+            SCAN_CANDIDATES.labels(stage='active').set(len(candidates))
+            SCAN_CANDIDATES.labels(stage='top_volume').set(len(top_candidates))
+            SCAN_CANDIDATES.labels(stage='funding_approved').set(len(valid_pairs_data))
 
-                    LOGGER.info(f"{COLOR_GREEN}[APROVADO]{COLOR_RESET}: {COLOR_CYAN}{symbol}{COLOR_RESET} | Funding Atual: {rate_msg} | Funding Médio: {avg_msg}")
-                else:
-                    LOGGER.info(f"{COLOR_RED}[REJEITADO]{COLOR_RESET}: {COLOR_CYAN}{symbol}{COLOR_RESET} | Funding Atual: {rate_msg} | Funding Médio: {avg_msg}")
-            
             LOGGER.info("Fim da varredura dinâmica de mercado.")
             return valid_pairs_data, tickers_swap, tickers_spot
             
@@ -276,31 +446,85 @@ class CashAndCarryBot:
             LOGGER.error(f"Erro no scanner: {e}")
             return {}, {}, {}
 
-    def _analyze_funding_consistency(self, symbol):
+    def _refresh_markets(self):
+        """
+        Carrega os metadados de mercado (recarrega a cada MARKETS_RELOAD_INTERVAL)
+        e reconstrói o índice de símbolos quando eles mudam.
+        """
+        # Primeira carga aproveita os mercados já carregados na inicialização (saldos, estado, Guardião)
+        reload = bool(self.markets_loaded_at) and time.time() - self.markets_loaded_at >= MARKETS_RELOAD_INTERVAL
+        self.exchange_swap.load_markets(reload)
+        self.exchange_spot.load_markets(reload)
+        if reload or not self.markets_loaded_at:
+            self.markets_loaded_at = time.time()
+
+        if self.symbol_index.is_stale(self.exchange_swap.markets, self.exchange_spot.markets):
+            self.symbol_index.build(self.exchange_swap.markets, self.exchange_spot.markets)
+
+    @staticmethod
+    def _relative_spread(ticker):
+        """Spread bid/ask relativo ao preço médio (NaN se o ticker não trouxer o livro)."""
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        if not bid or not ask:
+            return np.nan
+        return (ask - bid) / ((ask + bid) / 2)
+
+    def _position_multiplier(self, symbol):
+        """Multiplicador do contrato (gravado na posição; índice como fallback)."""
+        if self.position and self.position.symbol == symbol:
+            return self.position.multiplier
+        return self.symbol_index.multiplier(symbol)
+
+    def _fetch_current_funding_rates(self):
+        """
+        Funding atual e próxima liquidação (segundos) de todos os perpétuos: {symbol: (rate, next_funding)}.
+        Em caso de falha retorna {} e o scanner volta a buscar par a par.
+        """
+        try:
+            rates = self.exchange_swap.fetch_funding_rates()
+        except Exception as e:
+            LOGGER.warning(f"Falha ao buscar funding em lote: {e}. Usando consulta por par.")
+            return {}
+        return {
+            symbol: (info['fundingRate'], self._next_funding_seconds(info))
+            for symbol, info in rates.items()
+            if info.get('fundingRate') is not None
+        }
+
+    @staticmethod
+    def _next_funding_seconds(funding_info):
+        """Próxima liquidação em segundos (o CCXT preenche fundingTimestamp ou nextFundingTimestamp)."""
+        ts = funding_info.get('nextFundingTimestamp') or funding_info.get('fundingTimestamp')
+        return ts / 1000 if ts else None
+
+    @traced('scan.funding_history')
+    def _analyze_funding_consistency(self, symbol, current_rate=None):
         """
         Analisa o histórico e retorna o Funding Rate atual validado.
+        current_rate pode vir da consulta em lote (evita uma chamada por par).
         Retorno: (True/False, current_rate)
+        Falha transitória (rede, exchange fora, disjuntor aberto) é propagada: o par não pode
+        ser reprovado (nem entrar no cache negativo) por falta de dados.
         """
         try:
             # Busca histórico
-            history = self.exchange_swap.fetch_funding_rate_history(symbol, limit=9)
+            history = self.exchange_swap.fetch_funding_rate_history(symbol, limit=FUNDING_CONSISTENCY_WINDOW)
 
-            time.sleep(0.5)  # Pausa para evitar sobrecarga de API
-
-            current_rate = self.exchange_swap.fetch_funding_rate(symbol)['fundingRate']
+            if current_rate is None:
+                current_rate = self.exchange_swap.fetch_funding_rate(symbol)['fundingRate']
 
             if not history or not current_rate:
                 LOGGER.warning(f"Dados insuficientes para análise de {symbol}. Histórico ou funding atual indisponível.")
                 return False, 0.0, 0.0
             
-            if len(history) < 9: 
+            if len(history) < FUNDING_CONSISTENCY_WINDOW: 
                 return False, 0.0, 0.0
             
-            recent_rates = [entry['fundingRate'] for entry in history[-9:]]
+            recent_rates = [entry['fundingRate'] for entry in history[-FUNDING_CONSISTENCY_WINDOW:]]
             
             # 1. Média Atrativa
             avg_rate = sum(recent_rates) / len(recent_rates)
-            if avg_rate < 0.0001: 
+            if avg_rate < MIN_FUNDING_RATE: 
                 return False, current_rate, avg_rate
 
             # 2. Momento Atual Positivo
@@ -309,83 +533,186 @@ class CashAndCarryBot:
             
             return True, current_rate, avg_rate
             
-        except: 
+        except Exception as e:
+            if is_transient(e):
+                raise
+            LOGGER.warning(f"Análise de funding de {symbol} falhou ({classify(e) or 'dados inválidos'}): {e}")
             return False, 0.0, 0.0
 
+    @traced('entry_check')
+    def _entry_inputs(self, symbol, spot_symbol):
+        """
+        Custos de um candidato para o score de entrada: taxas reais, slippage (impacto no livro)
+        das duas pernas e intervalo de funding em horas.
+        """
+        real_fee_spot = self._get_real_fee_rate(spot_symbol, swap=False)
+        real_fee_swap = self._get_real_fee_rate(symbol, swap=True)
+
+        # Define margem de segurança para taxas (1.1 = 10% de buffer sobre a taxa)
+        estimated_fee_pct = (real_fee_spot + real_fee_swap) * 1.1
+
+        # Reduz o capital base para garantir que sobra dinheiro para as taxas
+        usable_capital = self.capital / (1 + estimated_fee_pct)
+
+        allocation_per_leg = usable_capital / 2
+
+        # Slippage Real (Impacto de Mercado): compra no Spot, venda (short) no Futuro
+        slippage_spot = self._calculate_market_impact(spot_symbol, allocation_per_leg, side='buy', swap=False)
+        slippage_swap = self._calculate_market_impact(symbol, allocation_per_leg, side='sell', swap=True)
+
+        return real_fee_spot, real_fee_swap, slippage_spot, slippage_swap, self._funding_interval_hours(symbol)
+
+    def _funding_interval_hours(self, symbol):
+        """Intervalo de funding do perpétuo (fundingIntervalHours da Binance; 8h se ausente)."""
+        try:
+            # Carrega dados cacheados do mercado pelo CCXT
+            market = self.exchange_swap.market(symbol)
+            if 'info' in market and 'fundingIntervalHours' in market['info']:
+                interval_hours = int(market['info']['fundingIntervalHours'])
+                if interval_hours > 0:
+                    return interval_hours
+        except Exception as e:
+            LOGGER.debug("Não foi possível obter intervalo dinâmico para %s, usando 8h: %s", symbol, e)
+        return 8
+
     def check_entry_opportunity(self, symbol, spot_symbol, price_spot, price_swap, funding_rate):
         """
-        Avalia viabilidade de entrada.
+        Avalia viabilidade de entrada de um único par (mesmo cálculo do lote em evaluate_candidates).
         Args:
             price_spot (float): Preço atual do Spot.
-            price_swap (float): Preço atual do Futuro.
+            price_swap (float): Preço atual do Futuro (por unidade do ativo Spot).
             funding_rate (float): Taxa de funding atual.
         """
         try:
-            # 1. Taxas
-            real_fee_spot = self._get_real_fee_rate(spot_symbol, swap=False)
-            real_fee_swap = self._get_real_fee_rate(symbol, swap=True)
-            
-            # Define margem de segurança para taxas (1.1 = 10% de buffer sobre a taxa)
-            estimated_fee_pct = (real_fee_spot + real_fee_swap) * 1.1
-            
-            # Reduz o capital base para garantir que sobra dinheiro para as taxas
-            usable_capital = self.capital / (1 + estimated_fee_pct)
-            
-            allocation_per_leg = usable_capital / 2
-
-            # 2. Slippage Real (Impacto de Mercado)
-            # Slippage da Perna Spot (Compra)
-            slippage_spot = self._calculate_market_impact(spot_symbol, allocation_per_leg, side='buy', swap=False)
-            # Slippage da Perna Futura (Venda/Short)
-            slippage_swap = self._calculate_market_impact(symbol, allocation_per_leg, side='sell', swap=True)
+            fee_spot, fee_swap, slippage_spot, slippage_swap, interval = self._entry_inputs(symbol, spot_symbol)
+            score = score_entries(funding_rate, price_spot, price_swap, fee_spot, fee_swap,
+                                  slippage_spot, slippage_swap, interval)
+            return bool(score['viable']), funding_rate, self._reason_label(score, ())
+        except Exception as e:
+            LOGGER.error(f"Erro ao verificar oportunidade para {symbol}: {e}")
+            return False, 0.0, f"ERROR"
 
-            total_custo_spot = (real_fee_spot * 2) + (slippage_spot * 2)
-            total_custo_swap = (real_fee_swap * 2) + (slippage_swap * 2)
-            
-            total_fees_real = total_custo_spot + total_custo_swap
+    @staticmethod
+    def _reason_label(score, index):
+        code = int(score['reason'][index])
+        if code == REASON_BACKWARDATION:
+            return f"BACKWARDATION ({float(score['basis'][index])})"
+        return REASON_LABELS[code]
 
-            funding_frequency_daily = 3.0 # Fallback padrão (8h)
-            
-            try:
-                # Carrega dados cacheados do mercado pelo CCXT
-                market = self.exchange_swap.market(symbol)
-                
-                # Verifica se existe informação específica de intervalo (comum na Binance: fundingIntervalHours)
-                if 'info' in market and 'fundingIntervalHours' in market['info']:
-                    interval_hours = int(market['info']['fundingIntervalHours'])
-                    if interval_hours > 0:
-                        funding_frequency_daily = 24 / interval_hours
-            except Exception as e:
-                # Mantém o fallback silenciosamente em caso de erro de lookup, mas loga se necessário
-                LOGGER.debug(f"Não foi possível obter intervalo dinâmico para {symbol}, usando 8h: {e}")
-                pass
-            
-            # O retorno tem que pagar as Taxas + O Lucro Mínimo
-            hurdle_rate = total_fees_real + TARGET_FUNDING
-            msg_hurdle_rate = f"{COLOR_RED}{hurdle_rate:.4%}{COLOR_RESET}"
+    @traced('evaluate_candidates')
+    def evaluate_candidates(self, top_pairs, tickers_swap, tickers_spot):
+        """
+        Avalia a entrada para todos os pares aprovados no scanner.
+        Coleta os custos de cada par e pontua todos de uma vez (tools/scoring.py).
+        Retorna (viáveis, inviáveis, motivos) para o ranking e o log de scan.
+        """
+        reasons = []
+        viable_opportunities = []
+        unviable_opportunities = []
 
-            # Projeção do Funding Real
-            projected_return = (funding_rate * funding_frequency_daily) * 3.0 # Projeta para 3 dias (Payback Period)
-            msg_projected_return = f"{COLOR_GREEN}{projected_return:.4%}{COLOR_RESET}" if projected_return >= hurdle_rate else f"{COLOR_RED}{projected_return:.4%}{COLOR_RESET}"
+        opportunities = []
+        inputs = []
 
-            LOGGER.info(f"Projeção de Funding: {symbol} | {msg_projected_return}")
-            LOGGER.info(f"Funding para 0.15: {msg_hurdle_rate}")
+        for pair, pair_data in top_pairs.items():
+            try:
+                # Lookup O(1) no índice (já resolve prefixos como 1000PEPE -> PEPE/USDT)
+                mapping = self.symbol_index.get(pair)
+                found_spot = mapping['spot_symbol'] if mapping else None
+
+                if found_spot not in tickers_spot:
+                    reasons.append(f"MISSING_SPOT_DATA ({mapping['base'] if mapping else pair})")
+                    continue
+
+                multiplier = mapping['multiplier']
+                inputs.append(self._entry_inputs(pair, found_spot))
+                opportunities.append({
+                    'pair': pair,
+                    'spot_symbol': found_spot,
+                    'funding_rate': pair_data['funding_rate'],
+                    'price_spot': tickers_spot[found_spot]['last'],
+                    # Preço do perpétuo por unidade do ativo Spot (1000PEPE -> PEPE)
+                    'price_swap': tickers_swap[pair]['last'] / multiplier,
+                    'multiplier': multiplier,
+                    'volume': pair_data['volume']
+                })
 
-            if projected_return < hurdle_rate:
-                return False, funding_rate, "LOW_PROFIT_VS_FEES"
+            except Exception as e:
+                if is_transient(e):
+                    # Sem livro/taxa confiável não há custo para pontuar: o par fica de fora desta rodada
+                    LOGGER.warning(f"Dados de mercado indisponíveis para {pair} ({classify(e)}): {e}")
+                    reasons.append("MARKET_DATA_UNAVAILABLE")
+                else:
+                    LOGGER.error(f"Erro ao processar par {pair}: {e}")
+                    reasons.append("PROCESSING_ERROR")
+                continue
 
-            # 3. Verificação de Basis (Usando os preços recebidos)
-            basis_percent = (price_swap - price_spot) / price_spot
+        if opportunities:
+            fee_spot, fee_swap, slippage_spot, slippage_swap, interval = np.array(inputs, dtype=float).T
+            score = score_entries(
+                np.array([o['funding_rate'] for o in opportunities], dtype=float),
+                np.array([o['price_spot'] for o in opportunities], dtype=float),
+                np.array([o['price_swap'] for o in opportunities], dtype=float),
+                fee_spot, fee_swap, slippage_spot, slippage_swap, interval
+            )
 
-            if basis_percent < NEGATIVE_FUNDING_THRESHOLD: 
-                return False, funding_rate, f"BACKWARDATION ({basis_percent})"
+            for i, opportunity in enumerate(opportunities):
+                pair = opportunity['pair']
+                fr = opportunity['funding_rate']
+                reason = self._reason_label(score, i)
+                fields = {'symbol': pair, 'funding_rate': fr,
+                          'projected_return': float(score['projected_return'][i]), 'hurdle_rate': float(score['hurdle'][i])}
+
+                if score['viable'][i]:
+                    LOGGER.info("Candidato Classificado: %s | Funding: %.4f%% | Projeção 3d: %.4f%% (mínimo %.4f%%)",
+                                pair, fr * 100, fields['projected_return'] * 100, fields['hurdle_rate'] * 100,
+                                extra={'color': 'green', **fields})
+                    viable_opportunities.append(opportunity)
+                else:
+                    LOGGER.info("Candidato Rejeitado: %s | Funding: %.4f%% | Projeção 3d: %.4f%% (mínimo %.4f%%) | Motivo: %s",
+                                pair, fr * 100, fields['projected_return'] * 100, fields['hurdle_rate'] * 100, reason,
+                                extra={'color': 'red', 'reason': reason, **fields})
+                    unviable_opportunities.append(opportunity)
 
-            return True, funding_rate, "SUCCESS"
+                reasons.append(reason)
 
-        except Exception as e:
-            LOGGER.error(f"Erro ao verificar oportunidade para {symbol}: {e}")
-            return False, 0.0, f"ERROR"
+        SCAN_CANDIDATES.labels(stage='viable').set(len(viable_opportunities))
+        return viable_opportunities, unviable_opportunities, reasons
         
+    def best_opportunity(self, viable_opportunities):
+        """
+        Melhor candidato viável: maior funding, desempate pelo volume.
+        Sai do heap do ranking restrito aos viáveis; busca linear só se o ranking não tiver nenhum deles.
+        """
+        by_symbol = {item['pair']: item for item in viable_opportunities}
+        best = self.ranking.best(eligible=by_symbol)
+        if best is not None:
+            return by_symbol[best['symbol']]
+        return max(viable_opportunities, key=lambda x: (x['funding_rate'], x['volume']), default=None)
+
+    @staticmethod
+    def scan_record(top_pairs, unviable_opportunities, reasons, best=None, outcome=None):
+        """
+        Registro do scan para o banco (log_scan_attempt).
+        Com best (entrada tentada) o motivo é outcome; sem ele, o motivo mais comum das rejeições
+        e o par de maior funding entre os inviáveis.
+        """
+        if best is None:
+            best = max(
+                unviable_opportunities,
+                key=lambda x: x['funding_rate'],
+                default={'funding_rate': 0.0, 'pair': 'N/A'}
+            )
+            outcome = Counter(reasons).most_common(1)[0][0] if reasons else "ENTRY_EXECUTED"
+        return {
+            'total_analyzed': len(top_pairs),
+            'passed_volume': len(top_pairs),
+            'best_funding': best['funding_rate'],
+            'best_pair': best['pair'],
+            'reason': outcome
+        }
+
+    @traced('execute_real_entry')
+    @governed(PRIORITY_ORDER)
     def execute_real_entry(self, symbol, spot_symbol, allocation_usd):
         """
         Executa entrada simultânea (Spot + Swap) com proteção de Rollback.
@@ -394,18 +721,8 @@ class CashAndCarryBot:
         LOGGER.info(f"--- INICIANDO EXECUÇÃO REAL: {symbol} ---")
         
         # 1. Preparação de Dados e Preços
+        pretrade_started = time.monotonic()
         try:
-            # Baixa preços atualizados para calcular limites
-            ticker_spot = self.exchange_spot.fetch_ticker(spot_symbol)
-            ticker_swap = self.exchange_swap.fetch_ticker(symbol)
-            
-            price_spot = ticker_spot['last']
-            price_swap = ticker_swap['last']
-            
-            # Tolerância de Slippage (0.5%)
-            limit_buy_price = price_spot * 1.005
-            limit_sell_price = price_swap * 0.995
-
             real_fee_spot = self._get_real_fee_rate(spot_symbol, swap=False)
             real_fee_swap = self._get_real_fee_rate(symbol, swap=True)
 
@@ -414,15 +731,26 @@ class CashAndCarryBot:
             # Cálculo do capital útil descontando taxas previstas
             usable_capital = allocation_usd / (1 + estimated_fee_pct)
             
+            # Livros das duas pernas de uma vez (prazo + hedge; cache recente se a exchange demorar)
+            book_spot, book_swap = self._pretrade_books((self.exchange_spot, spot_symbol), (self.exchange_swap, symbol))
+
+            # Limite da perna Spot pelo livro atual (pior nível para o valor alocado + buffer aprendido)
+            plan_spot = self.price_bands.plan(self.exchange_spot, spot_symbol, 'buy', usd=usable_capital / 2, book=book_spot)
+
             # Calcula quantidades baseadas no capital alocado
-            raw_amount = (usable_capital / 2) / limit_buy_price
+            raw_amount = (usable_capital / 2) / plan_spot['limit']
             
-            amount_spot = self.exchange_spot.amount_to_precision(spot_symbol, raw_amount)
-            amount_swap = self.exchange_swap.amount_to_precision(symbol, raw_amount)
+            # Contratos escalados (1000PEPE = 1000 PEPE): arredonda a perna Swap (passo mais grosso)
+            # e deriva a Spot dela, para as duas pernas cobrirem exatamente a mesma quantidade
+            multiplier = self.symbol_index.multiplier(symbol)
+            amount_swap = self.exchange_swap.amount_to_precision(symbol, raw_amount / multiplier)
+            amount_spot = self.exchange_spot.amount_to_precision(spot_symbol, float(amount_swap) * multiplier)
+
+            plan_swap = self.price_bands.plan(self.exchange_swap, symbol, 'sell', amount=float(amount_swap), book=book_swap)
             
             # Formata preços para precisão da exchange
-            price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, limit_buy_price)
-            price_swap_fmt = self.exchange_swap.price_to_precision(symbol, limit_sell_price)
+            price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, plan_spot['limit'])
+            price_swap_fmt = self.exchange_swap.price_to_precision(symbol, plan_swap['limit'])
 
             LOGGER.info(f"Tentativa: Comprar {amount_spot} {spot_symbol} @ {price_spot_fmt} | Short {amount_swap} {symbol} @ {price_swap_fmt}")
 
@@ -430,33 +758,44 @@ class CashAndCarryBot:
             LOGGER.error(f"Erro na preparação da ordem real: {e}")
             return False
 
+        PRETRADE_LATENCY.labels(operation='entry').observe(time.monotonic() - pretrade_started)
+
         # 2. Execução Paralela (Disparo Simultâneo)
         # Usamos ThreadPool para não travar o código esperando uma resposta antes de enviar a outra
+        # Pernas nas threads do pool com a prioridade da chamadora (ex: fechamento do Guardião)
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
             
             # Prepara as "balas"
             future_spot = executor.submit(
-                self._place_limit_ioc_order, 
+                GOVERNOR.inherit(self._place_limit_ioc_order),
                 self.exchange_spot, 
                 spot_symbol, 
                 'buy', 
                 amount_spot, 
-                price_spot_fmt
+                price_spot_fmt,
+                operation='entry',
+                plan=plan_spot
             )
             
             future_swap = executor.submit(
-                self._place_limit_ioc_order, 
+                GOVERNOR.inherit(self._place_limit_ioc_order),
                 self.exchange_swap, 
                 symbol, 
                 'sell', 
                 amount_swap, 
-                price_swap_fmt
+                price_swap_fmt,
+                operation='entry',
+                plan=plan_swap
             )
             
             # Espera os resultados
             order_spot = future_spot.result()
             order_swap = future_swap.result()
 
+        self._observe_leg_skew('entry', order_spot, order_swap)
+        self.price_bands.record_fill(plan_spot, order_spot)
+        self.price_bands.record_fill(plan_swap, order_swap)
+
         # 3. Verificação de Sucesso e Lógica de Rollback
         spot_ok = order_spot is not None and order_spot['status'] in ['filled', 'closed']
         swap_ok = order_swap is not None and order_swap['status'] in ['filled', 'closed']
@@ -466,14 +805,18 @@ class CashAndCarryBot:
             LOGGER.info(f"{COLOR_GREEN}SUCESSO TOTAL! Ordens executadas. Spot ID: {order_spot['id']} | Swap ID: {order_swap['id']}{COLOR_RESET}")
             
             # Atualiza estado interno do bot com dados reais da exchange
-            self.position = {
-                'symbol': symbol,
-                'spot_symbol': spot_symbol,
-                'size': float(order_swap['filled']), # Usa o que foi realmente preenchido
-                'entry_price_spot': float(order_spot['average']),
-                'entry_price_swap': float(order_swap['average']),
-                'entry_time': time.time()
-            }
+            self.position = Position(
+                symbol=symbol,
+                spot_symbol=spot_symbol,
+                size=float(order_swap['filled']), # Usa o que foi realmente preenchido (em contratos do Swap)
+                multiplier=multiplier,
+                entry_price_spot=float(order_spot['average']),
+                entry_price_swap=float(order_swap['average']),
+                entry_time=time.time()
+            )
+            # Próxima liquidação é lida no primeiro monitoramento (evita herdar a da posição anterior)
+            self.next_funding_timestamp = None
+            self.boredom_score = 0
             self._save_state()
             return True
 
@@ -485,7 +828,7 @@ class CashAndCarryBot:
             if spot_ok and not swap_ok:
                 LOGGER.warning("Rollback: Vendendo Spot comprado incorretamente...")
                 try:
-                    self.exchange_spot.create_market_sell_order(spot_symbol, order_spot['filled'])
+                    self._market_order('rollback', self.exchange_spot, spot_symbol, 'sell', order_spot['filled'], reference=order_spot)
                     LOGGER.info("Rollback Spot concluído.")
                 except Exception as e:
                     LOGGER.critical(f"{COLOR_RED}FALHA GRAVE NO ROLLBACK SPOT: {e}{COLOR_RESET}")
@@ -494,51 +837,107 @@ class CashAndCarryBot:
             elif swap_ok and not spot_ok:
                 LOGGER.warning("Rollback: Fechando Short aberto incorretamente...")
                 try:
-                    self.exchange_swap.create_market_buy_order(symbol, order_swap['filled'])
+                    self._market_order('rollback', self.exchange_swap, symbol, 'buy', order_swap['filled'], reference=order_swap)
                     LOGGER.info("Rollback Swap concluído.")
                 except Exception as e:
                     LOGGER.critical(f"{COLOR_RED}FALHA GRAVE NO ROLLBACK SWAP: {e}{COLOR_RESET}")
-            
+
+            # Confere se o rollback zerou de fato (ordens parciais ou recusadas deixam sobra)
+            self._request_sweep('ROLLBACK')
             return False
 
+    def _table_quotes(self, symbol, spot_symbol):
+        """
+        (ticker Swap, preço Spot, funding) lidos da tabela de mercado em memória compartilhada,
+        no formato do CCXT. None sem tabela ou com linha ausente/velha: o chamador usa o REST.
+        """
+        if self.market_table is None:
+            return None
+        swap = self.market_table.read(symbol)
+        spot = self.market_table.read(spot_symbol)
+        if not swap or not spot or np.isnan(swap['last']) or np.isnan(swap['funding']) or np.isnan(spot['last']):
+            return None
+
+        ticker_swap = {'symbol': symbol, 'bid': swap['bid'], 'ask': swap['ask'], 'last': swap['last']}
+        funding_info = {
+            'symbol': symbol,
+            'fundingRate': swap['funding'],
+            'markPrice': None if np.isnan(swap['mark']) else swap['mark'],
+            'fundingTimestamp': None if np.isnan(swap['next_funding']) else swap['next_funding'],
+            'timestamp': None if np.isnan(swap['exchange_ts']) else int(swap['exchange_ts']),
+        }
+        if self.paper:
+            # A liquidação simulada anda com as leituras de funding (o feed não passa pela corretora simulada)
+            self.paper.observe_funding(funding_info)
+        return ticker_swap, spot['last'], funding_info
+
+    @traced('monitor')
+    @governed(PRIORITY_MONITOR)
     def monitor_and_manage(self, db_manager):
         if not self.position: return
 
         now = time.time()
-        symbol = self.position['symbol']
-        spot_symbol = self.position['spot_symbol']
+        symbol = self.position.symbol
+        spot_symbol = self.position.spot_symbol
+        multiplier = self.position.multiplier
         
         try:
-            # 1. Busca dados do Futuro (Necessário para PnL e Monitoramento)
-            ticker_swap = self.exchange_swap.fetch_ticker(symbol)
-            price_swap = ticker_swap['last']
+            # 0. Tabela em memória compartilhada (sem chamada de API); velha ou ausente -> REST
+            quotes = self._table_quotes(symbol, spot_symbol)
+            if quotes:
+                ticker_swap, price_spot, funding_info = quotes
+                price_swap = ticker_swap['last']
+            else:
+                # 1. Busca dados do Futuro (Necessário para PnL e Monitoramento)
+                with span('monitor.fetch_tickers'):
+                    ticker_swap = self.exchange_swap.fetch_ticker(symbol)
+                    price_swap = ticker_swap['last']
 
-            try:
-                # Tenta buscar o preço real do ativo no mercado à vista
-                ticker_spot = self.exchange_spot.fetch_ticker(spot_symbol)
-                price_spot = ticker_spot['last']
-            except Exception as e:
-                # Em caso de falha na API Spot, mantém o fallback e loga aviso
-                LOGGER.warning(f"Falha ao buscar preço Spot para monitoramento: {e}. Usando proxy.")
-                price_spot = price_swap
-            
-            # --- Lógica de Funding ---
-            funding_info = self.exchange_swap.fetch_funding_rate(symbol)
+                    try:
+                        # Tenta buscar o preço real do ativo no mercado à vista
+                        ticker_spot = self.exchange_spot.fetch_ticker(spot_symbol)
+                        price_spot = ticker_spot['last']
+                    except Exception as e:
+                        # Em caso de falha na API Spot, mantém o fallback e loga aviso
+                        LOGGER.warning(f"Falha ao buscar preço Spot para monitoramento: {e}. Usando proxy.")
+                        price_spot = price_swap / multiplier
+
+                # --- Lógica de Funding ---
+                with span('monitor.fetch_funding'):
+                    funding_info = self.exchange_swap.fetch_funding_rate(symbol)
             current_funding = funding_info['fundingRate']
 
-            if current_funding < TARGET_FUNDING:
-                penalty = 1 # Peso base (o tempo está passando e o lucro é baixo)
+            self.rolling.update(
+                symbol, now, funding=current_funding,
+                basis=(price_swap / multiplier - price_spot) / price_spot,
+                mark=price_swap / multiplier, spread=self._relative_spread(ticker_swap)
+            )
+            funding_stats = self.rolling.stats(symbol, 'funding')
+
+            # O score anda em passos de BOREDOM_EVAL_INTERVAL, independente da frequência do monitoramento
+            boredom_due = now - self.last_boredom_eval >= BOREDOM_EVAL_INTERVAL
+            if boredom_due:
+                self.last_boredom_eval = now
+
+            if boredom_due and current_funding < TARGET_FUNDING:
+                penalty = BOREDOM_PENALTY_BASE # Peso base (o tempo está passando e o lucro é baixo)
 
                 # 2. Aceleração por Gravidade (Se for muito baixo, < 50% da meta)
                 if current_funding < (TARGET_FUNDING / 2):
-                    penalty += 2 
+                    penalty += BOREDOM_PENALTY_CRITICAL
                     LOGGER.info(f"Funding Crítico ({current_funding:.4%}). Acelerando saída...")
 
                 # 3. Aceleração por Tendência de Queda
-                # Se o funding atual for PIOR que o último registrado, aumenta o peso
-                if hasattr(self, 'last_funding_rate') and current_funding < self.last_funding_rate:
-                    penalty += 3
-                    LOGGER.info(f"Tendência de Queda detectada ({self.last_funding_rate:.4%} -> {current_funding:.4%}). Penalidade máxima aplicada.")
+                # Com histórico suficiente compara com a média exponencial (ignora ruído de uma amostra);
+                # senão, com o último funding registrado
+                if funding_stats and funding_stats['count'] >= ROLLING_MIN_SAMPLES:
+                    reference = funding_stats['ewma']
+                else:
+                    reference = getattr(self, 'last_funding_rate', current_funding)
+
+                if current_funding < reference:
+                    penalty += BOREDOM_PENALTY_TREND
+                    LOGGER.info(f"Tendência de Queda detectada ({reference:.4%} -> {current_funding:.4%}). Penalidade máxima aplicada.")
 
                 self.boredom_score += penalty
                 
@@ -548,40 +947,46 @@ class CashAndCarryBot:
                 if self.boredom_score >= EXIT_SCORE_LIMIT:
                     LOGGER.warning(f"{COLOR_RED}LIMITE DE TÉDIO ATINGIDO. O par {symbol} não é mais rentável.{COLOR_RESET}")
                     
-                    success = self.execute_real_close(symbol, spot_symbol, self.position['size'], "LOW_PERFORMANCE_EXIT")
+                    success = self.execute_real_close(symbol, spot_symbol, self.position.size, "LOW_PERFORMANCE_EXIT")
                     
                     if success:
                         self.boredom_score = 0 # Reseta após sair
                         return # Interrompe o resto da função
 
-            else:
+            elif boredom_due:
                 # Se o funding voltou a ficar bom, o score diminui (ou zera)
                 if self.boredom_score > 0:
-                    self.boredom_score = max(0, self.boredom_score - 2) # Recupera 2 pontos por ciclo bom
+                    self.boredom_score = max(0, self.boredom_score - BOREDOM_RECOVERY) # Recupera pontos por ciclo bom
                     LOGGER.info(f"Funding recuperado ({current_funding:.4%}). Score de tédio reduzido para {self.boredom_score}.")
 
             # Atualiza a memória para a próxima comparação
             self.last_funding_rate = current_funding
             
-            api_next_funding_ts = funding_info.get('nextFundingTimestamp')
-            api_next_funding_sec = api_next_funding_ts / 1000 if api_next_funding_ts else None
+            api_next_funding_sec = self._next_funding_seconds(funding_info)
 
-            if self.next_funding_timestamp and now >= self.next_funding_timestamp:
-                funding_payout = (self.position['size'] * price_swap) * current_funding
-                self.accumulated_profit += funding_payout
-                
-                if api_next_funding_sec and api_next_funding_sec > now:
-                    self.next_funding_timestamp = api_next_funding_sec
+            if not self.next_funding_timestamp and api_next_funding_sec:
+                self.next_funding_timestamp = api_next_funding_sec
+
+            # Funding entra no lucro pelo que a exchange realmente pagou (ledger), não por estimativa:
+            # sincroniza após cada liquidação e periodicamente (pega pagamentos publicados com atraso)
+            settled = self.next_funding_timestamp and now >= self.next_funding_timestamp
+            if settled or self.funding_ledger.sync_due(now):
+                self._sync_funding_ledger(db_manager)
+
+            if settled and api_next_funding_sec and api_next_funding_sec > now:
+                self.next_funding_timestamp = api_next_funding_sec
 
             # --- Circuit Breaker ---
             if current_funding < NEGATIVE_FUNDING_THRESHOLD:
                 LOGGER.warning(f"{COLOR_RED}SAIDA FORÇADA: Funding negativo crítico ({current_funding:.4%}){COLOR_RESET}")
-                self.execute_real_close(symbol, spot_symbol, self.position['size'], "CIRCUIT_BREAKER")
+                self.execute_real_close(symbol, spot_symbol, self.position.size, "CIRCUIT_BREAKER")
                 return
 
+            self.last_basis = (price_swap / multiplier - price_spot) / price_spot
+
             # --- Cálculo de PnL Flutuante ---
-            spot_pnl = (price_spot - self.position['entry_price_spot']) * self.position['size']
-            swap_pnl = (self.position['entry_price_swap'] - price_swap) * self.position['size']
+            spot_pnl = (price_spot - self.position.entry_price_spot) * self.position.size * multiplier
+            swap_pnl = (self.position.entry_price_swap - price_swap) * self.position.size
             net_pnl_price = spot_pnl + swap_pnl
             
             total_equity = self.capital + self.accumulated_profit + net_pnl_price
@@ -591,6 +996,9 @@ class CashAndCarryBot:
             
             drawdown = (self.peak_capital - total_equity) / self.peak_capital if self.peak_capital > 0 else 0
 
+            ACCUMULATED_PROFIT.set(self.accumulated_profit + net_pnl_price)
+            BOREDOM_SCORE.set(self.boredom_score)
+
             try:
                 self.auto_balance_wallets()
             except Exception as e:
@@ -606,8 +1014,8 @@ class CashAndCarryBot:
                 'symbol': symbol,
                 'price_swap': price_swap,
                 'funding_rate': current_funding,
-                'next_funding_time': datetime.fromtimestamp(self.next_funding_timestamp).strftime('%Y-%m-%d %H:%M:%S'),
-                'position_size': self.position['size'],
+                'next_funding_time': datetime.fromtimestamp(self.next_funding_timestamp).strftime('%Y-%m-%d %H:%M:%S') if self.next_funding_timestamp else 'N/A',
+                'position_size': self.position.size,
                 'simulated_fees': self.accumulated_fees,
                 'accumulated_profit': self.accumulated_profit + net_pnl_price,
                 'max_drawdown': drawdown,
@@ -623,6 +1031,8 @@ class CashAndCarryBot:
         except Exception as e:
             LOGGER.error(f"Monitor error: {e}")
 
+    @traced('execute_real_close')
+    @governed(PRIORITY_ORDER)
     def execute_real_close(self, symbol, spot_symbol, quantity, reason="SIGNAL"):
         """
         Encerra a posição (Vende Spot + Compra Futuro) simultaneamente.
@@ -630,46 +1040,57 @@ class CashAndCarryBot:
         mas força 'Market' se algo der errado.
         """
         LOGGER.info(f"--- INICIANDO FECHAMENTO REAL: {symbol} (Motivo: {reason}) ---")
+        pretrade_started = time.monotonic()
         
         try:
-            # 1. Preparação de Dados
-            ticker_spot = self.exchange_spot.fetch_ticker(spot_symbol)
-            ticker_swap = self.exchange_swap.fetch_ticker(symbol)
-            
-            price_spot = ticker_spot['last']
-            price_swap = ticker_swap['last']
-            
-            # Tolerância de Slippage na SAÍDA (0.5%)
-            limit_sell_spot = price_spot * 0.995
-            
-            limit_buy_swap = price_swap * 1.005
-            
-            # Ajuste de precisão (Quantidade)
-            qty_spot = self.exchange_spot.amount_to_precision(spot_symbol, quantity)
+            # 1. Ajuste de precisão (Quantidade)
+            # quantity está em contratos do Swap; a perna Spot vende quantity x multiplicador
+            qty_spot = self.exchange_spot.amount_to_precision(spot_symbol, quantity * self._position_multiplier(symbol))
             qty_swap = self.exchange_swap.amount_to_precision(symbol, quantity)
+
+            # Limites pelo livro atual de cada perna (pior nível para a quantidade + buffer aprendido)
+            try:
+                book_spot, book_swap = self._pretrade_books((self.exchange_spot, spot_symbol), (self.exchange_swap, symbol))
+            except Exception as e:
+                # Sem livro não há preço limite, mas o fechamento nunca é abandonado: as duas pernas vão a mercado
+                LOGGER.critical(f"{COLOR_RED}Livros indisponíveis no fechamento ({classify(e) or 'interno'}): {e}{COLOR_RESET}")
+                book_spot = book_swap = None
+
+            order_spot = order_swap = None
+            if book_spot is not None:
+                plan_spot = self.price_bands.plan(self.exchange_spot, spot_symbol, 'sell', amount=float(qty_spot), book=book_spot)
+                plan_swap = self.price_bands.plan(self.exchange_swap, symbol, 'buy', amount=float(qty_swap), book=book_swap)
             
-            # Ajuste de precisão (Preço)
-            price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, limit_sell_spot)
-            price_swap_fmt = self.exchange_swap.price_to_precision(symbol, limit_buy_swap)
-
-            LOGGER.info(f"Fechando: Vender Spot {qty_spot} @ {price_spot_fmt} | Comprar Swap {qty_swap} @ {price_swap_fmt}")
-
-            # 2. Execução Paralela
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                # Dispara Venda do Spot
-                future_spot = executor.submit(
-                    self._place_limit_ioc_order, 
-                    self.exchange_spot, spot_symbol, 'sell', qty_spot, price_spot_fmt
-                )
+                # Ajuste de precisão (Preço)
+                price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, plan_spot['limit'])
+                price_swap_fmt = self.exchange_swap.price_to_precision(symbol, plan_swap['limit'])
+
+                LOGGER.info(f"Fechando: Vender Spot {qty_spot} @ {price_spot_fmt} | Comprar Swap {qty_swap} @ {price_swap_fmt}")
+                PRETRADE_LATENCY.labels(operation='close').observe(time.monotonic() - pretrade_started)
+
+                # 2. Execução Paralela
+                # Pernas nas threads do pool com a prioridade da chamadora (ex: fechamento do Guardião)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                    # Dispara Venda do Spot
+                    future_spot = executor.submit(
+                        GOVERNOR.inherit(self._place_limit_ioc_order),
+                        self.exchange_spot, spot_symbol, 'sell', qty_spot, price_spot_fmt,
+                        operation='close', plan=plan_spot
+                    )
                 
-                # Dispara Compra do Swap (Fechar Short)
-                future_swap = executor.submit(
-                    self._place_limit_ioc_order, 
-                    self.exchange_swap, symbol, 'buy', qty_swap, price_swap_fmt
-                )
+                    # Dispara Compra do Swap (Fechar Short)
+                    future_swap = executor.submit(
+                        GOVERNOR.inherit(self._place_limit_ioc_order),
+                        self.exchange_swap, symbol, 'buy', qty_swap, price_swap_fmt,
+                        operation='close', plan=plan_swap
+                    )
                 
-                order_spot = future_spot.result()
-                order_swap = future_swap.result()
+                    order_spot = future_spot.result()
+                    order_swap = future_swap.result()
+
+                self._observe_leg_skew('close', order_spot, order_swap)
+                self.price_bands.record_fill(plan_spot, order_spot)
+                self.price_bands.record_fill(plan_swap, order_swap)
 
             # 3. Verificação e "Force Close" (Limpeza de Erros)
             spot_done = order_spot is not None and order_spot['status'] in ['filled', 'closed']
@@ -679,8 +1100,10 @@ class CashAndCarryBot:
             if spot_done and swap_done:
                 LOGGER.info(f"{COLOR_CYAN}POSIÇÃO ENCERRADA COM SUCESSO NO MODO REAL.{COLOR_RESET}")
                 self._clean_spot_dust(spot_symbol)
+                self.last_position = self.position
                 self.position = None
                 self._save_state()
+                self._emit('POSITION_CLOSED')
                 return True
 
             # CASO DE ERRO:Força saída a Mercado
@@ -691,7 +1114,7 @@ class CashAndCarryBot:
                 if not spot_done:
                     try:
                         LOGGER.warning("Forçando Venda de Spot a Mercado...")
-                        self.exchange_spot.create_market_sell_order(spot_symbol, qty_spot)
+                        self._market_order('emergency', self.exchange_spot, spot_symbol, 'sell', qty_spot)
                     except Exception as e:
                         LOGGER.critical(f"{COLOR_RED}FALHA CRÍTICA AO VENDER SPOT: {e}{COLOR_RESET}")
 
@@ -699,19 +1122,24 @@ class CashAndCarryBot:
                 if not swap_done:
                     try:
                         LOGGER.warning("Forçando Fechamento de Swap a Mercado...")
-                        self.exchange_swap.create_market_buy_order(symbol, qty_swap)
+                        self._market_order('emergency', self.exchange_swap, symbol, 'buy', qty_swap)
                     except Exception as e:
                         LOGGER.critical(f"{COLOR_RED}FALHA CRÍTICA AO FECHAR SWAP: {e}{COLOR_RESET}")
                 
-                # Assume que limpou tudo após a emergência
+                # Sai do livro; a varredura confere se as duas pernas zeraram de fato
+                self.last_position = self.position
                 self.position = None
                 self._save_state()
+                self._emit('POSITION_CLOSED')
+                self._request_sweep('EMERGENCY_CLOSE')
                 return True
 
         except Exception as e:
             LOGGER.error(f"{COLOR_RED}Erro catastrófico no fechamento real: {e}{COLOR_RESET}")
             return False
 
+    @traced('compounding')
+    @governed(PRIORITY_ORDER)
     def _process_compounding(self, symbol, spot_symbol, price_spot, price_swap):
         """
         Aumenta a posição se houver saldo pendente, executando ordens REAIS na exchange.
@@ -725,8 +1153,10 @@ class CashAndCarryBot:
             LOGGER.warning(f"Reinvestimento abortado: Falha ao checar funding atual ({e})")
             return
 
-        # Validação de Basis (Spread de Preço)
-        current_basis = (price_swap - price_spot) / price_spot
+        multiplier = self._position_multiplier(symbol)
+
+        # Validação de Basis (Spread de Preço, por unidade do ativo Spot)
+        current_basis = (price_swap / multiplier - price_spot) / price_spot
         
         # Se o spread estiver comprimido (< 0.05%), não vale a pena pagar taxas de Taker
         if current_basis < 0.0005: 
@@ -742,6 +1172,7 @@ class CashAndCarryBot:
             
         LOGGER.info(f"--- INICIANDO REINVESTIMENTO REAL: ${self.pending_deposit_usd:.2f} ---")
 
+        pretrade_started = time.monotonic()
         real_fee_spot = self._get_real_fee_rate(spot_symbol, swap=False)
         real_fee_swap = self._get_real_fee_rate(symbol, swap=True)
 
@@ -753,44 +1184,51 @@ class CashAndCarryBot:
 
         # --- 1. Preparação dos Parâmetros de Ordem (Precisão e Slippage) ---
         try:
-            # Slippage
-            slippage_spot = self._calculate_market_impact(spot_symbol, allocation_per_leg, side='buy', swap=False)
-            slippage_swap = self._calculate_market_impact(symbol, allocation_per_leg, side='sell', swap=True)
-
-            # Preços Limite (com margem para garantir execução IOC)
-            limit_buy_price = price_spot * (1 + slippage_spot)
-            limit_sell_price = price_swap * (1 - slippage_swap)
+            # Preço Limite da perna Spot (livro + buffer aprendido, garante a execução IOC)
+            book_spot, book_swap = self._pretrade_books((self.exchange_spot, spot_symbol), (self.exchange_swap, symbol))
+            plan_spot = self.price_bands.plan(self.exchange_spot, spot_symbol, 'buy', usd=allocation_per_leg, book=book_spot)
 
             # Cálculo da quantidade bruta
-            raw_amount = allocation_per_leg / limit_buy_price
+            raw_amount = allocation_per_leg / plan_spot['limit']
 
             # Ajuste de Precisão para a Exchange (Ex: 0.00123 BTC)
-            amount_spot = self.exchange_spot.amount_to_precision(spot_symbol, raw_amount)
-            amount_swap = self.exchange_swap.amount_to_precision(symbol, raw_amount)
+            amount_swap = self.exchange_swap.amount_to_precision(symbol, raw_amount / multiplier)
+            amount_spot = self.exchange_spot.amount_to_precision(spot_symbol, float(amount_swap) * multiplier)
+
+            plan_swap = self.price_bands.plan(self.exchange_swap, symbol, 'sell', amount=float(amount_swap), book=book_swap)
             
             # Ajuste de Precisão de Preço
-            price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, limit_buy_price)
-            price_swap_fmt = self.exchange_swap.price_to_precision(symbol, limit_sell_price)
+            price_spot_fmt = self.exchange_spot.price_to_precision(spot_symbol, plan_spot['limit'])
+            price_swap_fmt = self.exchange_swap.price_to_precision(symbol, plan_swap['limit'])
 
         except Exception as e:
             LOGGER.error(f"Erro na preparação do reinvestimento: {e}")
             return
 
+        PRETRADE_LATENCY.labels(operation='compounding').observe(time.monotonic() - pretrade_started)
+
         # --- 2. Execução Paralela (Spot Buy + Swap Sell) ---
+        # Pernas nas threads do pool com a prioridade da chamadora (ex: fechamento do Guardião)
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
             future_spot = executor.submit(
-                self._place_limit_ioc_order, 
-                self.exchange_spot, spot_symbol, 'buy', amount_spot, price_spot_fmt
+                GOVERNOR.inherit(self._place_limit_ioc_order),
+                self.exchange_spot, spot_symbol, 'buy', amount_spot, price_spot_fmt,
+                operation='compounding', plan=plan_spot
             )
             
             future_swap = executor.submit(
-                self._place_limit_ioc_order, 
-                self.exchange_swap, symbol, 'sell', amount_swap, price_swap_fmt
+                GOVERNOR.inherit(self._place_limit_ioc_order),
+                self.exchange_swap, symbol, 'sell', amount_swap, price_swap_fmt,
+                operation='compounding', plan=plan_swap
             )
             
             order_spot = future_spot.result()
             order_swap = future_swap.result()
 
+        self._observe_leg_skew('compounding', order_spot, order_swap)
+        self.price_bands.record_fill(plan_spot, order_spot)
+        self.price_bands.record_fill(plan_swap, order_swap)
+
         # --- 3. Verificação e Atualização de Estado ---
         spot_ok = order_spot is not None and order_spot['status'] in ['filled', 'closed']
         swap_ok = order_swap is not None and order_swap['status'] in ['filled', 'closed']
@@ -802,14 +1240,14 @@ class CashAndCarryBot:
             exec_price_swap = float(order_swap['average'])
 
             # Cálculo de Taxas Reais Pagas
-            cost_spot = (filled_qty * exec_price_spot) * real_fee_spot
+            cost_spot = (filled_qty * multiplier * exec_price_spot) * real_fee_spot
             cost_swap = (filled_qty * exec_price_swap) * real_fee_swap
             actual_fees = cost_spot + cost_swap
 
             # Dados Antigos para Ponderação
-            old_qty = self.position['size']
-            old_price_spot = self.position['entry_price_spot']
-            old_price_swap = self.position['entry_price_swap']
+            old_qty = self.position.size
+            old_price_spot = self.position.entry_price_spot
+            old_price_swap = self.position.entry_price_swap
             
             total_new_qty = old_qty + filled_qty
 
@@ -818,9 +1256,9 @@ class CashAndCarryBot:
             avg_price_swap = ((old_price_swap * old_qty) + (exec_price_swap * filled_qty)) / total_new_qty
 
             # Atualização do Estado
-            self.position['size'] = total_new_qty
-            self.position['entry_price_spot'] = avg_price_spot
-            self.position['entry_price_swap'] = avg_price_swap
+            self.position.size = total_new_qty
+            self.position.entry_price_spot = avg_price_spot
+            self.position.entry_price_swap = avg_price_swap
             
             # Atualização Financeira
             self.capital += self.pending_deposit_usd # Incorpora o depósito ao capital do bot
@@ -838,7 +1276,7 @@ class CashAndCarryBot:
             # Se comprou Spot mas falhou Swap -> Vende Spot
             if spot_ok and not swap_ok:
                 try:
-                    self.exchange_spot.create_market_sell_order(spot_symbol, order_spot['filled'])
+                    self._market_order('rollback', self.exchange_spot, spot_symbol, 'sell', order_spot['filled'], reference=order_spot)
                     LOGGER.info("Rollback: Spot extra vendido.")
                 except Exception as e:
                     LOGGER.critical(f"{COLOR_RED}ERRO ROLLBACK SPOT: {e}{COLOR_RESET}")
@@ -846,11 +1284,37 @@ class CashAndCarryBot:
             # Se vendeu Swap mas falhou Spot -> Fecha Swap
             elif swap_ok and not spot_ok:
                 try:
-                    self.exchange_swap.create_market_buy_order(symbol, order_swap['filled'])
+                    self._market_order('rollback', self.exchange_swap, symbol, 'buy', order_swap['filled'], reference=order_swap)
                     LOGGER.info("Rollback: Short extra fechado.")
                 except Exception as e:
                     LOGGER.critical(f"{COLOR_RED}ERRO ROLLBACK SWAP: {e}{COLOR_RESET}")
 
+    def _sync_funding_ledger(self, db_manager=None):
+        """Incorpora ao lucro acumulado os pagamentos de funding novos do ledger."""
+        try:
+            records = self.funding_ledger.sync()
+        except Exception as e:
+            LOGGER.warning(f"Falha ao sincronizar ledger de funding: {e}")
+            return
+
+        if records:
+            self.accumulated_profit += sum(record['amount'] for record in records)
+            if db_manager is not None and hasattr(db_manager, 'log_funding_income'):
+                db_manager.log_funding_income(records)
+        self._save_state()
+
+    def _observe_leg_skew(self, operation, order_spot, order_swap):
+        """
+        Registra a diferença de execução entre as pernas (timestamps da própria exchange).
+        """
+        if not order_spot or not order_swap:
+            return
+        ts_spot = order_spot.get('timestamp')
+        ts_swap = order_swap.get('timestamp')
+        if ts_spot and ts_swap:
+            LEG_SKEW.labels(operation=operation).observe(abs(ts_spot - ts_swap) / 1000)
+
+    @traced('fee_lookup')
     def _get_real_fee_rate(self, symbol, swap=False):
         """
         Busca a taxa de Taker real da conta via API.
@@ -888,14 +1352,29 @@ class CashAndCarryBot:
             return taker_fee
 
         except Exception as e:
-            LOGGER.warning(f"Erro ao buscar fee real ({symbol}): {e}. Usando default.")
+            # Sem cache do fallback: a taxa real é buscada de novo quando a exchange responder
+            LOGGER.warning(f"Erro ao buscar fee real ({symbol}, {classify(e) or 'interno'}): {e}. Usando default.")
             return FEE_TAKER_SWAP_DEFAULT if swap else FEE_TAKER_SPOT_DEFAULT
         
-    def _place_limit_ioc_order(self, client, symbol, side, amount, limit_price):
+    def _pretrade_books(self, *legs):
+        """Livros das pernas [(cliente, símbolo)] lidos em paralelo pelo HedgedReader (mesma ordem)."""
+        calls = []
+        for client, symbol in legs:
+            market_type = client.options.get('defaultType')
+            calls.append((
+                ('book', market_type, symbol), f"order_book_{market_type}",
+                lambda client=client, symbol=symbol: client.fetch_order_book(symbol, limit=PRICE_BAND_BOOK_DEPTH)
+            ))
+        return self.pretrade.read_many(calls)
+
+    @traced('order_ioc')
+    def _place_limit_ioc_order(self, client, symbol, side, amount, limit_price, operation='ioc', plan=None):
         """
         Envia uma ordem LIMIT com TimeInForce = IOC (Immediate-Or-Cancel).
         Isso simula uma ordem a mercado, mas com proteção de preço (Slippage máximo).
+        O resultado (inclusive falha de envio) vai para o diário de execução.
         """
+        started = time.perf_counter()
         try:
             # params={'timeInForce': 'IOC'} instrui a Binance a cancelar imediatamente
             # qualquer parte da ordem que não possa ser preenchida ao preço limite ou melhor.
@@ -907,11 +1386,86 @@ class CashAndCarryBot:
                 price=limit_price,
                 params={'timeInForce': 'IOC'} 
             )
+            self._journal(operation, client, symbol, side, 'limit_ioc', amount, order, started, plan=plan, limit_price=limit_price)
             return order
         except Exception as e:
             LOGGER.error(f"Falha na execução da perna {side} ({symbol}): {e}")
+            self._journal(operation, client, symbol, side, 'limit_ioc', amount, None, started, plan=plan,
+                          limit_price=limit_price, error=str(e))
             return None
 
+    def _market_order(self, operation, client, symbol, side, amount, reference=None, params=None):
+        """
+        Ordem a mercado (rollback, emergência, dust, varredura) registrada no diário de execução.
+        reference: ordem da perna desfeita por um rollback (para o custo do rollback). Erros sobem ao chamador.
+        """
+        started = time.perf_counter()
+        try:
+            order = client.create_order(symbol, 'market', side, amount, None, params or {})
+        except Exception as e:
+            self._journal(operation, client, symbol, side, 'market', amount, None, started, error=str(e))
+            raise
+        self._journal(operation, client, symbol, side, 'market', amount, order, started, reference=reference)
+        return order
+
+    def _journal(self, operation, client, symbol, side, order_type, amount, order, started,
+                 plan=None, limit_price=None, reference=None, error=None):
+        """Monta o registro da ordem (previsto vs. executado) e grava no diário, se houver banco."""
+        db_manager = self.db_manager
+        if db_manager is None or not hasattr(db_manager, 'log_execution'):
+            return
+        try:
+            amount = float(amount)
+            order = order or {}
+            filled = float(order.get('filled') or 0.0)
+            average = float(order['average']) if order.get('average') else None
+            sign = 1 if side == 'buy' else -1
+
+            record = {
+                'operation': operation,
+                'market': client.options.get('defaultType', 'spot'),
+                'symbol': symbol,
+                'side': side,
+                'order_type': order_type,
+                'order_id': order.get('id'),
+                'status': order.get('status') or ('error' if error else None),
+                'amount': amount,
+                'filled': filled,
+                'fill_ratio': filled / amount if amount else 0.0,
+                'limit_price': float(limit_price) if limit_price is not None else None,
+                'avg_price': average,
+                'latency_ms': (time.perf_counter() - started) * 1000,
+                'error': error,
+            }
+
+            # Previsto (livro no planejamento) vs. executado, ambos relativos ao topo do livro
+            if plan:
+                record['best_price'] = plan['best']
+                record['intended_price'] = plan['expected']
+                record['predicted_slippage'] = sign * (plan['expected'] - plan['best']) / plan['best']
+                if average:
+                    record['achieved_slippage'] = sign * (average - plan['best']) / plan['best']
+
+            # Taxa em USD quando a moeda da taxa é a cotação ou o próprio ativo
+            fee = order.get('fee') or {}
+            if fee.get('cost') is not None:
+                market = client.market(symbol)
+                record['fee_cost'] = float(fee['cost'])
+                record['fee_currency'] = fee.get('currency')
+                if fee.get('currency') == market.get('quote'):
+                    record['fee_usd'] = float(fee['cost'])
+                elif fee.get('currency') == market.get('base') and average:
+                    record['fee_usd'] = float(fee['cost']) * average
+
+            # Rollback: quanto custou desfazer a perna (diferença de preço sobre o volume desfeito)
+            if reference and average and reference.get('average'):
+                record['rollback_cost'] = sign * (average - float(reference['average'])) * filled
+
+            db_manager.log_execution(record)
+        except Exception as e:
+            LOGGER.warning(f"Falha ao registrar execução no diário ({symbol}): {e}")
+
+    @traced('order_book_impact')
     def _calculate_market_impact(self, symbol, usd_amount, side='buy', swap=False):
         """
         Calcula o Slippage real simulando uma ordem a mercado no Order Book atual.
@@ -973,26 +1527,31 @@ class CashAndCarryBot:
             return slippage_pct
 
         except Exception as e:
+            if is_transient(e):
+                # Slippage simulado com a exchange instável aprovaria a entrada às cegas
+                raise
             LOGGER.warning(f"Erro ao calcular slippage real para {symbol}: {e}")
             return SLIPPAGE_SIMULATED
         
-    def auto_balance_wallets(self, threshold_usd=1.0):
+    @traced('auto_balance_wallets')
+    @governed(PRIORITY_MONITOR)
+    def auto_balance_wallets(self, threshold_usd=None, max_age=BALANCE_MAX_AGE):
         """
-        Gerencia o equilíbrio entre carteiras com segurança.
+        Gerencia o equilíbrio entre carteiras com segurança, a partir da visão em cache do BalanceService
+        (no caso comum o monitoramento não faz nenhuma consulta de saldo).
         
         1. Calcula o saldo total REAL (Spot + Futuros).
-        2. Se estiver SEM POSIÇÃO: Rebalanceia 50/50 e detecta aportes pelo saldo total.
+        2. Se estiver SEM POSIÇÃO: Rebalanceia 50/50 (com histerese) e detecta aportes pelo saldo total.
         3. Se estiver COM POSIÇÃO: Ignora saldo total (para não contar PnL) e detecta aportes apenas no Spot.
+
+        Args:
+            threshold_usd (float, optional): Desvio fixo que dispara o rebalanceamento.
+                                             Se None, usa a banda do config (piso em USD ou % do total).
+            max_age (float): Idade máxima (s) aceita para o saldo em cache.
         """
         try:
-            # 1. Busca Saldo Livre Real (Free Balance)
-            bal_spot_raw = self.exchange_spot.fetch_balance()
-            free_spot = bal_spot_raw.get('USDT', {}).get('free', 0.0)
-
-            time.sleep(1)
-
-            bal_swap_raw = self.exchange_swap.fetch_balance()
-            free_swap = bal_swap_raw.get('USDT', {}).get('free', 0.0)
+            # 1. Saldo Livre Real (Free Balance), renovado só se sujo ou velho
+            free_spot, free_swap = self.balances.free_usdt(max_age=max_age)
 
             current_total_real = free_spot + free_swap
 
@@ -1024,34 +1583,43 @@ class CashAndCarryBot:
                 # Atualiza a referência do último saldo conhecido
                 self.last_real_balance = current_total_real
                 
-                # Lógica de Transferência 50/50
+                # Lógica de Transferência 50/50 com histerese: só sai do lugar se o desvio
+                # passar da banda, e então volta ao centro (evita transferências de centavos)
                 target_per_wallet = current_total_real / 2
                 diff = free_spot - target_per_wallet
-
-                if diff > threshold_usd:
-                    self.exchange_spot.transfer('USDT', diff, 'spot', 'future')
-                    LOGGER.info(f"Balanceamento: Spot -> Futuros (${diff:.2f})")
-                elif diff < -threshold_usd:
-                    amount = abs(diff)
-                    self.exchange_spot.transfer('USDT', amount, 'future', 'spot')
-                    LOGGER.info(f"Balanceamento: Futuros -> Spot (${amount:.2f})")
+                band = threshold_usd if threshold_usd is not None else rebalance_band(current_total_real)
+                # Spot abaixo do centro trava a próxima entrada (a perna Spot usa metade do capital):
+                # o déficit é coberto mesmo dentro da banda
+                spot_short = diff < -REBALANCE_SPOT_DEFICIT_USD
+
+                if (abs(diff) > band and self.balances.transfer_allowed()) or spot_short:
+                    if diff > 0:
+                        self.balances.transfer(diff, 'spot', 'future')
+                        LOGGER.info(f"Balanceamento: Spot -> Futuros (${diff:.2f})")
+                    else:
+                        amount = abs(diff)
+                        self.balances.transfer(amount, 'future', 'spot')
+                        LOGGER.info(f"Balanceamento: Futuros -> Spot (${amount:.2f})")
                 
                 return current_total_real
 
             # --- CENÁRIO B: Bot Posicionado (Trade Aberto) ---
-            else:                
-                # Se tem dinheiro livre no Spot (> $5), assumimos que é dinheiro novo (Aporte)
-                if free_spot > 5.0:
-                    amount_to_transfer = free_spot / 2
+            else:
+                # Metade de cada aporte pendente fica no Spot reservada para o reinvestimento;
+                # só o que passar dessa reserva é dinheiro novo
+                current_pending = getattr(self, 'pending_deposit_usd', 0.0)
+                new_deposit = free_spot - current_pending / 2
+
+                if new_deposit > DEPOSIT_MIN_USD:
+                    amount_to_transfer = new_deposit / 2
                     
-                    LOGGER.info(f"{COLOR_CYAN}APORTE DETECTADO COM POSIÇÃO ABERTA! Spot Livre: ${free_spot:.2f}{COLOR_RESET}")
+                    LOGGER.info(f"{COLOR_CYAN}APORTE DETECTADO COM POSIÇÃO ABERTA! Novo saldo Spot: ${new_deposit:.2f}{COLOR_RESET}")
                     LOGGER.info(f"Enviando ${amount_to_transfer:.2f} para margem...")
 
-                    self.exchange_spot.transfer('USDT', amount_to_transfer, 'spot', 'future')
+                    self.balances.transfer(amount_to_transfer, 'spot', 'future')
                     
                     # Atualiza pendente com segurança
-                    current_pending = getattr(self, 'pending_deposit_usd', 0.0)
-                    self.pending_deposit_usd = current_pending + free_spot
+                    self.pending_deposit_usd = current_pending + new_deposit
                     
                     if hasattr(self, '_save_state'):
                         self._save_state()
@@ -1063,6 +1631,8 @@ class CashAndCarryBot:
             # Em caso de erro, retorna o que tiver na memória ou 0.0 para não travar
             return getattr(self, 'capital', 0.0)
         
+    @traced('clean_spot_dust')
+    @governed(PRIORITY_ORDER)
     def _clean_spot_dust(self, spot_symbol):
         """
         Verifica se restou saldo residual (dust) na carteira Spot e tenta vender a mercado.
@@ -1071,9 +1641,8 @@ class CashAndCarryBot:
         try:
             base_currency = spot_symbol.split('/')[0] # Ex: 'BTC/USDT' -> 'BTC'
             
-            # Busca saldo atualizado especificamente da moeda base
-            balance_raw = self.exchange_spot.fetch_balance()
-            free_amount = balance_raw.get(base_currency, {}).get('free', 0.0)
+            # Saldo da moeda base (a venda acabou de invalidar o Spot: vem atualizado da exchange)
+            free_amount = self.balances.free('spot', base_currency)
 
             if free_amount <= 0:
                 return
@@ -1081,7 +1650,7 @@ class CashAndCarryBot:
             LOGGER.info(f"Detectada sobra de {free_amount} {base_currency}. Tentando limpar...")
 
             # Tenta vender tudo o que sobrou a mercado
-            self.exchange_spot.create_market_sell_order(spot_symbol, free_amount)
+            self._market_order('dust', self.exchange_spot, spot_symbol, 'sell', free_amount)
             
             LOGGER.info(f"Limpeza de dust realizada: {free_amount} {base_currency} vendidos.")
 
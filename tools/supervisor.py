@@ -0,0 +1,185 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from configs.config import *
+from tools.ipc import make_message, validate, MessageError, ROLE_SUPERVISOR, ROLE_MARKET_DATA, ROLE_STRATEGY, ROLE_EXECUTION
+from tools.processes import run_market_data, run_strategy, run_execution
+from tools.market_table import MarketTable
+
+TARGETS = {
+    ROLE_MARKET_DATA: run_market_data,
+    ROLE_STRATEGY: run_strategy,
+    ROLE_EXECUTION: run_execution,
+}
+
+
+class Supervisor:
+    """
+    Sobe, vigia e interliga os processos de dados de mercado, estratégia e execução/risco.
+
+    - Cada filho tem um Pipe exclusivo com o supervisor, que roteia as mensagens pelo campo
+      'target'. A escrita para cada filho passa por uma fila e uma thread próprias: um filho
+      ocupado (ex: scan longo) nunca trava o roteamento dos outros.
+    - Processo morto ou sem heartbeat por MP_HEARTBEAT_TIMEOUT é reiniciado com backoff
+      exponencial e um Pipe novo; um processo estável por MP_RESTART_RESET zera o backoff.
+      Mensagens para um processo fora do ar são descartadas (os protocolos se recuperam:
+      a execução republica a posição e a estratégia repete pedidos sem resposta).
+    - Contexto 'spawn': cada filho começa limpo (sem threads, locks ou conexões herdadas).
+      Cada filho sobe com BOT_PROCESS_ROLE no ambiente e grava logs/traces em arquivos do seu papel.
+    - O supervisor é dono da tabela de mercado em memória compartilhada: cria antes dos
+      filhos e remove no encerramento, então ela sobrevive ao reinício de qualquer processo.
+    """
+    def __init__(self, targets=TARGETS):
+        self.targets = targets
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = {}
+        self.conns = {}
+        self.outboxes = {}
+        self.heartbeats = {}
+        self.started_at = {}
+        self.failures = {role: 0 for role in targets}
+        self.restart_at = {}
+        self.table = None
+        self.running = False
+
+    # --- Ciclo de vida dos filhos ---
+
+    def _start(self, role):
+        conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=self.targets[role], args=(child_conn,), name=role)
+        # O filho ('spawn') herda o ambiente: configs.config abre logs e traces próprios do papel
+        os.environ['BOT_PROCESS_ROLE'] = role
+        try:
+            process.start()
+        finally:
+            os.environ.pop('BOT_PROCESS_ROLE', None)
+        child_conn.close()
+
+        outbox = queue.Queue(MP_QUEUE_SIZE)
+        threading.Thread(target=self._writer, args=(role, conn, outbox), name=f"supervisor-{role}", daemon=True).start()
+
+        self.processes[role] = process
+        self.conns[role] = conn
+        self.outboxes[role] = outbox
+        self.started_at[role] = self.heartbeats[role] = time.time()
+        self.restart_at.pop(role, None)
+        LOGGER.info(f"Supervisor: '{role}' iniciado (pid {process.pid}).")
+
+    def _stop_io(self, role):
+        conn = self.conns.pop(role, None)
+        outbox = self.outboxes.pop(role, None)
+        if outbox is not None:
+            outbox.put(None)
+        if conn is not None:
+            conn.close()
+
+    def _writer(self, role, conn, outbox):
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            try:
+                conn.send(message)
+            except (OSError, EOFError, ValueError):
+                return
+
+    def _schedule_restart(self, role, reason):
+        self._stop_io(role)
+        now = time.time()
+        if now - self.started_at.get(role, now) >= MP_RESTART_RESET:
+            self.failures[role] = 0
+        delay = min(MP_RESTART_BACKOFF_MIN * 2 ** self.failures[role], MP_RESTART_BACKOFF_MAX)
+        self.failures[role] += 1
+        self.restart_at[role] = now + delay
+        LOGGER.error(f"Supervisor: '{role}' {reason}. Reiniciando em {delay:.0f}s (queda #{self.failures[role]}).")
+
+    def _check(self):
+        now = time.time()
+        for role in self.targets:
+            if role in self.restart_at:
+                if now >= self.restart_at[role]:
+                    self._start(role)
+                continue
+
+            process = self.processes[role]
+            if not process.is_alive():
+                self._schedule_restart(role, f"saiu (código {process.exitcode})")
+            elif now - self.heartbeats.get(role, 0.0) > MP_HEARTBEAT_TIMEOUT:
+                process.terminate()
+                process.join(5)
+                self._schedule_restart(role, f"sem heartbeat há {now - self.heartbeats[role]:.0f}s")
+
+    # --- Roteamento ---
+
+    def _route(self, message):
+        if message['target'] == ROLE_SUPERVISOR:
+            if message['type'] == 'sys.heartbeat':
+                self.heartbeats[message['role']] = time.time()
+            return
+
+        outbox = self.outboxes.get(message['target'])
+        if outbox is None:
+            LOGGER.warning(f"Supervisor: '{message['target']}' fora do ar, '{message['type']}' descartada.")
+            return
+        try:
+            outbox.put_nowait(message)
+        except queue.Full:
+            LOGGER.warning(f"Supervisor: caixa de '{message['target']}' cheia, '{message['type']}' descartada.")
+
+    def _pump(self, timeout):
+        by_conn = {conn: role for role, conn in self.conns.items()}
+        for conn in wait(list(by_conn), timeout=timeout) if by_conn else ():
+            try:
+                message = conn.recv()
+            except (OSError, EOFError):
+                # Filho caiu: o _check() agenda o reinício
+                continue
+            try:
+                self._route(validate(message))
+            except MessageError as e:
+                LOGGER.error(f"Supervisor: mensagem inválida de '{by_conn[conn]}': {e}")
+        if not by_conn:
+            time.sleep(timeout)
+
+    def run(self):
+        self.running = True
+        self.table = MarketTable(create=True)
+        for role in self.targets:
+            self._start(role)
+
+        try:
+            while self.running:
+                self._pump(timeout=1.0)
+                self._check()
+        except KeyboardInterrupt:
+            LOGGER.info("Parando bot manualmente...")
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Pede encerramento limpo; força (terminate) quem não sair a tempo."""
+        self.running = False
+        for role, outbox in list(self.outboxes.items()):
+            outbox.put(make_message('sys.shutdown', ROLE_SUPERVISOR, target=role))
+
+        deadline = time.time() + MP_SHUTDOWN_TIMEOUT
+        for role, process in self.processes.items():
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                LOGGER.warning(f"Supervisor: '{role}' não encerrou a tempo. Forçando.")
+                process.terminate()
+                process.join(5)
+            self._stop_io(role)
+        if self.table:
+            self.table.close()
+            self.table.unlink()
+            self.table = None
+        LOGGER.info("Supervisor: todos os processos encerrados.")
+
+
+def run_multiprocess():
+    LOGGER.info("Iniciando Cash & Carry Bot (modo multiprocesso)...")
+    Supervisor().run()
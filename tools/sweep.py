@@ -0,0 +1,441 @@
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import itertools
+import concurrent.futures
+from datetime import datetime
+from multiprocessing import shared_memory
+import numpy as np
+from configs.config import *
+from tools.symbols import SymbolIndex
+from tools.scoring import score_entries, round_trip_cost
+
+# Campos obrigatórios do arquivo de dados gravados (.npz)
+# Todas as matrizes têm formato (T períodos de funding, N símbolos)
+MARKET_ARRAYS = ('funding', 'volume', 'price_spot', 'price_swap')
+
+# Parâmetros varridos e seus valores padrão (vindos do config)
+DEFAULT_PARAMS = {
+    'target_funding': TARGET_FUNDING,
+    'exit_score_limit': EXIT_SCORE_LIMIT,
+    'min_24h_volume_usd': MIN_24H_VOLUME_USD,
+    'min_funding_rate': MIN_FUNDING_RATE,
+    'penalty_base': BOREDOM_PENALTY_BASE,
+    'penalty_critical': BOREDOM_PENALTY_CRITICAL,
+    'penalty_trend': BOREDOM_PENALTY_TREND,
+    'recovery': BOREDOM_RECOVERY,
+    'consistency_window': FUNDING_CONSISTENCY_WINDOW,
+}
+
+# Grade padrão (usada quando nenhum arquivo de grade é informado)
+DEFAULT_GRID = {
+    'target_funding': [(apr / 365) * 3.0 for apr in (0.05, 0.10, 0.15, 0.20, 0.30)],
+    'exit_score_limit': [5, 10, 20, 40],
+    'min_24h_volume_usd': [10_000_000, 50_000_000, 100_000_000],
+    'min_funding_rate': [0.00005, 0.0001, 0.0002],
+    'penalty_base': [1],
+    'penalty_critical': [1, 2, 4],
+    'penalty_trend': [0, 3],
+    'recovery': [1, 2, 4],
+    'consistency_window': [3, 9, 21],
+}
+
+# Parâmetros inteiros (a busca aleatória sorteia inteiros para estes)
+INTEGER_PARAMS = {'exit_score_limit', 'penalty_base', 'penalty_critical',
+                  'penalty_trend', 'recovery', 'consistency_window'}
+
+# Memória compartilhada anexada em cada processo trabalhador
+_WORKER_ARRAYS = {}
+_WORKER_SHM = []
+_WORKER_ROLLING = {}
+_WORKER_ENTRY_PLANS = {}
+_WORKER_FUNDING_ROWS = {}
+
+
+def load_market_arrays(path):
+    """
+    Carrega o arquivo de dados gravados (.npz).
+    Espera as matrizes de MARKET_ARRAYS com formato (T, N) e, opcionalmente,
+    'symbols' (N,), 'timestamps' (T,) e 'funding_interval_hours' (N,).
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: np.ascontiguousarray(data[name], dtype=np.float64) for name in MARKET_ARRAYS}
+        n_symbols = arrays['funding'].shape[1]
+
+        if 'funding_interval_hours' in data:
+            arrays['funding_interval_hours'] = np.ascontiguousarray(data['funding_interval_hours'], dtype=np.float64)
+        else:
+            arrays['funding_interval_hours'] = np.full(n_symbols, 8.0)
+
+        symbols = [str(s) for s in data['symbols']] if 'symbols' in data else [f"SYM{i}" for i in range(n_symbols)]
+
+    for name in MARKET_ARRAYS:
+        if arrays[name].shape != arrays['funding'].shape:
+            raise ValueError(f"Matriz '{name}' com formato {arrays[name].shape} diferente de funding {arrays['funding'].shape}")
+
+    return arrays, symbols
+
+
+def record_dataset(exchange_swap, exchange_spot, symbols, periods, path):
+    """
+    Grava um conjunto de dados para a varredura a partir da API (histórico de funding + candles de 8h).
+    Cada linha corresponde a um período de funding; o volume 24h é aproximado pela soma de 3 candles.
+    """
+    funding = np.zeros((periods, len(symbols)))
+    volume = np.zeros((periods, len(symbols)))
+    price_spot = np.zeros((periods, len(symbols)))
+    price_swap = np.zeros((periods, len(symbols)))
+
+    index = SymbolIndex().build(exchange_swap.load_markets(), exchange_spot.load_markets())
+
+    for col, symbol in enumerate(symbols):
+        spot_symbol = index.spot_for(symbol)
+        if spot_symbol is None:
+            LOGGER.warning(f"Dataset: {symbol} sem par Spot equivalente, ignorado")
+            continue
+        multiplier = index.multiplier(symbol)
+
+        history = exchange_swap.fetch_funding_rate_history(symbol, limit=periods)
+        candles_swap = exchange_swap.fetch_ohlcv(symbol, '8h', limit=periods)
+        candles_spot = exchange_spot.fetch_ohlcv(spot_symbol, '8h', limit=periods)
+
+        rates = [entry['fundingRate'] for entry in history][-periods:]
+        closes_swap = [c[4] / multiplier for c in candles_swap][-periods:]   # Por unidade do ativo Spot
+        closes_spot = [c[4] for c in candles_spot][-periods:]
+        quote_vols = [c[4] * c[5] for c in candles_swap][-periods:]
+
+        # Alinha pelo final (os dados mais recentes)
+        funding[periods - len(rates):, col] = rates
+        price_swap[periods - len(closes_swap):, col] = closes_swap
+        price_spot[periods - len(closes_spot):, col] = closes_spot
+        rolling_vol = np.convolve(quote_vols, np.ones(3), mode='full')[:len(quote_vols)]
+        volume[periods - len(rolling_vol):, col] = rolling_vol
+
+        LOGGER.info(f"Dataset: {symbol} gravado ({len(rates)} períodos)")
+
+    np.savez_compressed(
+        path,
+        funding=funding, volume=volume, price_spot=price_spot, price_swap=price_swap,
+        symbols=np.array(symbols)
+    )
+    return path
+
+
+def build_grid(grid):
+    """
+    Expande um dicionário {parametro: [valores]} no produto cartesiano de configurações.
+    Parâmetros ausentes assumem o valor atual do config.
+    """
+    keys = list(grid.keys())
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(keys, values))
+        configs.append(params)
+    return configs
+
+
+def build_random(ranges, samples, seed=None):
+    """
+    Sorteia configurações aleatórias a partir de {parametro: [minimo, maximo]}.
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        params = dict(DEFAULT_PARAMS)
+        for key, (low, high) in ranges.items():
+            if key in INTEGER_PARAMS:
+                params[key] = rng.randint(int(low), int(high))
+            else:
+                params[key] = rng.uniform(low, high)
+        configs.append(params)
+    return configs
+
+
+def _share_arrays(arrays):
+    """
+    Copia as matrizes de mercado para blocos de memória compartilhada.
+    Retorna (blocos, descritores) — os descritores são enviados aos trabalhadores.
+    """
+    blocks = []
+    descriptors = {}
+    for name, array in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        blocks.append(shm)
+        descriptors[name] = (shm.name, array.shape, array.dtype.str)
+    return blocks, descriptors
+
+
+def _init_worker(descriptors):
+    """
+    Anexa cada processo à memória compartilhada (somente leitura, sem cópia).
+    """
+    for name, (shm_name, shape, dtype) in descriptors.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        _WORKER_SHM.append(shm)
+        _WORKER_ARRAYS[name] = view
+
+
+def _rolling_mean(funding, window):
+    """
+    Média móvel do funding nos 'window' períodos ANTERIORES a t (NaN quando não há histórico).
+    Cacheada por janela: configs com a mesma janela reaproveitam o cálculo.
+    """
+    if window in _WORKER_ROLLING:
+        return _WORKER_ROLLING[window]
+
+    T = funding.shape[0]
+    cumsum = np.vstack([np.zeros((1, funding.shape[1])), np.cumsum(funding, axis=0)])
+    rolling = np.full(funding.shape, np.nan)
+    if window < T:
+        rolling[window:] = (cumsum[window:T] - cumsum[:T - window]) / window
+
+    _WORKER_ROLLING[window] = rolling
+    return rolling
+
+
+def _entry_plan(arrays, params, rolling, hurdle_rate):
+    """
+    Calcula, de uma vez para todos os períodos, se existe entrada e qual o melhor símbolo.
+    Só depende dos filtros de entrada, então é cacheado: configs que variam apenas
+    os parâmetros de saída (tédio) reaproveitam o mesmo plano.
+    """
+    key = (
+        id(arrays['funding']), int(params['consistency_window']), params['min_24h_volume_usd'],
+        params['min_funding_rate'], hurdle_rate
+    )
+    if key in _WORKER_ENTRY_PLANS:
+        return _WORKER_ENTRY_PLANS[key]
+
+    funding = arrays['funding']
+    volume = arrays['volume']
+
+    # Mesmo score de entrada do bot ao vivo, sobre a matriz (T, N) inteira
+    score = score_entries(
+        funding, arrays['price_spot'], arrays['price_swap'],
+        FEE_TAKER_SPOT_DEFAULT, FEE_TAKER_SWAP_DEFAULT, SLIPPAGE_SIMULATED, SLIPPAGE_SIMULATED,
+        arrays['funding_interval_hours'], params['target_funding']
+    )
+    eligible = (
+        (volume >= params['min_24h_volume_usd'])
+        & (rolling >= params['min_funding_rate'])
+        & (funding >= 0)
+        & score['viable']
+    )
+
+    # Melhor oportunidade por período: maior funding, desempate por volume
+    masked_funding = np.where(eligible, funding, -np.inf)
+    is_top = masked_funding == masked_funding.max(axis=1, keepdims=True)
+    best_symbol = np.argmax(np.where(is_top & eligible, volume, -np.inf), axis=1).tolist()
+    has_entry = eligible.any(axis=1).tolist()
+
+    _WORKER_ENTRY_PLANS[key] = (best_symbol, has_entry)
+    return best_symbol, has_entry
+
+
+def simulate(arrays, params):
+    """
+    Replica as regras do bot sobre os dados gravados (um passo = um período de funding).
+
+    Entrada: volume, média de funding da janela, funding atual, retorno projetado vs hurdle e basis.
+    Saída: score de tédio (penalidades/recuperação) ou circuit breaker de funding negativo.
+    Retorna as métricas da configuração.
+    """
+    funding = arrays['funding']
+    window = int(params['consistency_window'])
+    rolling = _rolling_mean(funding, window)
+
+    # Custo de ida e volta das duas pernas (taxas + slippage), igual ao score de entrada ao vivo
+    cost = float(round_trip_cost(FEE_TAKER_SPOT_DEFAULT, FEE_TAKER_SWAP_DEFAULT, SLIPPAGE_SIMULATED, SLIPPAGE_SIMULATED))
+    hurdle_rate = cost + params['target_funding']
+    leg_cost = cost / 2
+
+    best_symbol, has_entry = _entry_plan(arrays, params, rolling, hurdle_rate)
+
+    # Linhas de funding como listas Python (acesso escalar rápido no laço), uma vez por processo
+    key = id(funding)
+    if key not in _WORKER_FUNDING_ROWS:
+        _WORKER_FUNDING_ROWS[key] = funding.tolist()
+    funding_rows = _WORKER_FUNDING_ROWS[key]
+
+    target_funding = params['target_funding']
+    exit_score_limit = params['exit_score_limit']
+
+    equity = 1.0
+    peak = 1.0
+    max_drawdown = 0.0
+    funding_collected = 0.0
+    fees_paid = 0.0
+    trades = 0
+    periods_in_market = 0
+
+    position = -1
+    boredom_score = 0
+    last_funding = 0.0
+
+    for t in range(window, funding.shape[0]):
+        if position < 0:
+            if not has_entry[t]:
+                continue
+
+            position = best_symbol[t]
+            cost = equity * leg_cost
+            equity -= cost
+            fees_paid += cost
+            trades += 1
+            boredom_score = 0
+            last_funding = 0.0
+            continue
+
+        periods_in_market += 1
+        current_funding = funding_rows[t][position]
+
+        # Funding recebido sobre a perna vendida (metade do capital)
+        payout = (equity / 2) * current_funding
+        equity += payout
+        funding_collected += payout
+
+        exit_now = False
+        if current_funding < target_funding:
+            penalty = params['penalty_base']
+            if current_funding < target_funding / 2:
+                penalty += params['penalty_critical']
+            if current_funding < last_funding:
+                penalty += params['penalty_trend']
+            boredom_score += penalty
+            exit_now = boredom_score >= exit_score_limit
+        elif boredom_score > 0:
+            boredom_score = max(0, boredom_score - params['recovery'])
+
+        last_funding = current_funding
+
+        if current_funding < NEGATIVE_FUNDING_THRESHOLD:
+            exit_now = True
+
+        if exit_now:
+            cost = equity * leg_cost
+            equity -= cost
+            fees_paid += cost
+            position = -1
+
+        if equity > peak:
+            peak = equity
+        drawdown = (peak - equity) / peak
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+
+    total_periods = max(funding.shape[0] - window, 1)
+    return {
+        'total_return': equity - 1.0,
+        'max_drawdown': max_drawdown,
+        'funding_collected': funding_collected,
+        'fees_paid': fees_paid,
+        'trades': trades,
+        'time_in_market': periods_in_market / total_periods,
+    }
+
+
+def _evaluate_batch(batch):
+    """Avalia um lote de configurações dentro do processo trabalhador."""
+    results = []
+    for index, params in batch:
+        metrics = simulate(_WORKER_ARRAYS, params)
+        results.append((index, params, metrics))
+    return results
+
+
+def run_sweep(arrays, configs, workers=None, batch_size=64):
+    """
+    Distribui as configurações em um pool de processos.
+    As matrizes de mercado ficam em memória compartilhada (uma única cópia para todos os processos).
+    Retorna a lista de resultados ordenada pelo retorno total (melhor primeiro).
+    """
+    workers = workers or os.cpu_count() or 1
+    blocks, descriptors = _share_arrays(arrays)
+
+    indexed = list(enumerate(configs))
+    batches = [indexed[i:i + batch_size] for i in range(0, len(indexed), batch_size)]
+    results = []
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(descriptors,)
+        ) as executor:
+            for done, batch_results in enumerate(executor.map(_evaluate_batch, batches), start=1):
+                results.extend(batch_results)
+                LOGGER.debug(f"Sweep: lote {done}/{len(batches)} concluído")
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    results.sort(key=lambda r: (r[2]['total_return'], -r[2]['max_drawdown']), reverse=True)
+    return results
+
+
+def write_results(results, out_dir):
+    """
+    Grava o ranking em CSV (todas as configurações) e o melhor resultado em JSON.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    csv_path = os.path.join(out_dir, f"sweep_{stamp}.csv")
+
+    param_keys = list(DEFAULT_PARAMS.keys())
+    metric_keys = list(results[0][2].keys()) if results else []
+
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank', 'config_id'] + param_keys + metric_keys)
+        for rank, (index, params, metrics) in enumerate(results, start=1):
+            writer.writerow([rank, index] + [params[k] for k in param_keys] + [metrics[k] for k in metric_keys])
+
+    if results:
+        with open(os.path.join(out_dir, f"sweep_{stamp}_best.json"), 'w') as f:
+            json.dump({'params': results[0][1], 'metrics': results[0][2]}, f, indent=4)
+
+    return csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros da estratégia sobre dados gravados.")
+    parser.add_argument('--data', required=True, help="Arquivo .npz com os dados de mercado gravados")
+    parser.add_argument('--mode', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--space', help="JSON com a grade {param: [valores]} ou os intervalos {param: [min, max]}")
+    parser.add_argument('--samples', type=int, default=1000, help="Número de amostras na busca aleatória")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=os.path.join(BASE_DIR, "..", "results"))
+    args = parser.parse_args()
+
+    arrays, symbols = load_market_arrays(args.data)
+    space = DEFAULT_GRID
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+
+    if args.mode == 'grid':
+        configs = build_grid(space)
+    else:
+        ranges = {k: [min(v), max(v)] for k, v in space.items()}
+        configs = build_random(ranges, args.samples, seed=args.seed)
+
+    LOGGER.info(f"Sweep: {len(configs)} configurações | {arrays['funding'].shape[0]} períodos x {len(symbols)} símbolos")
+    start = time.time()
+    results = run_sweep(arrays, configs, workers=args.workers)
+    csv_path = write_results(results, args.out)
+
+    LOGGER.info(f"Sweep concluído em {time.time() - start:.1f}s. Ranking salvo em {csv_path}")
+    if results:
+        LOGGER.info(f"Melhor configuração: {results[0][1]} | Retorno: {results[0][2]['total_return']:.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import time
+import threading
+from configs.config import *
+from tools.rate_governor import GOVERNOR, PRIORITY_ORDER, PRIORITY_MONITOR
+from tools.resilience import classify
+from tools.balances import wallet_rows
+from tools.metrics import SWEEP_RESIDUE, SWEEP_ACTIONS
+
+# Tipos de achado
+ORPHAN_SPOT = 'orphan_spot'         # Ativo Spot sem hedge (exposição comprada)
+ORPHAN_SWAP = 'orphan_swap'         # Posição Swap fora do livro ou maior que ele (exposição)
+MISMATCH = 'mismatch'               # Perna da posição menor que o livro: só alerta (zerar abriria exposição)
+DUST = 'dust'                       # Sobra pequena vendável (vira USDT)
+DUST_LOCKED = 'dust_locked'         # Abaixo do mínimo de ordem (conversão em lote, se disponível)
+KINDS = (ORPHAN_SPOT, ORPHAN_SWAP, MISMATCH, DUST, DUST_LOCKED)
+
+
+class ResidueSweeper:
+    """
+    Varredura periódica de sobras: compara, numa passada em lote, todos os saldos Spot e todas as
+    posições Swap com o livro de posições do bot (bot.position).
+
+    - Uma leitura por carteira (saldo Spot inteiro, todas as posições Swap) e uma de tickers
+      para avaliar as sobras em USD; nada por ativo. Roda em clientes próprios (a thread não
+      divide cliente CCXT com o loop principal).
+    - Achado novo só gera alerta; a ação (zerar a perna órfã, vender o dust) espera o mesmo
+      achado em SWEEP_CONFIRM_PASSES passadas seguidas, com a posição do bot intacta entre elas
+      (uma entrada/saída em andamento some sozinha na conferência).
+    - Só reduz exposição: Swap em reduceOnly, Spot vendendo o excedente. Perna menor que o livro
+      é só alertada.
+    - Só age em símbolos que o próprio bot negociou (posição atual ou última, pernas de rollback e
+      emergência do diário de execução); o resto da conta é do usuário e fica em modo alerta.
+      Zerar é opcional (SWEEP_FLATTEN=1); por padrão a varredura só alerta.
+    """
+    def __init__(self, bot, exchange_spot, exchange_swap):
+        self.bot = bot
+        self.spot = exchange_spot
+        self.swap = exchange_swap
+        self.wake = threading.Event()
+        self.seen = {}              # {(tipo, ativo/símbolo): passadas seguidas}
+        self.next_run = 0.0
+        self.active = False
+        self.findings = []
+
+    def start(self):
+        self.active = True
+        threading.Thread(target=self._loop, daemon=True, name='sweeper').start()
+        LOGGER.info("Varredura de sobras iniciada.")
+
+    def request(self, reason):
+        """Antecipa a próxima varredura (ex: fechamento de emergência ou rollback)."""
+        LOGGER.info(f"Varredura de sobras solicitada ({reason}).")
+        self.next_run = 0.0
+        self.wake.set()
+
+    def _loop(self):
+        while self.active:
+            self.wake.wait(max(0.0, self.next_run - time.time()))
+            self.wake.clear()
+            if time.time() < self.next_run:
+                continue
+            try:
+                self.sweep()
+            except Exception as e:
+                LOGGER.error(f"Erro na varredura de sobras ({classify(e) or 'interno'}): {e}")
+                self.next_run = time.time() + SWEEP_INTERVAL
+
+    # --- Passada ---
+
+    def _book(self, position):
+        """Exposição esperada pelo bot: ({ativo Spot: quantidade}, {símbolo Swap: contratos com sinal})."""
+        if position is None:
+            return {}, {}
+        base = position.spot_symbol.split('/')[0]
+        return {base: position.size * position.multiplier}, {position.symbol: -position.size}
+
+    def sweep(self):
+        """Uma passada completa; devolve a lista de achados."""
+        position = self.bot.position
+        size = position.size if position else None
+        book_spot, book_swap = self._book(position)
+
+        with GOVERNOR.priority(PRIORITY_MONITOR):
+            spot_client, swap_client = self.spot, self.swap
+            spot_client.load_markets()
+            swap_client.load_markets()
+            wallet = wallet_rows(spot_client.fetch_balance())
+            positions = swap_client.fetch_positions()
+
+            assets = [
+                asset for asset in set(wallet) | set(book_spot)
+                if asset not in SWEEP_IGNORE_ASSETS and f"{asset}/USDT" in spot_client.markets
+            ]
+            tickers = spot_client.fetch_tickers([f"{asset}/USDT" for asset in assets]) if assets else {}
+
+        # Posição do bot mudou durante a leitura (entrada/saída em andamento): descarta a passada
+        if self.bot.position is not position or (position and position.size != size):
+            LOGGER.debug("Varredura de sobras: posição mudou durante a leitura. Passada descartada.")
+            self.next_run = time.time() + SWEEP_CONFIRM_DELAY
+            return []
+
+        findings = self._spot_findings(wallet, book_spot, assets, tickers) + self._swap_findings(positions, book_swap)
+        traded = self._traded(position)
+        for item in findings:
+            item['traded'] = item['symbol'] in traded
+            item['actionable'] = item['actionable'] and item['traded']
+        self._report(findings)
+        self.findings = findings
+
+        confirmed = self._confirm(findings)
+        if confirmed and SWEEP_FLATTEN:
+            with GOVERNOR.priority(PRIORITY_ORDER):
+                self._act(confirmed)
+
+        pending = any(self.seen.get((item['kind'], item['key']), 0) < SWEEP_CONFIRM_PASSES for item in findings if item['actionable'])
+        self.next_run = time.time() + (SWEEP_CONFIRM_DELAY if pending else SWEEP_INTERVAL)
+        return findings
+
+    def _traded(self, position):
+        """Símbolos (Spot e Swap) que o bot negociou: posição atual/última e pernas de rollback/emergência."""
+        symbols = set()
+        for item in (position, self.bot.last_position):
+            if item is not None:
+                symbols.update((item.spot_symbol, item.symbol))
+        db_manager = self.bot.db_manager
+        if db_manager is not None and hasattr(db_manager, 'traded_symbols'):
+            symbols.update(db_manager.traded_symbols(SWEEP_JOURNAL_OPERATIONS))
+        return symbols
+
+    def _spot_findings(self, wallet, book_spot, assets, tickers):
+        findings = []
+        for asset in assets:
+            symbol = f"{asset}/USDT"
+            price = (tickers.get(symbol) or {}).get('last')
+            if not price:
+                continue
+            balance = wallet.get(asset, {'free': 0.0, 'total': 0.0})
+            # Arredonda o resíduo de ponto flutuante (0.714 - 0.664 = 0.04999...) antes da precisão do mercado
+            excess = round(balance['total'] - book_spot.get(asset, 0.0), 10)
+            usd = abs(excess) * price
+            if usd < SWEEP_MIN_USD:
+                continue
+
+            if excess < 0:
+                kind = MISMATCH
+            elif usd >= SWEEP_ORPHAN_USD:
+                kind = ORPHAN_SPOT
+            else:
+                market = self.spot.markets[symbol]
+                min_cost = ((market.get('limits') or {}).get('cost') or {}).get('min') or SWEEP_MIN_NOTIONAL_DEFAULT
+                kind = DUST if usd >= min_cost else DUST_LOCKED
+
+            findings.append({
+                'kind': kind, 'key': asset, 'symbol': symbol, 'side': 'sell',
+                'amount': min(excess, balance['free']) if excess > 0 else excess, 'usd': usd,
+                'actionable': kind != MISMATCH and (kind != DUST_LOCKED or self._can_convert()),
+            })
+        return findings
+
+    def _swap_findings(self, positions, book_swap):
+        findings = []
+        held = {}
+        for row in positions:
+            contracts = float(row.get('contracts') or 0.0)
+            if contracts:
+                sign = -1 if row.get('side') == 'short' else 1
+                held[row['symbol']] = (sign * contracts, float(row.get('markPrice') or 0.0), row.get('contractSize') or 1)
+
+        for symbol in set(held) | set(book_swap):
+            signed, mark, contract_size = held.get(symbol, (0.0, 0.0, 1))
+            expected = book_swap.get(symbol, 0.0)
+            excess = round(signed - expected, 10)
+            usd = abs(excess) * contract_size * mark
+            if not excess or (mark and usd < SWEEP_MIN_USD):
+                continue
+
+            # Excedente na mesma direção da posição (ou posição fora do livro) reduz exposição ao zerar
+            reducible = abs(signed) > abs(expected) and signed * expected >= 0
+            findings.append({
+                'kind': ORPHAN_SWAP if reducible else MISMATCH, 'key': symbol, 'symbol': symbol,
+                'side': 'buy' if excess < 0 else 'sell', 'amount': abs(excess), 'usd': usd,
+                'actionable': reducible,
+            })
+        return findings
+
+    def _report(self, findings):
+        totals = dict.fromkeys(KINDS, 0.0)
+        for item in findings:
+            totals[item['kind']] += item['usd']
+            extra = {'sweep_kind': item['kind'], 'symbol': item['symbol'], 'amount': item['amount'], 'usd': item['usd'], 'traded': item['traded']}
+            if not item['traded']:
+                # Saldo/posição que o bot nunca negociou: do usuário, só registra
+                LOGGER.info(f"Varredura: {item['symbol']} fora do livro e não negociado pelo bot: "
+                            f"{item['amount']:.8g} (~${item['usd']:.2f}). Só alerta.", extra=extra)
+            elif item['kind'] in (ORPHAN_SPOT, ORPHAN_SWAP, MISMATCH):
+                LOGGER.critical(
+                    f"{COLOR_RED}Varredura: exposição fora do livro ({item['kind']}) em {item['symbol']}: "
+                    f"{item['amount']:.8g} (~${item['usd']:.2f}){COLOR_RESET}", extra=extra
+                )
+            else:
+                LOGGER.info(f"Varredura: dust em {item['symbol']}: {item['amount']:.8g} (~${item['usd']:.2f})", extra=extra)
+        for kind, usd in totals.items():
+            SWEEP_RESIDUE.labels(kind=kind).set(usd)
+
+    def _confirm(self, findings):
+        """Achados acionáveis vistos em SWEEP_CONFIRM_PASSES passadas seguidas."""
+        current = {(item['kind'], item['key']) for item in findings}
+        self.seen = {key: self.seen.get(key, 0) + 1 for key in current}
+        return [item for item in findings if item['actionable'] and self.seen[(item['kind'], item['key'])] >= SWEEP_CONFIRM_PASSES]
+
+    # --- Ações ---
+
+    def _act(self, confirmed):
+        locked = []
+        for item in confirmed:
+            if item['kind'] == DUST_LOCKED:
+                locked.append(item)
+                continue
+            try:
+                if item['kind'] == ORPHAN_SWAP:
+                    client = self.swap
+                    amount = client.amount_to_precision(item['symbol'], item['amount'])
+                    self.bot._market_order('sweep', client, item['symbol'], item['side'], amount, params={'reduceOnly': True})
+                else:
+                    client = self.spot
+                    amount = client.amount_to_precision(item['symbol'], item['amount'])
+                    self.bot._market_order('sweep', client, item['symbol'], 'sell', amount)
+                LOGGER.warning(f"Varredura: {item['kind']} em {item['symbol']} zerado ({item['side']} {amount}).")
+                SWEEP_ACTIONS.labels(kind=item['kind'], result='flattened').inc()
+            except Exception as e:
+                LOGGER.error(f"Varredura: falha ao zerar {item['kind']} em {item['symbol']}: {e}")
+                SWEEP_ACTIONS.labels(kind=item['kind'], result='failed').inc()
+            self.seen.pop((item['kind'], item['key']), None)
+
+        if locked:
+            self._convert_dust(locked)
+        self.bot.balances.invalidate()
+
+    def _can_convert(self):
+        return SWEEP_DUST_CONVERT and not self.bot.paper and hasattr(self.spot, 'sapi_post_asset_dust')
+
+    def _convert_dust(self, items):
+        """Dust abaixo do mínimo de ordem: uma conversão em lote (Binance: /sapi/v1/asset/dust -> BNB)."""
+        client = self.spot
+        assets = [item['key'] for item in items]
+        try:
+            client.sapi_post_asset_dust({'asset': assets})
+            LOGGER.info(f"Varredura: dust convertido em lote ({', '.join(assets)}).")
+            SWEEP_ACTIONS.labels(kind=DUST_LOCKED, result='converted').inc(len(items))
+        except Exception as e:
+            LOGGER.warning(f"Varredura: conversão de dust recusada ({classify(e) or 'interno'}): {e}")
+            SWEEP_ACTIONS.labels(kind=DUST_LOCKED, result='failed').inc(len(items))
+        for asset in assets:
+            self.seen.pop((DUST_LOCKED, asset), None)
@@ -0,0 +1,102 @@
+import re
+import time
+from configs.config import *
+
+# Prefixos de contrato escalado na Binance Futures: 1000PEPE, 1000000MOG, 1MBABYDOGE...
+MULTIPLIER_PATTERN = re.compile(r"^(\d+)(M?)(.+)$")
+
+
+class SymbolIndex:
+    """
+    Índice Perpétuo -> Spot construído uma vez por atualização dos metadados de mercado.
+
+    Para cada perpétuo linear em USDT guarda o par Spot equivalente, o multiplicador
+    do contrato (1000PEPE/USDT:USDT = 1000 x PEPE/USDT) e a precisão/limites das duas pernas.
+    O scanner e a entrada fazem apenas lookups O(1).
+    """
+    def __init__(self):
+        self.pairs = {}
+        self.built_at = 0.0
+        self._sources = (None, None)
+
+    def is_stale(self, swap_markets, spot_markets):
+        """True se o CCXT recarregou os mercados desde a última construção."""
+        return self._sources != (id(swap_markets), id(spot_markets))
+
+    def build(self, swap_markets, spot_markets):
+        pairs = {}
+        for symbol, market in swap_markets.items():
+            if not (market.get('swap') and market.get('linear') and market.get('quote') == 'USDT'):
+                continue
+
+            spot_symbol, multiplier = self._resolve_spot(market['base'], spot_markets)
+            if spot_symbol is None:
+                continue
+
+            spot_market = spot_markets[spot_symbol]
+            pairs[symbol] = {
+                'swap_symbol': symbol,
+                'spot_symbol': spot_symbol,
+                'base': spot_market['base'],
+                'multiplier': multiplier,
+                'contract_size': market.get('contractSize') or 1.0,
+                'swap_amount_step': market['precision'].get('amount'),
+                'spot_amount_step': spot_market['precision'].get('amount'),
+                'swap_min_amount': market['limits']['amount'].get('min') or 0.0,
+                'spot_min_amount': spot_market['limits']['amount'].get('min') or 0.0,
+                'swap_min_cost': market['limits']['cost'].get('min') or 0.0,
+                'spot_min_cost': spot_market['limits']['cost'].get('min') or 0.0,
+                'active': bool(market.get('active')) and bool(spot_market.get('active')),
+            }
+
+        self.pairs = pairs
+        self.built_at = time.time()
+        self._sources = (id(swap_markets), id(spot_markets))
+
+        scaled = sum(1 for entry in pairs.values() if entry['multiplier'] != 1)
+        LOGGER.info(f"Índice de símbolos: {len(pairs)} perpétuos mapeados para Spot ({scaled} com multiplicador)")
+        return self
+
+    @staticmethod
+    def _resolve_spot(base, spot_markets):
+        """
+        Encontra o par Spot do ativo base do perpétuo.
+        Tenta o nome exato e depois remove o prefixo numérico (1000 = x1000, 1M = x1.000.000).
+        """
+        direct = f"{base}/USDT"
+        if direct in spot_markets:
+            return direct, 1
+
+        match = MULTIPLIER_PATTERN.match(base)
+        if not match:
+            return None, 1
+
+        digits, mega, rest = match.groups()
+        # "1000000MOG": o M faz parte do nome do ativo; "1MBABYDOGE": M = milhão.
+        # A leitura literal vem primeiro para não cair num ativo homônimo (ex: OG).
+        candidates = [(mega + rest, int(digits))]
+        if mega:
+            candidates.append((rest, int(digits) * 1_000_000))
+
+        for spot_base, multiplier in candidates:
+            spot_symbol = f"{spot_base}/USDT"
+            if spot_symbol in spot_markets:
+                return spot_symbol, multiplier
+        return None, 1
+
+    def get(self, swap_symbol):
+        return self.pairs.get(swap_symbol)
+
+    def spot_for(self, swap_symbol):
+        entry = self.pairs.get(swap_symbol)
+        return entry['spot_symbol'] if entry else None
+
+    def multiplier(self, swap_symbol):
+        entry = self.pairs.get(swap_symbol)
+        return entry['multiplier'] if entry else 1
+
+    def __contains__(self, swap_symbol):
+        return swap_symbol in self.pairs
+
+    def __len__(self):
+        return len(self.pairs)
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import signal
+import functools
+import itertools
+import threading
+import logging.handlers
+from datetime import datetime
+from contextlib import contextmanager
+from configs.config import *
+from tools.log_pipeline import configure_file_logger
+
+_LISTENER_CODE = logging.handlers.QueueListener._monitor.__code__
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'trace_id', 'start', 'attrs')
+
+    def __init__(self, name, span_id, parent, attrs):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else span_id
+        self.start = time.perf_counter()
+        self.attrs = attrs
+
+
+class Tracer:
+    """
+    Spans aninhados por thread. Ao fechar, cada span vira uma linha JSON no arquivo de trace
+    (nome, ids, duração, erro e atributos). A escrita acontece na thread do logger.
+    """
+    def __init__(self, logger, enabled=True):
+        self.logger = logger
+        self.enabled = enabled
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        # Pilhas ativas por thread (lidas pelo profiler para prefixar as amostras)
+        self.stacks = {}
+
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        if not self.enabled:
+            yield None
+            return
+
+        stack = self._stack()
+        if not stack:
+            self.stacks[threading.get_ident()] = stack
+        span = Span(name, next(self.ids), stack[-1] if stack else None, attrs)
+        stack.append(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            if not stack:
+                self.stacks.pop(threading.get_ident(), None)
+            duration_ms = (time.perf_counter() - span.start) * 1000
+            self.logger.info(
+                "%s %.1fms", name, duration_ms,
+                extra={
+                    'span': name, 'trace_id': span.trace_id, 'span_id': span.span_id,
+                    'parent_id': span.parent_id, 'duration_ms': duration_ms,
+                    'error': error, 'attrs': span.attrs,
+                }
+            )
+
+    def traced(self, name=None):
+        """Decorador: executa a função inteira dentro de um span."""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current_path(self, thread_id):
+        stack = self.stacks.get(thread_id)
+        return [span.name for span in stack] if stack else []
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem (opt-in, ligado/desligado em tempo de execução).
+    A cada intervalo lê a pilha de todas as threads e conta stacks no formato
+    "collapsed" (flamegraph.pl / speedscope), prefixadas pelos spans ativos.
+    """
+    def __init__(self, tracer, interval=PROFILER_INTERVAL, output_dir=LOGS_DIR):
+        self.tracer = tracer
+        self.interval = interval
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.samples = {}
+        self.started_at = None
+        self.signal_on = False      # Alternado pelo SIGUSR1; aplicado em poll_toggle()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.samples = {}
+            self.started_at = datetime.now()
+            self.thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+            self.thread.start()
+        LOGGER.info(f"Profiler: amostragem iniciada (intervalo {self.interval * 1000:.0f}ms).")
+
+    def stop(self):
+        """Para a amostragem e grava o perfil. Retorna o caminho do arquivo (ou None)."""
+        with self.lock:
+            if not self.running:
+                return None
+            self.running = False
+            thread = self.thread
+        thread.join()
+        return self._dump()
+
+    def toggle(self):
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def poll_toggle(self, flag_path=PROFILER_TOGGLE_FILE):
+        """
+        Liga o profiler enquanto o arquivo-flag existir (útil onde não há SIGUSR1, ex: Windows)
+        ou enquanto o último SIGUSR1 o tiver ligado. Chamado periodicamente pelo loop principal.
+        """
+        wanted = os.path.exists(flag_path) or self.signal_on
+        if wanted and not self.running:
+            self.start()
+        elif not wanted and self.running:
+            self.stop()
+
+    def _on_signal(self, signum, frame):
+        # Só marca o pedido: start()/stop() pegam o lock e esperam a thread de amostragem,
+        # o que travaria se o sinal chegasse com o lock em uso pela thread principal
+        self.signal_on = not self.signal_on
+
+    def install_signal(self):
+        """SIGUSR1 liga/desliga o profiler (kill -USR1 <pid>), aplicado no próximo poll_toggle()."""
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._on_signal)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while self.running:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code is _LISTENER_CODE:
+                        # Threads de escrita do logging não interessam ao perfil
+                        stack = None
+                        break
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack is None:
+                    continue
+                stack.reverse()
+                key = ';'.join(self.tracer.current_path(thread_id) + stack)
+                self.samples[key] = self.samples.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    def _dump(self):
+        if not self.samples:
+            LOGGER.info("Profiler: nenhuma amostra coletada.")
+            return None
+        path = os.path.join(self.output_dir, f"profile_{self.started_at.strftime('%Y%m%d_%H%M%S')}.folded")
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                for key, count in sorted(self.samples.items(), key=lambda item: item[1], reverse=True):
+                    f.write(f"{key} {count}\n")
+        except Exception as e:
+            LOGGER.error(f"Profiler: erro ao gravar perfil: {e}")
+            return None
+        LOGGER.info(f"Profiler: {sum(self.samples.values())} amostras gravadas em {path}")
+        return path
+
+
+TRACER = Tracer(
+    configure_file_logger(
+        "DeltaNeutralBot.trace",
+        os.path.join(LOGS_DIR, f"traces{LOG_SUFFIX}.jsonl"),
+        max_bytes=TRACE_MAX_BYTES,
+        backup_count=TRACE_BACKUP_COUNT
+    ),
+    enabled=TRACE_ENABLED
+)
+PROFILER = SamplingProfiler(TRACER)
+
+span = TRACER.span
+traced = TRACER.traced
@@ -0,0 +1,255 @@
+import time
+import argparse
+import concurrent.futures
+from configs.config import *
+from tools.exchanges import create_client
+from tools.symbols import MULTIPLIER_PATTERN
+
+
+def normalize_base(base):
+    """
+    Ativo canônico e multiplicador do contrato: 1000PEPE -> (PEPE, 1000), 1MBABYDOGE -> (BABYDOGE, 1.000.000).
+    Cada exchange escala contratos de um jeito; o ativo canônico é o que permite comparar o mesmo par entre elas.
+    """
+    match = MULTIPLIER_PATTERN.match(base)
+    if not match:
+        return base, 1
+    digits, mega, rest = match.groups()
+    if int(digits) > 1:
+        # "1000000MOG": o M faz parte do nome (mesma leitura literal do SymbolIndex)
+        return mega + rest, int(digits)
+    if mega:
+        return rest, 1_000_000
+    # "1INCH" e afins: o dígito é o nome do ativo
+    return base, 1
+
+
+def interval_hours(value):
+    """Intervalo de funding do CCXT ('8h', '4h', '60m') em horas; None se ausente ou inválido."""
+    if not value:
+        return None
+    try:
+        text = str(value).strip().lower()
+        if text.endswith('h'):
+            hours = float(text[:-1])
+        elif text.endswith('m'):
+            hours = float(text[:-1]) / 60
+        else:
+            hours = float(text)
+    except ValueError:
+        return None
+    return hours if hours > 0 else None
+
+
+def _market_interval(market):
+    """Intervalo nos metadados do mercado (Binance: fundingIntervalHours; Bybit: fundingInterval em minutos)."""
+    info = market.get('info') or {}
+    try:
+        if info.get('fundingIntervalHours'):
+            return float(info['fundingIntervalHours'])
+        if info.get('fundingInterval'):
+            return float(info['fundingInterval']) / 60
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class Venue:
+    """
+    Uma exchange de perpétuos no scanner: cliente próprio, metadados em cache por VENUE_MARKETS_TTL
+    e funding convertido para linhas normalizadas (ativo canônico + taxa diária).
+    """
+    def __init__(self, name, exchange_id=EXCHANGE_ID, base_url=None, client=None, home=False):
+        self.name = name
+        self.exchange_id = exchange_id
+        self.home = home
+        if client is None:
+            overrides = {} if home else {'apiKey': None, 'secret': None}   # Só rotas públicas fora de casa
+            client = create_client('swap', exchange_id=exchange_id, base_url=base_url,
+                                   label=f"venue_{name}", governed=home, **overrides)
+        self.client = client
+        self.intervals = {}     # {symbol: horas}
+        self.metadata_at = 0.0
+
+    def refresh_metadata(self):
+        """Mercados e intervalos de funding (fetchFundingIntervals quando a exchange oferece)."""
+        if self.metadata_at and time.time() - self.metadata_at < VENUE_MARKETS_TTL:
+            return
+        self.client.load_markets(reload=bool(self.metadata_at))
+
+        intervals = {}
+        for symbol, market in self.client.markets.items():
+            hours = _market_interval(market)
+            if hours:
+                intervals[symbol] = hours
+
+        if self.client.has.get('fetchFundingIntervals'):
+            try:
+                for symbol, info in self.client.fetch_funding_intervals().items():
+                    hours = interval_hours(info.get('interval'))
+                    if hours:
+                        intervals[symbol] = hours
+            except Exception as e:
+                LOGGER.debug("Venue %s: intervalos de funding indisponíveis (%s)", self.name, e)
+
+        self.intervals = intervals
+        self.metadata_at = time.time()
+
+    def fetch(self):
+        """Tickers e funding em lote: (tickers, {symbol: (taxa, próxima liquidação s)})."""
+        self.refresh_metadata()
+        tickers = self.client.fetch_tickers()
+        rates = {}
+        for symbol, info in self.client.fetch_funding_rates().items():
+            if info.get('fundingRate') is None:
+                continue
+            hours = interval_hours(info.get('interval'))
+            if hours:
+                self.intervals[symbol] = hours
+            ts = info.get('nextFundingTimestamp') or info.get('fundingTimestamp')
+            rates[symbol] = (info['fundingRate'], ts / 1000 if ts else None)
+        return tickers, rates
+
+    def rows(self, tickers, rates):
+        """Uma linha por perpétuo linear em USDT, com a taxa por intervalo e a diária harmonizada."""
+        rows = []
+        for symbol, (rate, next_funding) in rates.items():
+            market = self.client.markets.get(symbol)
+            if not market or not (market.get('swap') and market.get('linear') and market.get('quote') == 'USDT'):
+                continue
+            asset, multiplier = normalize_base(market['base'])
+            hours = self.intervals.get(symbol, FUNDING_INTERVAL_HOURS)
+            rows.append({
+                'venue': self.name,
+                'symbol': symbol,
+                'asset': asset,
+                'multiplier': multiplier,
+                'funding_rate': rate,
+                'interval_hours': hours,
+                'daily_rate': rate * 24.0 / hours,
+                'next_funding': next_funding,
+                'quote_volume': (tickers.get(symbol) or {}).get('quoteVolume') or 0.0,
+            })
+        return rows
+
+
+def rank_venue_rows(rows, home=None, min_volume=MIN_24H_VOLUME_USD):
+    """
+    Tabela cruzada ordenada pela taxa diária. Por ativo marca a melhor venue, a diferença entre a
+    melhor e a pior (cross_spread) e a vantagem sobre a casa (vs_home; None se a casa não lista o ativo).
+    """
+    rows = [row for row in rows if row['quote_volume'] >= min_volume]
+
+    by_asset = {}
+    for row in rows:
+        by_asset.setdefault(row['asset'], []).append(row)
+
+    for asset_rows in by_asset.values():
+        rates = [row['daily_rate'] for row in asset_rows]
+        best, worst = max(rates), min(rates)
+        home_rate = next((row['daily_rate'] for row in asset_rows if row['venue'] == home), None)
+        for row in asset_rows:
+            row['venues'] = len(asset_rows)
+            row['best_venue'] = row['daily_rate'] == best
+            row['cross_spread'] = best - worst
+            row['vs_home'] = row['daily_rate'] - home_rate if home_rate is not None else None
+
+    ranked = sorted(rows, key=lambda row: row['daily_rate'], reverse=True)
+    for position, row in enumerate(ranked, start=1):
+        row['rank'] = position
+    return ranked
+
+
+def parse_venues(spec=SCAN_VENUES):
+    """'binance,bybit=bybit,local2=binance' -> [(nome, id_ccxt, base_url)]; a primeira é a casa."""
+    venues = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, exchange_id = item.partition('=')
+        name = name.strip()
+        base_url = os.getenv(f"VENUE_{name.upper()}_BASE_URL")
+        venues.append((name, exchange_id.strip() or name, base_url))
+    return venues
+
+
+class MultiVenueScanner:
+    """
+    Consulta várias exchanges em paralelo (uma thread por venue, cada uma com o seu cliente) e
+    monta a tabela cruzada de funding. Venue fora do ar é registrada e fica de fora da rodada.
+    """
+    def __init__(self, venues):
+        self.venues = venues
+        self.home = next((venue.name for venue in venues if venue.home), None)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(venues), thread_name_prefix='venue')
+        self.table = []
+
+    @classmethod
+    def from_config(cls, home_client=None, spec=SCAN_VENUES):
+        """Scanner das venues do config, ou None com uma venue só. A casa reaproveita o cliente do bot."""
+        venues = parse_venues(spec)
+        if len(venues) < 2:
+            return None
+        built = []
+        for position, (name, exchange_id, base_url) in enumerate(venues):
+            home = position == 0
+            try:
+                built.append(Venue(name, exchange_id, base_url=base_url, home=home,
+                                   client=home_client if home else None))
+            except Exception as e:
+                LOGGER.error(f"Scanner multi-exchange: venue '{name}' ({exchange_id}) ignorada: {e}")
+        return cls(built) if len(built) > 1 else None
+
+    def _collect(self, venue, quotes):
+        if quotes is None:
+            quotes = venue.fetch()
+        else:
+            venue.refresh_metadata()
+        return venue.rows(*quotes)
+
+    def scan(self, home_quotes=None):
+        """
+        home_quotes: (tickers, {symbol: (taxa, próxima s)}) já buscados pelo scan da casa (evita repetir a chamada).
+        """
+        futures = {
+            venue: self.pool.submit(self._collect, venue, home_quotes if venue.home else None)
+            for venue in self.venues
+        }
+        rows = []
+        for venue, future in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                LOGGER.warning(f"Scanner multi-exchange: '{venue.name}' indisponível nesta rodada ({e})")
+
+        self.table = rank_venue_rows(rows, home=self.home)
+        return self.table
+
+    def log_table(self, top=VENUE_LOG_TOP):
+        for row in self.table[:top]:
+            vs_home = f" | vs {self.home}: {row['vs_home']:+.4%}/dia" if row['vs_home'] is not None and row['venue'] != self.home else ""
+            LOGGER.info(
+                "Multi-exchange #%d: %s @ %s (%s) | %.4f%%/%gh = %.4f%%/dia%s",
+                row['rank'], row['asset'], row['venue'], row['symbol'], row['funding_rate'] * 100,
+                row['interval_hours'], row['daily_rate'] * 100, vs_home,
+                extra={'color': 'cyan' if row['best_venue'] else None, **row}
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabela cruzada de funding entre exchanges (uma rodada).")
+    parser.add_argument('--venues', default=SCAN_VENUES, help="Ex: binance,bybit,okx (a primeira é a casa)")
+    parser.add_argument('--top', type=int, default=VENUE_LOG_TOP)
+    args = parser.parse_args()
+
+    scanner = MultiVenueScanner.from_config(spec=args.venues)
+    if scanner is None:
+        LOGGER.error("Informe pelo menos duas venues (--venues ou SCAN_VENUES).")
+        return
+    scanner.scan()
+    scanner.log_table(top=args.top)
+
+
+if __name__ == "__main__":
+    main()